@@ -0,0 +1,50 @@
+import re
+
+# "3. Critical Improvements" at the start of an unindented line
+HEADING_RE = re.compile(r'^\d+\.\s*\S')
+
+BULLET_CHARS = '-•*'
+
+
+def parse_analysis(text):
+    """
+    Split model output into [{'title': ..., 'points': [...]}, ...].
+
+    A section starts at a numbered heading, or at the first non-bullet line
+    after a blank line; every other non-empty line is a bullet point. This
+    does not depend on the model putting blank lines between sections.
+    Sections without any points are dropped.
+    """
+    sections = []
+    current = None
+    after_blank = True
+    for raw in (text or '').splitlines():
+        line = raw.strip()
+        if not line:
+            after_blank = True
+            continue
+        is_bullet = line[0] in BULLET_CHARS
+        if HEADING_RE.match(raw) or (after_blank and not is_bullet):
+            current = {'title': _clean_title(line), 'points': []}
+            sections.append(current)
+        elif current is not None:
+            point = line.lstrip(BULLET_CHARS + ' ').replace('*', '').strip()
+            if point:
+                current['points'].append(point)
+        after_blank = False
+    return [section for section in sections if section['points']]
+
+
+def format_analysis(sections):
+    """
+    Serialize parsed sections back to the plain-text form stored in
+    WorkoutSession.analysis, with one blank line between sections.
+    """
+    return '\n\n'.join(
+        section['title'] + '\n' + '\n'.join(f'- {point}' for point in section['points'])
+        for section in sections
+    )
+
+
+def _clean_title(line):
+    return line.replace('*', '').replace('#', '').strip().rstrip(':')
@@ -0,0 +1,200 @@
+"""
+Build-time static asset stage. build() minifies the CSS and JS under
+static/, writes every asset as a content-hashed copy in static/build/ with
+precompressed .gz (and .br, when the brotli package is installed) variants,
+and records the names in static/build/manifest.json:
+
+    flask --app app build-assets
+
+At runtime AssetManifest rewrites url_for('static', filename=...) to the
+fingerprinted name and serves those files with immutable caching, picking
+the precompressed variant from Accept-Encoding. Without a manifest (e.g. in
+development) the plain files are served as before.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_file
+
+BUILD_DIR = 'build'
+MANIFEST_NAME = 'manifest.json'
+
+# Fingerprinted assets; .css and .js are also minified
+ASSET_EXTENSIONS = ('.css', '.js', '.svg', '.png', '.ico')
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg')
+
+# Precompressed variants, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Skip variants that do not save at least this much
+MIN_COMPRESSION_SAVING = 0.1
+
+HASH_LENGTH = 12
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_RE = re.compile(r'\s+')
+_CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+_CSS_COLON_RE = re.compile(r':\s+')
+
+
+def minify_css(text):
+    """
+    Drop comments and the whitespace around braces, semicolons, commas and
+    child combinators. Spaces before a colon are kept (".a :hover" selects
+    differently from ".a:hover").
+    """
+    text = _CSS_COMMENT_RE.sub('', text)
+    text = _CSS_SPACE_RE.sub(' ', text)
+    text = _CSS_PUNCTUATION_RE.sub(r'\1', text)
+    text = _CSS_COLON_RE.sub(':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """
+    Conservative: strip indentation, blank lines and whole-line comments,
+    and keep every line break so automatic semicolon insertion and regex or
+    string literals are unaffected.
+    """
+    lines = []
+    in_comment = False
+    for line in text.splitlines():
+        line = line.strip()
+        if in_comment:
+            in_comment = '*/' not in line
+            continue
+        if line.startswith('/*'):
+            in_comment = '*/' not in line
+            continue
+        if not line or line.startswith('//'):
+            continue
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def compress(data):
+    """
+    Precompressed variants of data by file suffix, only where they help.
+    """
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {
+        suffix: compressed for suffix, compressed in variants.items()
+        if len(compressed) <= len(data) * (1 - MIN_COMPRESSION_SAVING)
+    }
+
+
+def build(static_folder):
+    """
+    Rebuild static/build/ from the assets under static_folder. Returns the
+    manifest: source name -> fingerprinted name, both relative to static/.
+    """
+    output = os.path.join(static_folder, BUILD_DIR)
+    shutil.rmtree(output, ignore_errors=True)
+    manifest = {}
+    stats = {'files': 0, 'source_bytes': 0, 'minified_bytes': 0, 'gzip_bytes': 0, 'brotli_bytes': 0}
+    for folder, subfolders, files in os.walk(static_folder):
+        subfolders[:] = sorted(name for name in subfolders if os.path.join(folder, name) != output)
+        for name in sorted(files):
+            base, extension = os.path.splitext(name)
+            if extension not in ASSET_EXTENSIONS:
+                continue
+            path = os.path.join(folder, name)
+            source = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            stats['source_bytes'] += len(data)
+            if extension in MINIFIERS:
+                data = MINIFIERS[extension](data.decode('utf-8')).encode('utf-8')
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            target = '/'.join(filter(None, (BUILD_DIR, os.path.dirname(source), f'{base}.{digest}{extension}')))
+            target_path = os.path.join(static_folder, target)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with open(target_path, 'wb') as f:
+                f.write(data)
+            variants = compress(data) if extension in COMPRESSIBLE_EXTENSIONS else {}
+            for suffix, compressed in variants.items():
+                with open(target_path + suffix, 'wb') as f:
+                    f.write(compressed)
+            manifest[source] = target
+            stats['files'] += 1
+            stats['minified_bytes'] += len(data)
+            stats['gzip_bytes'] += len(variants.get('.gz', data))
+            stats['brotli_bytes'] += len(variants.get('.br', variants.get('.gz', data)))
+
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Built {stats['files']} assets: {stats['source_bytes']} bytes, {stats['minified_bytes']} minified, "
+          f"{stats['gzip_bytes']} gzip, {stats['brotli_bytes']} best precompressed")
+    return manifest
+
+
+class AssetManifest:
+    """
+    Serves the output of build(): url_for('static') points at the
+    fingerprinted copies, which are sent precompressed and cached for
+    ASSET_MAX_AGE as immutable (a changed file gets a new name).
+    """
+
+    def __init__(self):
+        self.manifest = {}
+        self.fingerprinted = {}
+        self.version = ''  # changes with every build, for validators of pages that link assets
+
+    def init_app(self, app):
+        self.manifest = {}
+        self.fingerprinted = {}
+        self.version = ''
+        path = os.path.join(app.static_folder, BUILD_DIR, MANIFEST_NAME)
+        if not app.config['ASSET_FINGERPRINTS'] or not os.path.isfile(path):
+            return
+        with open(path, 'rb') as f:
+            raw = f.read()
+        self.manifest = json.loads(raw)
+        self.version = hashlib.sha256(raw).hexdigest()[:HASH_LENGTH]
+        self.fingerprinted = {target: source for source, target in self.manifest.items()}
+        app.url_defaults(self.url_defaults)
+        app.view_functions['static'] = self.send_static
+
+    def url_defaults(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = self.manifest[values['filename']]
+
+    def send_static(self, filename):
+        if filename not in self.fingerprinted:
+            return current_app.send_static_file(filename)
+        path = os.path.join(current_app.static_folder, filename)
+        encoding, suffix = next((
+            (encoding, suffix) for encoding, suffix in ENCODINGS
+            if encoding in request.accept_encodings and os.path.isfile(path + suffix)
+        ), (None, ''))
+        # The digest is in the name; the ETag also names the encoding sent
+        digest = os.path.splitext(os.path.splitext(filename)[0])[1].lstrip('.')
+        response = send_file(
+            path + suffix,
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            etag=f"{digest}-{encoding or 'identity'}",
+            conditional=True
+        )
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['ASSET_MAX_AGE']
+        response.cache_control.immutable = True
+        return response
@@ -0,0 +1,165 @@
+"""
+Concurrent /upload session inserts from several worker processes sharing
+one database, the way multiple gunicorn workers do. Each worker posts a
+small generated clip from several threads while its background jobs write
+analysis progress to the same database.
+
+    python benchmarks/db_concurrency_bench.py --workers 8 --threads 4 --uploads 10
+    # the old settings, for comparison: rollback journal and pysqlite's 5s lock wait
+    python benchmarks/db_concurrency_bench.py --journal-mode delete --busy-timeout 5000
+    python benchmarks/db_concurrency_bench.py --database-url postgresql://localhost/coach_bench
+
+Every upload gets different notes, so none is served from the analysis
+cache. Failed requests and failed analyses are lock errors surfacing.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def write_clip(path, seconds=2, fps=10):
+    """
+    A small clip with a block moving up and down, enough for probing and analysis.
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (160, 120))
+    for index in range(seconds * fps):
+        frame = np.full((120, 160, 3), 30, dtype=np.uint8)
+        top = 20 + int(30 * abs(np.sin(index / fps * np.pi)))
+        frame[top:top + 60, 60:100] = 220
+        writer.write(frame)
+    writer.release()
+
+
+def load_app(settings):
+    os.environ.update(settings['env'])
+    os.chdir(settings['workdir'])
+    from app import create_app
+    app = create_app()
+    app.logger.disabled = True
+    return app
+
+
+def run_worker(worker, settings):
+    app = load_app(settings)
+    clip = open(settings['clip'], 'rb').read()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def upload_loop(thread):
+        client = app.test_client()
+        username = f'bench-{worker}-{thread}'
+        client.post('/register', data={'username': username, 'email': f'{username}@example.com', 'password': 'bench'})
+        client.post('/login', data={'username': username, 'password': 'bench'})
+        for index in range(settings['uploads']):
+            started = time.perf_counter()
+            response = client.post('/upload', data={
+                'exercise_type': 'squat',
+                'notes': f'{username} upload {index}',
+                'file': (io.BytesIO(clip), f'{username}-{index}.mp4')
+            }, content_type='multipart/form-data')
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=upload_loop, args=(thread,)) for thread in range(settings['threads'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    from extensions import job_queue
+    job_queue.join()
+    return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=8, help='processes, like gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='request threads per worker')
+    parser.add_argument('--uploads', type=int, default=10, help='uploads per thread')
+    parser.add_argument('--database-url', help='defaults to a fresh SQLite file')
+    parser.add_argument('--journal-mode', default='wal')
+    parser.add_argument('--busy-timeout', type=int, default=30000, help='milliseconds')
+    args = parser.parse_args()
+
+    from llm_stub import start_stub_server
+    server, config, base_url = start_stub_server(latency=0.05, first_token_latency=0.02, tokens_per_second=5000)
+
+    workdir = tempfile.mkdtemp(prefix='db-bench-')
+    clip = os.path.join(workdir, 'clip.mp4')
+    write_clip(clip)
+    settings = {
+        'workdir': workdir,
+        'clip': clip,
+        'threads': args.threads,
+        'uploads': args.uploads,
+        'env': {
+            'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            'SQLITE_JOURNAL_MODE': args.journal_mode,
+            'SQLITE_BUSY_TIMEOUT': str(args.busy_timeout),
+            'OPENAI_BASE_URL': base_url,
+            'OPENAI_API_KEY': 'stub-key',
+            'FFMPEG_BINARY': 'ffmpeg-disabled-for-benchmark'
+        }
+    }
+
+    from commands import upgrade_schema
+    from extensions import db
+    from models import WorkoutSession
+    app = load_app(settings)
+    with app.app_context():
+        upgrade_schema()
+        db.engine.dispose()
+
+    started = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(args.workers) as pool:
+        results = pool.starmap(run_worker, [(worker, settings) for worker in range(args.workers)])
+    wall = time.perf_counter() - started
+    server.shutdown()
+
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    statuses = {}
+    for _, worker_statuses in results:
+        for status, count in worker_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    with app.app_context():
+        sessions = dict(db.session.query(
+            WorkoutSession.status, db.func.count(WorkoutSession.id)
+        ).group_by(WorkoutSession.status).all())
+
+    report = {
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1],
+        'journal_mode': args.journal_mode,
+        'busy_timeout_ms': args.busy_timeout,
+        'workers': args.workers,
+        'threads_per_worker': args.threads,
+        'uploads': len(latencies),
+        'responses': {str(status): count for status, count in sorted(statuses.items())},
+        'failed_requests': sum(count for status, count in statuses.items() if status >= 500),
+        'sessions_by_status': sessions,
+        'uploads_per_second': round(len(latencies) / wall, 1),
+        'p50_ms': round(1000 * statistics.median(latencies), 1),
+        'p95_ms': round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 1),
+        'max_ms': round(1000 * latencies[-1], 1),
+        'wall_seconds': round(wall, 2)
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
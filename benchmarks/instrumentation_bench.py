@@ -0,0 +1,72 @@
+"""
+Overhead of the instrumentation hooks: a span with instrumentation off and
+on, and a cheap request (/api/exercises/suggest) with it off and on.
+
+    python benchmarks/instrumentation_bench.py --requests 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def span_cost(enabled, iterations):
+    from instrumentation import Instrumentation
+    instrumentation = Instrumentation()
+    instrumentation.enabled = enabled
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with instrumentation.span('bench'):
+            pass
+    return (time.perf_counter() - started) / iterations
+
+
+def request_cost(requests):
+    """
+    Runs in a child process so the app is created with its own INSTRUMENTATION_ENABLED.
+    """
+    import tempfile
+    os.chdir(tempfile.mkdtemp(prefix='instrumentation-bench-'))
+    from app import create_app
+    client = create_app().test_client()
+    for _ in range(50):
+        client.get('/api/exercises/suggest?q=squat')
+    started = time.perf_counter()
+    for index in range(requests):
+        client.get(f'/api/exercises/suggest?q=squat{index % 10}')
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200000, help='spans timed per setting')
+    parser.add_argument('--requests', type=int, default=2000, help='requests timed per setting')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(request_cost(args.requests))
+        return
+
+    report = {
+        'span_disabled_us': round(1e6 * span_cost(False, args.iterations), 3),
+        'span_enabled_us': round(1e6 * span_cost(True, args.iterations), 3),
+    }
+    for setting in ('false', 'true'):
+        env = dict(os.environ, INSTRUMENTATION_ENABLED=setting, DATABASE_URL='sqlite://')
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', '--requests', str(args.requests)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        report[f'request_{"enabled" if setting == "true" else "disabled"}_us'] = round(1e6 * float(output.split()[-1]), 1)
+    report['request_overhead_us'] = round(report['request_enabled_us'] - report['request_disabled_us'], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Offline benchmark for llm_client against the local chat-completions stub.
+
+    python benchmarks/llm_client_bench.py --calls 7 --latency 0.3 --failure-rate 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import ChatRequest, LLMClient  # noqa: E402
+from llm_stub import start_stub_server  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=7, help='independent calls, e.g. one per character')
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, config, base_url = start_stub_server(latency=args.latency, failure_rate=args.failure_rate)
+    client = LLMClient('stub-key', base_url=base_url, backoff_base=0.05, max_retries=6)
+    messages = [{'role': 'system', 'content': 'You are a coach.'}, {'role': 'user', 'content': 'Squat feedback'}]
+
+    started = time.perf_counter()
+    sequential = [client.chat('stub', messages) for _ in range(args.calls)]
+    sequential_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    concurrent = client.chat_many([ChatRequest('stub', messages) for _ in range(args.calls)])
+    concurrent_time = time.perf_counter() - started
+    server.shutdown()
+
+    succeeded = [r for r in concurrent if not isinstance(r, Exception)]
+    report = {
+        'calls': args.calls,
+        'stub_latency': args.latency,
+        'failure_rate': args.failure_rate,
+        'sequential_seconds': round(sequential_time, 3),
+        'concurrent_seconds': round(concurrent_time, 3),
+        'speedup': round(sequential_time / concurrent_time, 2) if concurrent_time else None,
+        'sequential_p50_latency': round(statistics.median(r.latency for r in sequential), 3),
+        'retries': sum(r.attempts - 1 for r in sequential + succeeded),
+        'concurrent_failures': len(concurrent) - len(succeeded),
+        'stub_requests': config.requests,
+        'stub_rate_limited': config.failures
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
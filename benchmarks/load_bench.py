@@ -0,0 +1,338 @@
+"""
+Load test for the upload-to-feedback path and the main read pages, against
+the local chat-completions stub so no API key or network is needed.
+
+    python benchmarks/load_bench.py --output bench.json
+    python benchmarks/load_bench.py --latency 1.0 --failure-rate 0.2 --uploads 12 --concurrency 4
+    python benchmarks/load_bench.py --baseline bench.json  # compare with an earlier run
+
+Scenarios, run in order against one fresh database:
+
+    upload            POST /upload of the sample clips in uploads/, with
+                      different notes each time so nothing comes from the
+                      analysis cache; also times upload until the analysis
+                      and feedback are stored (upload_to_feedback)
+    dashboard         GET /dashboard with --sessions imported sessions
+    session_detail    GET /session/<id> across those sessions
+    session_card      GET /session/<id>/card, the dashboard's expanded card
+                      (set FRAGMENT_CACHE=none to measure without the cache)
+    uploads           GET /uploads/<filename> of the uploaded clips, whole
+                      and as a 1 MB Range request
+
+The report is JSON with throughput and p50/p95/p99 latency per scenario and
+the commit it ran on, so runs can be kept and compared across commits.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_DIR = os.path.join(ROOT, 'uploads')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+STATUS_POLL_SECONDS = 0.05
+
+
+def percentile(ordered, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(latencies, errors, wall):
+    ordered = sorted(latencies)
+    if not ordered:
+        return {'requests': 0, 'errors': errors}
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / wall, 2) if wall else None,
+        'p50_ms': round(1000 * percentile(ordered, 0.50), 2),
+        'p95_ms': round(1000 * percentile(ordered, 0.95), 2),
+        'p99_ms': round(1000 * percentile(ordered, 0.99), 2),
+        'max_ms': round(1000 * ordered[-1], 2)
+    }
+
+
+class Runner:
+    """
+    Runs a scenario's requests from a pool of threads, each with its own
+    logged-in test client, and collects latencies.
+    """
+
+    def __init__(self, app, username, concurrency):
+        self.app = app
+        self.username = username
+        self.concurrency = concurrency
+        self.local = threading.local()
+
+    def client(self):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+            client.post('/login', data={'username': self.username, 'password': 'bench'})
+        return client
+
+    def run(self, tasks):
+        """
+        tasks: callables taking a client and returning True on success.
+        """
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+
+        def timed(task):
+            nonlocal errors
+            client = self.client()
+            started = time.perf_counter()
+            ok = task(client)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += 0 if ok else 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            list(pool.map(timed, tasks))
+        return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def sample_clips():
+    clips = sorted(
+        os.path.join(SAMPLE_DIR, name) for name in os.listdir(SAMPLE_DIR)
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+    )
+    if not clips:
+        sys.exit(f'No sample clips in {SAMPLE_DIR}')
+    return clips
+
+
+def seed_sessions(app, user_id, count, analysis):
+    """
+    Bulk-import finished sessions spread over the last year for the read pages.
+    """
+    exercises = ['squat', 'deadlift', 'bench press', 'overhead press', 'barbell row']
+    now = datetime.utcnow()
+    records = ({
+        'exercise': exercises[index % len(exercises)],
+        'created_at': now - timedelta(hours=index * 7),
+        'file_type': 'video',
+        'character_id': 'trainer',
+        'character_name': None,
+        'status': 'complete',
+        'notes': f'seeded session {index}',
+        'analysis': analysis,
+        'feedback': 'Keep your chest up and drive through your heels.',
+        'pose_metrics': None,
+        'rep_metrics': {'count': 5, 'mean_eccentric': 1.4, 'mean_concentric': 0.9}
+    } for index in range(count))
+    from extensions import db
+    from models import WorkoutSession
+    from workouts import import_session_records
+    with app.app_context():
+        import_session_records(records, user_id)
+        return [row.id for row in db.session.query(WorkoutSession.id).filter_by(user_id=user_id)]
+
+
+def upload_scenario(runner, clips, uploads, feedback_timeout):
+    """
+    Upload and wait for each analysis. The runner times the whole wait
+    (upload_to_feedback); the upload request alone is timed here. Returns
+    (upload summary, upload_to_feedback summary, file names, outcomes).
+    """
+    upload_times = []
+    filenames = []
+    outcomes = {}
+    lock = threading.Lock()
+    payloads = [(clip, open(clip, 'rb').read()) for clip in clips]
+
+    def upload(index):
+        clip, data = payloads[index % len(payloads)]
+        filename = f'bench-{index}-{os.path.basename(clip)}'
+
+        def task(client):
+            started = time.perf_counter()
+            response = client.post('/upload', data={
+                'exercise_type': 'squat',
+                'notes': f'load test upload {index} {random.random()}',
+                'file': (io.BytesIO(data), filename)
+            }, content_type='multipart/form-data')
+            elapsed = time.perf_counter() - started
+            location = response.headers.get('Location', '')
+            with lock:
+                upload_times.append(elapsed)
+            if response.status_code != 302 or '/session/' not in location:
+                return False
+            session_id = int(location.rstrip('/').rsplit('/', 1)[1])
+            status = None
+            while time.perf_counter() - started < feedback_timeout:
+                status = client.get(f'/session/{session_id}/status').get_json()['status']
+                if status in ('complete', 'failed'):
+                    break
+                time.sleep(STATUS_POLL_SECONDS)
+            with lock:
+                filenames.append(filename)
+                outcomes[status] = outcomes.get(status, 0) + 1
+            return status == 'complete'
+        return task
+
+    started = time.perf_counter()
+    feedback_summary = runner.run([upload(index) for index in range(uploads)])
+    upload_summary = summarize(upload_times, len(upload_times) - len(filenames), time.perf_counter() - started)
+    return upload_summary, feedback_summary, filenames, outcomes
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """
+    Per-scenario p50/p95/p99 change against an earlier report, in percent.
+    """
+    changes = {}
+    for name, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            key: round(100 * (current[key] - previous[key]) / previous[key], 1)
+            for key in ('p50_ms', 'p95_ms', 'p99_ms')
+            if current.get(key) is not None and previous.get(key)
+        }
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.3, help='stub seconds per completion')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of stub calls answered 429')
+    parser.add_argument('--tokens-per-second', type=float, default=500.0, help='stub streaming rate')
+    parser.add_argument('--uploads', type=int, default=6)
+    parser.add_argument('--sessions', type=int, default=200, help='imported sessions for the read pages')
+    parser.add_argument('--requests', type=int, default=200, help='requests per read scenario')
+    parser.add_argument('--concurrency', type=int, default=2, help='client threads')
+    parser.add_argument('--feedback-timeout', type=float, default=120.0, help='seconds to wait for each analysis')
+    parser.add_argument('--database-url', help='defaults to a fresh SQLite file')
+    parser.add_argument('--output', help='write the JSON report here as well as printing it')
+    parser.add_argument('--baseline', help='earlier report to compare latencies with')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary work directory')
+    args = parser.parse_args()
+
+    # The app prints progress messages; keep stdout for the JSON report
+    report_stream, sys.stdout = sys.stdout, sys.stderr
+
+    from llm_stub import STUB_ANALYSIS, start_stub_server
+    server, stub, base_url = start_stub_server(
+        latency=args.latency, failure_rate=args.failure_rate, tokens_per_second=args.tokens_per_second
+    )
+
+    clips = sample_clips()
+    # Resolved before changing into the work directory
+    output_path = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = tempfile.mkdtemp(prefix='load-bench-')
+    os.environ.update({
+        'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'OPENAI_BASE_URL': base_url,
+        'OPENAI_API_KEY': 'stub-key',
+        'FFMPEG_BINARY': 'ffmpeg-disabled-for-benchmark'
+    })
+    os.chdir(workdir)
+    from app import create_app
+    from commands import upgrade_schema
+    from extensions import job_queue
+    from models import User
+    app = create_app()
+    app.logger.disabled = True
+    with app.app_context():
+        upgrade_schema()
+
+    username = 'load-bench'
+    client = app.test_client()
+    client.post('/register', data={'username': username, 'email': 'load-bench@example.com', 'password': 'bench'})
+    with app.app_context():
+        user_id = User.query.filter_by(username=username).one().id
+    runner = Runner(app, username, args.concurrency)
+    scenarios = {}
+
+    upload_summary, feedback_summary, filenames, outcomes = upload_scenario(
+        runner, clips, args.uploads, args.feedback_timeout
+    )
+    scenarios['upload'] = upload_summary
+    scenarios['upload_to_feedback'] = dict(feedback_summary, outcomes=outcomes)
+    job_queue.join()
+
+    session_ids = seed_sessions(app, user_id, args.sessions, STUB_ANALYSIS)
+
+    def get(path, headers=None):
+        def task(client):
+            response = client.get(path, headers=headers)
+            response.get_data()  # include sending the body, not just the headers
+            return response.status_code in (200, 206)
+        return task
+
+    scenarios['dashboard'] = runner.run([get('/dashboard') for _ in range(args.requests)])
+    scenarios['session_detail'] = runner.run([
+        get(f'/session/{random.choice(session_ids)}') for _ in range(args.requests)
+    ])
+    scenarios['session_card'] = runner.run([
+        get(f'/session/{random.choice(session_ids)}/card') for _ in range(args.requests)
+    ])
+    if filenames:
+        scenarios['uploads'] = runner.run([get(f'/uploads/{random.choice(filenames)}') for _ in range(args.requests)])
+        scenarios['uploads_range'] = runner.run([
+            get(f'/uploads/{random.choice(filenames)}', {'Range': 'bytes=0-1048575'}) for _ in range(args.requests)
+        ])
+    server.shutdown()
+
+    report = {
+        'commit': git_commit(),
+        'ran_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': sys.version.split()[0],
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0],
+        'settings': {
+            'stub_latency': args.latency,
+            'failure_rate': args.failure_rate,
+            'tokens_per_second': args.tokens_per_second,
+            'uploads': args.uploads,
+            'sessions': args.sessions,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'fragment_cache': app.config['FRAGMENT_CACHE'],
+            'clips': [os.path.basename(clip) for clip in clips]
+        },
+        'stub': {'requests': stub.requests, 'rate_limited': stub.failures},
+        'scenarios': scenarios
+    }
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            report['change_percent'] = compare(report, json.load(f))
+    output = json.dumps(report, indent=2)
+    print(output, file=report_stream)
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
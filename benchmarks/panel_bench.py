@@ -0,0 +1,133 @@
+"""
+Tokens and latency per extra persona: panel feedback from a session's
+stored analysis, in both PANEL_MODE settings, against analyzing the upload
+again for another persona. Runs against the local chat-completions stub.
+
+    python benchmarks/panel_bench.py
+    python benchmarks/panel_bench.py --latency 1.0 --clip uploads/lunge.mp4
+
+The stub counts whitespace-separated words as tokens and counts each
+attached key frame as a few words, so the real saving over a re-analysis
+(which also pays for the images) is larger than reported here.
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class UsageCollector:
+    """
+    LLM client observer summing the usage of every finished call.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+
+    def __call__(self, call):
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += call.usage.get('prompt_tokens', 0)
+            self.completion_tokens += call.usage.get('completion_tokens', 0)
+
+    def per(self, count, seconds):
+        return {
+            'calls': self.calls,
+            'prompt_tokens_each': round(self.prompt_tokens / count, 1),
+            'completion_tokens_each': round(self.completion_tokens / count, 1),
+            'seconds_each': round(seconds / count, 3)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clip', default=os.path.join(ROOT, 'uploads', 'The_worst_squat_ever.mp4'))
+    parser.add_argument('--latency', type=float, default=0.3, help='stub seconds per completion')
+    args = parser.parse_args()
+
+    # The app prints progress messages; keep stdout for the JSON report
+    report_stream, sys.stdout = sys.stdout, sys.stderr
+
+    from llm_stub import start_stub_server
+    server, _, base_url = start_stub_server(latency=args.latency, first_token_latency=args.latency, tokens_per_second=5000)
+    clip = open(os.path.abspath(args.clip), 'rb').read()
+    workdir = tempfile.mkdtemp(prefix='panel-bench-')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'OPENAI_BASE_URL': base_url,
+        'OPENAI_API_KEY': 'stub-key',
+        'FFMPEG_BINARY': 'ffmpeg-disabled-for-benchmark'
+    })
+    os.chdir(workdir)
+
+    from app import create_app
+    from characters import CHARACTERS
+    from commands import upgrade_schema
+    from extensions import db, job_queue, llm
+    from models import PersonaFeedback
+    app = create_app()
+    app.logger.disabled = True
+    with app.app_context():
+        upgrade_schema()
+    usage = UsageCollector()
+    llm.observer = usage
+
+    client = app.test_client()
+    client.post('/register', data={'username': 'panel-bench', 'email': 'panel-bench@example.com', 'password': 'bench'})
+    client.post('/login', data={'username': 'panel-bench', 'password': 'bench'})
+
+    # A full analysis for one persona: what switching persona and re-uploading costs
+    started = time.perf_counter()
+    response = client.post('/upload', data={
+        'exercise_type': 'squat',
+        'notes': 'panel benchmark',
+        'file': (io.BytesIO(clip), 'panel-bench.mp4')
+    }, content_type='multipart/form-data')
+    session_id = int(response.headers['Location'].rstrip('/').rsplit('/', 1)[1])
+    job_queue.join()
+    report = {'reanalysis': usage.per(1, time.perf_counter() - started)}
+
+    extra = len(CHARACTERS) - 1
+    for mode in ('concurrent', 'batched'):
+        with app.app_context():
+            PersonaFeedback.query.filter_by(session_id=session_id).delete()
+            db.session.commit()
+        app.config['PANEL_MODE'] = mode
+        usage.reset()
+        started = time.perf_counter()
+        # The panel is generated by a background job; the request only queues it
+        client.post(f'/session/{session_id}/panel', json={})
+        job_queue.join()
+        elapsed = time.perf_counter() - started
+        with app.app_context():
+            generated = PersonaFeedback.query.filter_by(session_id=session_id).count()
+        report[f'panel_{mode}'] = dict(usage.per(max(generated, 1), elapsed), personas=generated)
+
+    for mode in ('concurrent', 'batched'):
+        report[f'panel_{mode}']['prompt_tokens_vs_reanalysis_percent'] = round(
+            100 * (report[f'panel_{mode}']['prompt_tokens_each'] - report['reanalysis']['prompt_tokens_each'])
+            / report['reanalysis']['prompt_tokens_each'], 1
+        )
+    report['extra_personas'] = extra
+    server.shutdown()
+    print(json.dumps(report, indent=2), file=report_stream)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
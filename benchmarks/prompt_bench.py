@@ -0,0 +1,123 @@
+"""
+Prompt size per template version, measured offline: estimated prompt tokens
+and the max_tokens requested for the analysis and feedback calls, for a few
+exercises and every persona, and how long building each prompt takes.
+
+    python benchmarks/prompt_bench.py
+    python benchmarks/prompt_bench.py --control 1 --candidate 2
+
+No model or network is used; token counts come from prompts.count_tokens(),
+so compare versions with it rather than reading the numbers as exact bills.
+Key frames are left out (each costs a fixed prompts.IMAGE_TOKENS either way).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+EXERCISES = ('squat', 'deadlift', 'bicep curl', 'lateral raise')
+
+NOTES = (
+    "Third working set after a long day, so I was pretty tired. I feel like my knees cave in a bit on the way up "
+    "and my lower back rounds at the bottom, but I'm not sure. The camera is slightly to the side. I've had some "
+    "hip tightness this week and skipped my usual warm-up because the gym was busy. "
+) * 3
+
+MEASUREMENTS = (
+    "\nJoint angles measured from the video by pose estimation:\n"
+    + "\n".join(f"- {joint}: min {40 + i * 7} deg, max {150 + i * 3} deg, mean {95 + i * 5} deg"
+                for i, joint in enumerate(('left knee', 'right knee', 'left hip', 'right hip', 'torso lean', 'left elbow')))
+    + "\nUse these measurements when judging depth, range of motion and posture.\n",
+    "\nRep count and tempo measured from the video:\n"
+    + "\n".join(f"- rep {n}: {1.1 + n / 10:.1f}s down, {0.9 + n / 20:.1f}s up, range of motion {88 - n}%" for n in range(1, 9))
+    + "\nBase your tempo and range of motion comments on these measurements.\n"
+)
+
+
+def verbose_analysis():
+    """
+    A long six-section analysis, like the v1 prompt tends to produce.
+    """
+    from llm_stub import STUB_ANALYSIS
+    sections = STUB_ANALYSIS.split('\n\n')
+    filler = [
+        "- Bar path drifts slightly forward of mid-foot during the first third of the ascent",
+        "- Breathing and bracing look inconsistent between reps, especially on the later ones",
+        "- Heels stay down but weight shifts toward the toes out of the hole"
+    ]
+    return '\n\n'.join(section + '\n' + '\n'.join(filler) for section in sections)
+
+
+def timed(build, repeat=200):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        prompt = build()
+    return prompt, round(1e6 * (time.perf_counter() - started) / repeat, 1)
+
+
+def measure(version):
+    from characters import CHARACTERS
+    from prompts import build_analysis_prompt, build_feedback_prompt, get_template
+
+    analysis_template = get_template('analysis', version)
+    feedback_template = get_template('feedback', version)
+    analysis = verbose_analysis()
+    report = {'analysis': {}, 'feedback': {}}
+    for exercise in EXERCISES:
+        prompt, micros = timed(lambda: build_analysis_prompt(analysis_template, exercise, NOTES, MEASUREMENTS))
+        report['analysis'][exercise] = {
+            'prompt_tokens': prompt.estimated_tokens,
+            'max_tokens': prompt.max_tokens,
+            'trimmed': prompt.trimmed,
+            'build_us': micros
+        }
+    for character in CHARACTERS.values():
+        prompt, micros = timed(lambda: build_feedback_prompt(feedback_template, 'squat', analysis, [character]))
+        report['feedback'][character.id] = {
+            'prompt_tokens': prompt.estimated_tokens,
+            'max_tokens': prompt.max_tokens,
+            'trimmed': prompt.trimmed,
+            'build_us': micros
+        }
+    return report
+
+
+def totals(report):
+    return {
+        kind: {
+            'prompt_tokens': sum(row['prompt_tokens'] for row in rows.values()),
+            'max_tokens': sum(row['max_tokens'] or 0 for row in rows.values())
+        }
+        for kind, rows in report.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--control', type=int, default=1, help='template version to compare against')
+    parser.add_argument('--candidate', type=int, default=2, help='template version being evaluated')
+    args = parser.parse_args()
+
+    control, candidate = measure(args.control), measure(args.candidate)
+    control_totals, candidate_totals = totals(control), totals(candidate)
+    change = {
+        kind: {
+            key: round(100 * (candidate_totals[kind][key] - value) / value, 1) if value else None
+            for key, value in control_totals[kind].items()
+        }
+        for kind in control_totals
+    }
+    print(json.dumps({
+        f'v{args.control}': control,
+        f'v{args.candidate}': candidate,
+        'totals': {f'v{args.control}': control_totals, f'v{args.candidate}': candidate_totals},
+        'change_percent': change
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
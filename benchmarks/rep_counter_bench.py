@@ -0,0 +1,108 @@
+"""
+CPU cost of rep counting after decode, on a synthetic 1080p clip of a lifter
+squatting or on a real video.
+
+    python benchmarks/rep_counter_bench.py --seconds 30 --fps 30
+    python benchmarks/rep_counter_bench.py --video uploads/squat.mp4 --sample-fps 10
+
+Decoding is excluded: the synthetic frames are generated up front, and for
+real videos the decode stage is reported separately.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frames import extract_keyframes, motion_thumbnail  # noqa: E402
+from reps import rep_metrics  # noqa: E402
+
+
+def synthetic_clip(seconds, fps, rep_seconds, width=1920, height=1080):
+    """
+    Yield BGR frames of a tall block standing in for the lifter: it moves
+    down for 2/5 of each rep, up for 3/10 and pauses at the top, over a
+    fixed noisy background. Each stroke eases in and out, as a lifter slows
+    to turn around.
+    """
+    background = np.random.default_rng(0).integers(0, 40, (height, width, 3), dtype=np.uint8)
+    for index in range(int(seconds * fps)):
+        phase = (index / fps) % rep_seconds / rep_seconds
+        if phase < 0.4:
+            depth = (1 - np.cos(np.pi * phase / 0.4)) / 2
+        elif phase < 0.7:
+            depth = (1 + np.cos(np.pi * (phase - 0.4) / 0.3)) / 2
+        else:
+            depth = 0.0
+        top = int(height * (0.1 + 0.3 * depth))
+        frame = background.copy()
+        frame[top:top + height // 2, width // 3:2 * width // 3] = 220
+        yield frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--video', help='benchmark a real file instead of the synthetic clip')
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--fps', type=float, default=30.0, help='synthetic clip frame rate (every frame is analyzed)')
+    parser.add_argument('--rep-seconds', type=float, default=4.0)
+    parser.add_argument('--sample-fps', type=float, default=10.0, help='sampling rate for --video')
+    parser.add_argument('--exercise', default='squat')
+    args = parser.parse_args()
+
+    if args.video:
+        started = time.perf_counter()
+        batch = extract_keyframes(args.video, sample_fps=args.sample_fps)
+        wall = time.perf_counter() - started
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        metrics = rep_metrics(args.exercise, batch.timestamps, batch.thumbnails)
+        segmentation = time.perf_counter() - started
+        report = {
+            'video': args.video,
+            'samples': batch.sampled,
+            'decode_seconds': round(batch.timings.get('decode', 0.0), 4),
+            'post_decode_seconds': round(wall - batch.timings.get('decode', 0.0) + segmentation, 4),
+            'segmentation_seconds': round(segmentation, 4),
+            'segmentation_cpu_seconds': round(time.process_time() - cpu_started, 4),
+            'reps': metrics
+        }
+        print(json.dumps(report, indent=2))
+        return
+
+    frames = list(synthetic_clip(args.seconds, args.fps, args.rep_seconds))
+    expected_reps = int(args.seconds // args.rep_seconds)
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    # The same per-sample work extract_keyframes does before rep segmentation
+    thumbs = [motion_thumbnail(frame) for frame in frames]
+    thumbnail_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    metrics = rep_metrics(args.exercise, [index / args.fps for index in range(len(frames))], np.stack(thumbs))
+    segmentation_seconds = time.perf_counter() - started
+    cpu_seconds = time.process_time() - cpu_started
+
+    report = {
+        'frames': len(frames),
+        'resolution': '1920x1080',
+        'expected_reps': expected_reps,
+        'counted_reps': metrics['count'],
+        'expected_eccentric': round(0.4 * args.rep_seconds, 2),
+        'expected_concentric': round(0.3 * args.rep_seconds, 2),
+        'mean_eccentric': metrics['mean_eccentric'],
+        'mean_concentric': metrics['mean_concentric'],
+        'thumbnail_seconds': round(thumbnail_seconds, 4),
+        'segmentation_seconds': round(segmentation_seconds, 4),
+        'post_decode_cpu_seconds': round(cpu_seconds, 4),
+        'per_frame_ms': round(1000 * (thumbnail_seconds + segmentation_seconds) / len(frames), 3)
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Worker startup cost: how long a fresh process takes to import the WSGI app
+and answer its first request, and which heavy modules that pulls in.
+
+    python benchmarks/startup_bench.py
+    python benchmarks/startup_bench.py --baseline-ref e8187a6 --baseline-entry app:app
+
+Each measurement runs in a new interpreter, like a gunicorn worker booting
+without --preload. With --baseline-ref the same is measured for that commit,
+extracted with git archive, so the change can be compared on one machine.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that dominate import time when loaded eagerly
+HEAVY_MODULES = ('cv2', 'numpy', 'aiohttp', 'requests', 'openai', 'moviepy')
+
+CHILD = '''
+import importlib, json, os, resource, sys, time
+root, entry, workdir = sys.argv[1:4]
+sys.path.insert(0, root)
+os.chdir(workdir)
+module_name, attribute = entry.split(':')
+started = time.perf_counter()
+app = getattr(importlib.import_module(module_name), attribute)
+imported = time.perf_counter()
+response = app.test_client().get('/login')
+answered = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - started,
+    'first_request_seconds': answered - imported,
+    'status': response.status_code,
+    'heavy_modules': [name for name in sys.argv[4:] if name in sys.modules],
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}))
+'''
+
+
+def measure(root, entry, runs):
+    """
+    Median timings over several fresh interpreters.
+    """
+    samples = []
+    for _ in range(runs):
+        workdir = tempfile.mkdtemp(prefix='startup-bench-')
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        try:
+            result = subprocess.run(
+                [sys.executable, '-c', CHILD, root, entry, workdir, *HEAVY_MODULES],
+                env=env, capture_output=True, text=True, check=True
+            )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {
+        'entry': entry,
+        'import_ms': round(1000 * statistics.median(sample['import_seconds'] for sample in samples), 1),
+        'first_request_ms': round(1000 * statistics.median(sample['first_request_seconds'] for sample in samples), 1),
+        'status': samples[-1]['status'],
+        'heavy_modules': samples[-1]['heavy_modules'],
+        'max_rss_mb': round(statistics.median(sample['max_rss_mb'] for sample in samples), 1)
+    }
+
+
+def checkout(ref):
+    """
+    Extract a commit's tree into a temporary directory.
+    """
+    target = tempfile.mkdtemp(prefix='startup-baseline-')
+    archive = subprocess.run(['git', 'archive', ref], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', target], input=archive, check=True)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entry', default='main:app', help='module:attribute of the WSGI app')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per measurement')
+    parser.add_argument('--baseline-ref', help='git commit to compare with')
+    parser.add_argument('--baseline-entry', default='app:app', help='WSGI app at the baseline commit')
+    args = parser.parse_args()
+
+    report = {'current': measure(ROOT, args.entry, args.runs)}
+    if args.baseline_ref:
+        baseline_root = checkout(args.baseline_ref)
+        try:
+            report['baseline'] = dict(measure(baseline_root, args.baseline_entry, args.runs), ref=args.baseline_ref)
+        finally:
+            shutil.rmtree(baseline_root, ignore_errors=True)
+        report['import_change_percent'] = round(
+            100 * (report['current']['import_ms'] - report['baseline']['import_ms']) / report['baseline']['import_ms'], 1
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
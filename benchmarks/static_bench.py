@@ -0,0 +1,103 @@
+"""
+Static bytes per page load, with and without the asset build: a first visit
+fetches every stylesheet, script and icon a page links; a repeat visit skips
+what the browser may reuse unasked (immutable, within max-age) and
+revalidates the rest.
+
+    python benchmarks/static_bench.py
+    python benchmarks/static_bench.py --page /login --page /form-guidelines
+
+Runs "flask build-assets" into static/build/ first, as a deploy would.
+Header bytes are not counted, so a 304 counts as zero.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ASSET_URL_RE = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+
+
+def page_load(client, page, cache):
+    """
+    Load a page and its static assets through a browser-like cache (url ->
+    (etag, reusable)). Returns (requests, body bytes) for the assets.
+    """
+    html = client.get(page).get_data(as_text=True)
+    requests_, transferred = 0, 0
+    for url in sorted(set(ASSET_URL_RE.findall(html))):
+        etag, reusable = cache.get(url, (None, False))
+        if reusable:
+            continue
+        headers = {'Accept-Encoding': 'br, gzip'}
+        if etag:
+            headers['If-None-Match'] = etag
+        response = client.get(url, headers=headers)
+        requests_ += 1
+        if response.status_code != 200:
+            continue
+        transferred += len(response.data)
+        cache_control = response.cache_control
+        cache[url] = (response.headers.get('ETag'), bool(cache_control.immutable and cache_control.max_age))
+    return requests_, transferred
+
+
+def measure(app, pages):
+    client = app.test_client()
+    client.post('/register', data={'username': 'static-bench', 'email': 'static-bench@example.com', 'password': 'bench'})
+    client.post('/login', data={'username': 'static-bench', 'password': 'bench'})
+    report = {}
+    for page in pages:
+        cache = {}
+        first = page_load(client, page, cache)
+        repeat = page_load(client, page, cache)
+        report[page] = {
+            'first_requests': first[0], 'first_bytes': first[1],
+            'repeat_requests': repeat[0], 'repeat_bytes': repeat[1]
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page', action='append', help='page to load (repeatable)')
+    args = parser.parse_args()
+    pages = args.page or ['/', '/login', '/dashboard', '/form-guidelines']
+
+    # The app prints progress messages; keep stdout for the JSON report
+    report_stream, sys.stdout = sys.stdout, sys.stderr
+
+    workdir = tempfile.mkdtemp(prefix='static-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+
+    from app import create_app
+    from assets import build
+    from commands import upgrade_schema
+
+    report = {}
+    for label, fingerprints in (('plain', False), ('built', True)):
+        app = create_app({'ASSET_FINGERPRINTS': fingerprints})
+        app.logger.disabled = True
+        if fingerprints:
+            build(app.static_folder)
+            app = create_app({'ASSET_FINGERPRINTS': True})
+        with app.app_context():
+            upgrade_schema()
+        report[label] = measure(app, pages)
+    report['totals'] = {
+        label: {key: sum(row[key] for row in report[label].values()) for key in next(iter(report[label].values()))}
+        for label in ('plain', 'built')
+    }
+    print(json.dumps(report, indent=2), file=report_stream)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
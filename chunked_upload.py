@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import uuid
+
+# Bytes copied from the request stream to disk per read
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# Partial uploads untouched for this long are removed
+STALE_UPLOAD_AGE = 24 * 3600
+
+MP4_EXTENSIONS = {'mp4', 'mov'}
+
+
+class UploadError(Exception):
+    """
+    Raised for a rejected chunk or upload. status is the HTTP status to return.
+    """
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUploadStore:
+    """
+    Resumable uploads written straight to disk under <upload_folder>/.partial.
+
+    Each upload has a .part data file and a .json metadata file, so any
+    gunicorn worker can accept the next chunk. The running SHA-256 is kept in
+    memory by the worker that received the previous chunk; a worker that does
+    not have it rebuilds it once from the partial file.
+    """
+
+    def __init__(self, upload_folder=None, max_size=0, max_duration=0, header_probe_bytes=2 * 1024 * 1024):
+        self.folder = None
+        self.max_size = max_size
+        self.max_duration = max_duration
+        self.header_probe_bytes = header_probe_bytes
+        self._hashers = {}
+        self._lock = threading.Lock()
+        if upload_folder is not None:
+            self.set_folder(upload_folder)
+
+    def init_app(self, app, max_duration):
+        """
+        Store uploads under the app's upload folder, within its size limit.
+        """
+        self.max_size = app.config['MAX_CONTENT_LENGTH']
+        self.max_duration = max_duration
+        self.set_folder(app.config['UPLOAD_FOLDER'])
+
+    def set_folder(self, upload_folder):
+        self.folder = os.path.join(upload_folder, '.partial')
+        os.makedirs(self.folder, exist_ok=True)
+
+    def create(self, user_id, filename, size, **fields):
+        """
+        Start a new upload and return its metadata.
+        """
+        if size <= 0:
+            raise UploadError('File is empty')
+        if size > self.max_size:
+            raise UploadError(f'File is larger than {self.max_size // (1024 * 1024)}MB', status=413)
+        self.remove_stale()
+
+        meta = dict(fields)
+        meta.update({
+            'upload_id': uuid.uuid4().hex,
+            'user_id': user_id,
+            'filename': filename,
+            'size': size,
+            'offset': 0,
+            'header_checked': False,
+            'created_at': time.time()
+        })
+        open(self._data_path(meta['upload_id']), 'wb').close()
+        self._save_meta(meta)
+        with self._lock:
+            self._hashers[meta['upload_id']] = (0, hashlib.sha256())
+        return meta
+
+    def get(self, upload_id, user_id):
+        """
+        Load an upload's metadata, checking that it belongs to user_id.
+        """
+        try:
+            with open(self._meta_path(upload_id)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise UploadError('Upload not found', status=404)
+        if meta['user_id'] != user_id:
+            raise UploadError('Upload not found', status=404)
+        return meta
+
+    def append(self, meta, offset, stream):
+        """
+        Stream a chunk from a file-like object to disk at offset.
+        The offset must equal the bytes already received so clients can resume.
+        """
+        if offset != meta['offset']:
+            raise UploadError('Offset mismatch', status=409, offset=meta['offset'])
+
+        # Work on a copy so a chunk that fails part-way leaves the stored state intact
+        hasher = self._hasher(meta).copy()
+        received = meta['offset']
+        with open(self._data_path(meta['upload_id']), 'r+b') as f:
+            f.seek(received)
+            f.truncate()
+            while True:
+                block = stream.read(STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                received += len(block)
+                if received > meta['size']:
+                    raise UploadError('Chunk exceeds declared file size', status=413, offset=meta['offset'])
+                f.write(block)
+                hasher.update(block)
+
+        meta['offset'] = received
+        with self._lock:
+            self._hashers[meta['upload_id']] = (received, hasher)
+
+        if not meta['header_checked'] and (received >= self.header_probe_bytes or received == meta['size']):
+            self._check_header(meta)
+        self._save_meta(meta)
+        return meta
+
+    def finish(self, meta, destination):
+        """
+        Move a fully received upload to destination and return its SHA-256.
+        """
+        if meta['offset'] != meta['size']:
+            raise UploadError('Upload is incomplete', status=409, offset=meta['offset'])
+        content_hash = self._hasher(meta).hexdigest()
+        os.replace(self._data_path(meta['upload_id']), destination)
+        self.discard(meta['upload_id'])
+        return content_hash
+
+    def discard(self, upload_id):
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+        for path in (self._data_path(upload_id), self._meta_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def remove_stale(self):
+        cutoff = time.time() - STALE_UPLOAD_AGE
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                self.discard(name[:-len('.json')])
+
+    def _check_header(self, meta):
+        # Reject over-long clips as soon as the container header is readable
+        meta['header_checked'] = True
+        extension = meta['filename'].rsplit('.', 1)[-1].lower()
+        if extension not in MP4_EXTENSIONS:
+            return
+        duration = mp4_duration(self._data_path(meta['upload_id']), meta['offset'])
+        if duration is None:
+            # moov box is at the end of the file; the final probe will check it
+            return
+        meta['duration'] = duration
+        if duration > self.max_duration:
+            self.discard(meta['upload_id'])
+            raise UploadError(f'Video must be {self.max_duration} seconds or shorter', status=422)
+
+    def _hasher(self, meta):
+        with self._lock:
+            offset, hasher = self._hashers.get(meta['upload_id'], (None, None))
+        if offset == meta['offset']:
+            return hasher
+        hasher = hashlib.sha256()
+        with open(self._data_path(meta['upload_id']), 'rb') as f:
+            remaining = meta['offset']
+            while remaining > 0:
+                block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+        return hasher
+
+    def _save_meta(self, meta):
+        path = self._meta_path(meta['upload_id'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+
+    def _data_path(self, upload_id):
+        return os.path.join(self.folder, os.path.basename(upload_id) + '.part')
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.folder, os.path.basename(upload_id) + '.json')
+
+
+def mp4_duration(path, available):
+    """
+    Read the duration in seconds from the moov box of an MP4/MOV file, looking
+    only at the first `available` bytes. Returns None if moov isn't there yet.
+    """
+    with open(path, 'rb') as f:
+        position = 0
+        while position + 8 <= available:
+            f.seek(position)
+            size, box_type = struct.unpack('>I4s', f.read(8))
+            header = 8
+            if size == 1:
+                size = struct.unpack('>Q', f.read(8))[0]
+                header = 16
+            elif size == 0:
+                size = available - position
+            if size < header:
+                return None
+            if box_type == b'moov':
+                if position + size > available:
+                    return None
+                return _moov_duration(f.read(size - header))
+            position += size
+    return None
+
+
+def _moov_duration(moov):
+    timescale = None
+    duration = 0
+    fragment_duration = 0
+    for box_type, body in _iter_boxes(moov):
+        if box_type == b'mvhd':
+            if body[0] == 1:
+                timescale, duration = struct.unpack('>IQ', body[20:32])
+            else:
+                timescale, duration = struct.unpack('>II', body[12:20])
+        elif box_type == b'mvex':
+            for child_type, child in _iter_boxes(body):
+                if child_type == b'mehd':
+                    fmt = '>Q' if child[0] == 1 else '>I'
+                    fragment_duration = struct.unpack_from(fmt, child, 4)[0]
+    if not timescale:
+        return None
+    # Fragmented files leave mvhd empty and put the total in mvex/mehd
+    return (duration or fragment_duration) / float(timescale) or None
+
+
+def _iter_boxes(data):
+    position = 0
+    while position + 8 <= len(data):
+        size, box_type = struct.unpack_from('>I4s', data, position)
+        if size < 8:
+            return
+        yield box_type, data[position + 8:position + size]
+        position += size
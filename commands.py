@@ -0,0 +1,219 @@
+"""
+Maintenance commands, registered at the top level of the flask CLI:
+
+    flask --app app migrate-db
+    flask --app app prompt-report --days 7
+    flask --app app build-assets
+"""
+from datetime import datetime, timedelta
+
+import click
+from flask import Blueprint, current_app
+
+import assets
+import migrations
+import pose
+from config import IMPORT_BATCH_SIZE
+from extensions import db, job_queue
+from models import ExerciseProgress, User, WorkoutSession
+from prompts import summarize_usage
+from session_export import FORMATS as EXPORT_FORMATS, SessionImportError, export_lines, parse_date_range, read_records
+from workouts import (
+    UNFINISHED_STATUSES, enqueue_analysis, enqueue_media, import_session_records, session_export_rows,
+    sync_session_progress
+)
+
+commands = Blueprint('commands', __name__, cli_group=None)
+
+
+def upgrade_schema():
+    """
+    Apply pending schema migrations (see migrations.py).
+    """
+    for migration in migrations.upgrade(db.engine, db.metadata):
+        print(f"Applied migration {migration.version}: {migration.name}")
+
+
+@commands.cli.command('migrate-db')
+def migrate_db():
+    """
+    Create or upgrade the database schema. Run before starting the workers.
+    """
+    upgrade_schema()
+    with db.engine.connect() as connection:
+        print(f"Database at version {max(migrations.applied_versions(connection), default=0)}")
+
+
+@commands.cli.command('export-sessions')
+@click.argument('username')
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='jsonl')
+@click.option('--since', help='first day to include (ISO date)')
+@click.option('--until', help='last day to include (ISO date)')
+@click.option('--exercise', help='only sessions of this exercise')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='file to write (default: stdout)')
+def export_sessions_command(username, export_format, since, until, exercise, output):
+    """
+    Stream a user's sessions as JSONL or CSV.
+    """
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"No user named {username}")
+    try:
+        start, end = parse_date_range(since, until)
+    except ValueError:
+        raise click.BadParameter('--since and --until must be ISO 8601 dates')
+    for line in export_lines(session_export_rows(user.id, start, end, exercise), export_format):
+        output.write(line)
+
+
+@commands.cli.command('import-sessions')
+@click.argument('username')
+@click.argument('source', type=click.File('rb'))
+@click.option('--format', 'import_format', type=click.Choice(list(EXPORT_FORMATS)), help='default: from the file extension')
+@click.option('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+def import_sessions_command(username, source, import_format, batch_size):
+    """
+    Bulk import a JSONL or CSV export into a user's sessions.
+    """
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"No user named {username}")
+    import_format = import_format or ('csv' if source.name.endswith('.csv') else 'jsonl')
+    try:
+        imported = import_session_records(read_records(source, import_format), user.id, batch_size)
+    except SessionImportError as e:
+        raise click.ClickException(f"{e} ({e.imported} sessions imported before the error)")
+    print(f"Imported {imported} sessions")
+
+
+@commands.cli.command('rebuild-progress')
+def rebuild_progress():
+    """
+    Recompute every progress rollup from the sessions, e.g. after changing
+    how contributions are computed.
+    """
+    upgrade_schema()
+    ExerciseProgress.query.delete()
+    WorkoutSession.query.update({WorkoutSession.progress_contribution: None})
+    db.session.commit()
+    last_id = 0
+    while True:
+        batch = WorkoutSession.query.filter(WorkoutSession.id > last_id).order_by(WorkoutSession.id).limit(200).all()
+        if not batch:
+            break
+        for workout in batch:
+            sync_session_progress(workout)
+        db.session.commit()
+        last_id = batch[-1].id
+    print(f"Rebuilt {ExerciseProgress.query.count()} progress rollups")
+
+
+@commands.cli.command('requeue-analyses')
+def requeue_analyses():
+    """
+    Re-run analyses left pending by a restarted worker and wait for them.
+    """
+    upgrade_schema()
+    pending = WorkoutSession.query.filter(WorkoutSession.status.in_(UNFINISHED_STATUSES)).all()
+    for workout in pending:
+        enqueue_analysis(workout.id)
+    job_queue.join()
+    print(f"Requeued {len(pending)} analyses")
+
+
+@commands.cli.command('generate-media')
+def generate_media():
+    """
+    Create playback derivatives for video sessions that do not have them yet.
+    """
+    upgrade_schema()
+    pending = WorkoutSession.query.filter(
+        WorkoutSession.file_type == 'video',
+        WorkoutSession.media.is_(None)
+    ).with_entities(WorkoutSession.id).all()
+    for (session_id,) in pending:
+        enqueue_media(session_id)
+    job_queue.join()
+    print(f"Generated media for {len(pending)} sessions")
+
+
+@commands.cli.command('backfill-analysis-sections')
+def backfill_analysis_sections():
+    """
+    Parse the analysis text of sessions stored before sections were saved.
+    """
+    upgrade_schema()
+    updated = 0
+    while True:
+        batch = WorkoutSession.query.filter(
+            WorkoutSession.analysis_sections.is_(None),
+            WorkoutSession.analysis.isnot(None)
+        ).limit(200).all()
+        if not batch:
+            break
+        for workout in batch:
+            workout.set_analysis(workout.analysis)
+        db.session.commit()
+        updated += len(batch)
+    print(f"Backfilled {updated} sessions")
+
+
+@commands.cli.command('build-assets')
+def build_assets():
+    """
+    Minify, fingerprint and precompress the static CSS/JS. Run at deploy
+    time, before the workers start.
+    """
+    assets.build(current_app.static_folder)
+
+
+@commands.cli.command('fetch-pose-model')
+@click.option('--optional', is_flag=True, help='warn instead of failing when the model cannot be installed')
+def fetch_pose_model(optional):
+    """
+    Download the pinned pose estimation network (about 16 MB) to
+    POSE_MODEL_PATH. Run at build time; a file already in place with the
+    right checksum is kept. Without the model, analysis still runs and rep
+    counts come from frame motion, so deploys pass --optional.
+    """
+    try:
+        pose.fetch_model(current_app.config)
+    except (OSError, ValueError) as e:
+        if not optional:
+            raise click.ClickException(str(e))
+        print(f"Pose model not installed, pose estimation stays disabled: {e}")
+        return
+    print(f"Pose model ready at {current_app.config['POSE_MODEL_PATH']}")
+
+
+@commands.cli.command('prompt-report')
+@click.option('--days', type=int, help='only sessions from the last N days')
+def prompt_report(days):
+    """
+    Compare token counts and latency of the prompt versions in use, with
+    each candidate's change against the configured version.
+    """
+    query = WorkoutSession.query.filter(WorkoutSession.llm_usage.isnot(None))
+    if days:
+        query = query.filter(WorkoutSession.created_at >= datetime.utcnow() - timedelta(days=days))
+    usage = (row.llm_usage for row in query.with_entities(WorkoutSession.llm_usage).yield_per(500))
+    summary = summarize_usage(usage)
+    if not summary:
+        print("No sessions with recorded LLM usage")
+        return
+
+    control = {
+        row['kind']: row for row in summary
+        if row['version'] == current_app.config[f"{row['kind'].upper()}_PROMPT_VERSION"]
+    }
+    columns = ('mean_prompt_tokens', 'mean_completion_tokens', 'mean_latency_ms', 'p95_latency_ms')
+    print(f"{'kind':<9}{'version':>8}{'sessions':>10}" + ''.join(f"{name:>24}" for name in columns))
+    for row in summary:
+        baseline = control.get(row['kind'])
+        cells = []
+        for name in columns:
+            cell = '-' if row[name] is None else f"{row[name]:g}"
+            if baseline and baseline is not row and row[name] is not None and baseline[name]:
+                cell += f" ({100 * (row[name] - baseline[name]) / baseline[name]:+.1f}%)"
+            cells.append(f"{cell:>24}")
+        print(f"{row['kind']:<9}{row['version']:>8}{row['sessions']:>10}" + ''.join(cells))
@@ -0,0 +1,139 @@
+"""
+Settings read from the environment (and a .env file) when the app is created.
+"""
+import os
+
+from dotenv import load_dotenv
+
+from database import normalize_database_url
+
+UPLOAD_FOLDER = 'uploads'
+ALLOWED_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv'}
+MAX_VIDEO_DURATION = 30  # seconds
+EXERCISE_NAME_LENGTH = 120  # longest stored exercise name (catalog names reach 55)
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 100 * 1024 * 1024))  # bytes
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # bytes per chunk suggested to chunked-upload clients
+SESSIONS_PER_PAGE = 20
+EXPORT_BATCH_SIZE = 500  # rows fetched per round trip while streaming an export
+IMPORT_BATCH_SIZE = 500  # rows inserted per transaction by a bulk import
+SSE_MAX_SECONDS = 600  # longest a progress stream stays open
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def load_config(config):
+    """
+    Fill a Flask config from environment variables.
+    """
+    # Load environment variables from .env file
+    load_dotenv()
+
+    config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    # Werkzeug rejects larger request bodies from Content-Length before reading them
+    config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
+
+    # Set your OpenAI API key securely via environment variables
+    config['OPENAI_API_KEY'] = os.getenv("OPENAI_API_KEY")  # Now loaded from .env
+    config['OPENAI_BASE_URL'] = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+    config['LLM_TIMEOUT'] = float(os.getenv('LLM_TIMEOUT', 60))  # seconds per call
+    config['LLM_MAX_RETRIES'] = int(os.getenv('LLM_MAX_RETRIES', 4))
+    config['LLM_POOL_SIZE'] = int(os.getenv('LLM_POOL_SIZE', 10))
+
+    # Database configuration
+    config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(os.getenv('DATABASE_URL', 'sqlite:///app.db'))
+    # Connection pool per worker process: enough for its request threads plus background jobs
+    config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+    config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 5))
+    config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 30))  # seconds
+    config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds
+    config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'wal')
+    config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', 30000))  # milliseconds
+    config['SECRET_KEY'] = os.getenv("SECRET_KEY") or 'your_secret_key_here'  # Use value from .env
+
+    # Background analysis settings
+    config['ANALYSIS_WORKERS'] = int(os.getenv('ANALYSIS_WORKERS', 2))
+    config['ANALYSIS_MAX_ATTEMPTS'] = int(os.getenv('ANALYSIS_MAX_ATTEMPTS', 3))
+    config['ANALYSIS_RETRY_BACKOFF'] = float(os.getenv('ANALYSIS_RETRY_BACKOFF', 2.0))
+    # Unfinished analyses untouched this long are assumed to belong to a dead
+    # worker when requeue_stale_analyses is called without a server start
+    # time; workers starting under gunicorn only requeue a previous server's
+    # sessions
+    config['ANALYSIS_STALE_SECONDS'] = int(os.getenv('ANALYSIS_STALE_SECONDS', 900))
+
+    # Frame sampling settings for the vision analysis call
+    config['ANALYSIS_MODEL'] = os.getenv('ANALYSIS_MODEL', 'gpt-3.5-turbo')
+    config['VISION_MODEL'] = os.getenv('VISION_MODEL', 'gpt-4o-mini')
+    config['FRAME_SAMPLE_FPS'] = float(os.getenv('FRAME_SAMPLE_FPS', 2.0))
+    config['FRAME_MAX_BATCH'] = int(os.getenv('FRAME_MAX_BATCH', 8))
+    config['FRAME_MAX_DIMENSION'] = int(os.getenv('FRAME_MAX_DIMENSION', 512))
+    config['FRAME_JPEG_QUALITY'] = int(os.getenv('FRAME_JPEG_QUALITY', 70))
+    config['REP_SAMPLE_FPS'] = float(os.getenv('REP_SAMPLE_FPS', 10.0))  # motion signal for rep counting
+    config['FEEDBACK_MODEL'] = os.getenv('FEEDBACK_MODEL', 'gpt-4')
+    # Panel feedback from several personas: 'concurrent' sends one request per
+    # persona in parallel, 'batched' asks for all of them in one completion
+    config['PANEL_MODE'] = os.getenv('PANEL_MODE', 'concurrent')
+    # Prompt template versions (see prompts.py). A candidate version is served
+    # to PROMPT_AB_PERCENT of uploads so its tokens and latency can be compared
+    # with "flask --app app prompt-report"
+    config['ANALYSIS_PROMPT_VERSION'] = int(os.getenv('ANALYSIS_PROMPT_VERSION', 2))
+    config['FEEDBACK_PROMPT_VERSION'] = int(os.getenv('FEEDBACK_PROMPT_VERSION', 2))
+    config['ANALYSIS_PROMPT_CANDIDATE'] = int(os.getenv('ANALYSIS_PROMPT_CANDIDATE', 0)) or None
+    config['FEEDBACK_PROMPT_CANDIDATE'] = int(os.getenv('FEEDBACK_PROMPT_CANDIDATE', 0)) or None
+    config['PROMPT_AB_PERCENT'] = float(os.getenv('PROMPT_AB_PERCENT', 0))
+
+    # On-device pose estimation (skipped when no model file is installed;
+    # "flask fetch-pose-model" downloads the default network to POSE_MODEL_PATH).
+    # POSE_CONFIG_PATH is only needed for networks split in two files (e.g. Caffe)
+    config['POSE_MODEL_PATH'] = os.getenv('POSE_MODEL_PATH', os.path.join('models', 'pose', 'lightweight_pose_estimation_201912.onnx'))
+    config['POSE_CONFIG_PATH'] = os.getenv('POSE_CONFIG_PATH', '')
+    config['POSE_SAMPLE_FPS'] = float(os.getenv('POSE_SAMPLE_FPS', 5.0))
+    config['POSE_INPUT_SIZE'] = int(os.getenv('POSE_INPUT_SIZE', 256))
+    config['POSE_BATCH_SIZE'] = int(os.getenv('POSE_BATCH_SIZE', 8))
+    # Input normalization, (pixel - mean) * scale; these match lightweight OpenPose
+    config['POSE_INPUT_MEAN'] = float(os.getenv('POSE_INPUT_MEAN', 128.0))
+    config['POSE_INPUT_SCALE'] = float(os.getenv('POSE_INPUT_SCALE', 1 / 256.0))
+    config['POSE_MAX_SECONDS'] = float(os.getenv('POSE_MAX_SECONDS', 5.0))  # CPU budget per clip; long clips get fewer pose frames
+
+    # Playback derivatives: web rendition (needs ffmpeg), poster and sprite strip
+    config['FFMPEG_BINARY'] = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+    config['MEDIA_WEB_MAX_DIMENSION'] = int(os.getenv('MEDIA_WEB_MAX_DIMENSION', 854))
+    config['MEDIA_WEB_CRF'] = int(os.getenv('MEDIA_WEB_CRF', 28))
+    config['MEDIA_POSTER_MAX_DIMENSION'] = int(os.getenv('MEDIA_POSTER_MAX_DIMENSION', 640))
+    config['MEDIA_SPRITE_FRAMES'] = int(os.getenv('MEDIA_SPRITE_FRAMES', 10))
+    config['MEDIA_SPRITE_WIDTH'] = int(os.getenv('MEDIA_SPRITE_WIDTH', 160))
+
+    # Media delivery: '' streams files from Flask, 'x-accel' hands them to nginx via
+    # X-Accel-Redirect (MEDIA_ACCEL_PREFIX must be an internal location aliased to
+    # the upload folder) and 'x-sendfile' uses Apache/lighttpd's X-Sendfile
+    config['MEDIA_OFFLOAD'] = os.getenv('MEDIA_OFFLOAD', '')
+    config['MEDIA_ACCEL_PREFIX'] = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-uploads/')
+    config['USE_X_SENDFILE'] = config['MEDIA_OFFLOAD'] == 'x-sendfile'
+    config['MEDIA_IMMUTABLE_MAX_AGE'] = int(os.getenv('MEDIA_IMMUTABLE_MAX_AGE', 365 * 24 * 3600))
+    config['EXERCISE_SUGGEST_MAX_AGE'] = int(os.getenv('EXERCISE_SUGGEST_MAX_AGE', 3600))
+    # Shared-cache lifetime of the form guidelines API (pages revalidate with ETags)
+    config['CATALOG_MAX_AGE'] = int(os.getenv('CATALOG_MAX_AGE', 3600))
+    # Serve the fingerprinted CSS/JS from "flask --app app build-assets" when it has been run
+    config['ASSET_FINGERPRINTS'] = os.getenv('ASSET_FINGERPRINTS', 'true').lower() == 'true'
+    config['ASSET_MAX_AGE'] = int(os.getenv('ASSET_MAX_AGE', 365 * 24 * 3600))
+
+    # Rendered session fragments (see fragment_cache.py): 'memory' is a per-worker
+    # LRU capped at FRAGMENT_CACHE_MAX_BYTES, 'disk' is shared by the workers on
+    # a host (default instance/fragments), 'none' disables it
+    config['FRAGMENT_CACHE'] = os.getenv('FRAGMENT_CACHE', 'memory')
+    config['FRAGMENT_CACHE_MAX_BYTES'] = int(os.getenv('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    config['FRAGMENT_CACHE_DIR'] = os.getenv('FRAGMENT_CACHE_DIR', '')
+
+    # Analysis cache settings
+    config['ANALYSIS_CACHE_TTL'] = int(os.getenv('ANALYSIS_CACHE_TTL', 30 * 24 * 3600))  # seconds
+    config['ANALYSIS_CACHE_MAX_ENTRIES'] = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 5000))
+
+    # Instrumentation: timing spans, query counts, LLM metrics and /metrics; off by default
+    config['INSTRUMENTATION_ENABLED'] = os.getenv('INSTRUMENTATION_ENABLED', 'false').lower() == 'true'
+    config['JSON_LOGS'] = os.getenv('JSON_LOGS', 'false').lower() == 'true'  # one JSON trace line per request and job
+    config['SLOW_REQUEST_SECONDS'] = float(os.getenv('SLOW_REQUEST_SECONDS', 2.0))  # printed when JSON_LOGS is off
+    config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')  # bearer token required for /metrics when set
+    # Sampling profiler: a fraction of requests (or any with an X-Profile header)
+    # is profiled and kept as a folded-stack file when slower than PROFILE_SLOW_SECONDS
+    config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+    config['PROFILE_HEADER_ENABLED'] = os.getenv('PROFILE_HEADER_ENABLED', 'false').lower() == 'true'
+    config['PROFILE_SLOW_SECONDS'] = float(os.getenv('PROFILE_SLOW_SECONDS', 1.0))
+    config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', 'profiles')
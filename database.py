@@ -0,0 +1,65 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def normalize_database_url(url):
+    """
+    Accept the postgres:// scheme Render and Heroku hand out, which
+    SQLAlchemy 1.4+ no longer recognizes.
+    """
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def engine_options(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the configured database. Pools are per
+    process, so DB_POOL_SIZE should cover one worker's request threads plus
+    its background job threads.
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite':
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            # Drop connections the server closed while idle instead of failing a request on them
+            'pool_pre_ping': True
+        }
+    options = {
+        # pysqlite's own busy handler, in seconds; PRAGMA busy_timeout below sets the same
+        'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT'] / 1000, 'check_same_thread': False}
+    }
+    if url.database and url.database != ':memory:':
+        options.update(pool_size=config['DB_POOL_SIZE'], max_overflow=config['DB_MAX_OVERFLOW'])
+    return options
+
+
+def configure_engine(engine, config):
+    """
+    Per-connection SQLite settings. WAL lets readers carry on while one
+    writer commits, and the busy timeout makes concurrent writers (other
+    gunicorn workers, background jobs) wait for the lock instead of failing
+    with "database is locked".
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    journal_mode = config['SQLITE_JOURNAL_MODE']
+    busy_timeout = config['SQLITE_BUSY_TIMEOUT']
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+        if journal_mode:
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+            if journal_mode.lower() == 'wal':
+                # Durable across application crashes; only an OS crash can lose the last commits
+                cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()
@@ -0,0 +1,274 @@
+import json
+import os
+import re
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+import numpy as np
+
+from config import EXERCISE_NAME_LENGTH
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'exercise_catalog.json')
+
+# Fuzzy matches must be at least this similar (same cutoff get_close_matches used)
+FUZZY_CUTOFF = 0.8
+
+# Trigram candidates re-scored with SequenceMatcher per fuzzy lookup
+FUZZY_CANDIDATES = 25
+
+# Distinct inputs remembered by normalize()
+NORMALIZE_CACHE_SIZE = 4096
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+@dataclass(frozen=True)
+class Exercise:
+    id: str
+    name: str
+    depth: int  # 0 for a base movement, +1 for each equipment or variant modifier
+
+
+def name_key(text):
+    """
+    Lowercase, drop apostrophes and turn every other separator into a
+    single space: "Push-Ups" -> "push ups", "Farmer's carry" -> "farmers carry".
+    """
+    text = (text or '').lower().replace('&', ' and ').replace("'", '').replace('’', '')
+    return _NON_ALNUM_RE.sub(' ', text).strip()
+
+
+def display_name(name):
+    """
+    Title-case each word and hyphenated part: "push-up" -> "Push-Up".
+    """
+    return ' '.join('-'.join(part[:1].upper() + part[1:] for part in word.split('-')) for word in name.split())
+
+
+class ExerciseIndex:
+    """
+    Exercise-name lookup over the catalog in data/exercise_catalog.json.
+
+    Every movement expands to its base name plus each "<equipment> <name>"
+    and "<variant> <name>", and "<equipment> <variant> <name>" for the
+    equipment a variant lists: a variant is either a plain string or
+    {"name": ..., "equipment": [...]}, so only combinations people actually
+    do are generated. All spellings (spaced, joined and plural, and
+    "<variant> <equipment> <name>") map to a canonical exercise in one
+    dict, so most lookups are a single hash probe. Shorthand words ("db",
+    "kb") are expanded before lookup. Misses fall back to a
+    trigram index that picks a few candidates to score with SequenceMatcher.
+    Prefix search for autocomplete bisects sorted key lists.
+    """
+
+    def __init__(self, movements, abbreviations=None):
+        self.abbreviations = {name_key(short): name_key(full) for short, full in (abbreviations or {}).items()}
+        self.exercises = []
+        self._by_id = {}
+        self._exact = {}
+        keyed = []
+
+        # Base names and their aliases claim their spellings before any generated combination
+        for movement in movements:
+            exercise = self._add(movement['name'], 0)
+            if exercise is not None:
+                keyed.append((exercise, [movement['name']] + movement.get('aliases', [])))
+        equipment_keys = {name_key(item) for movement in movements for item in movement.get('equipment', [])}
+        for movement in movements:
+            base = movement['name']
+            base_key = name_key(base)
+            base_words = set(base_key.split())
+            # No "Kettlebell Kettlebell Swing" or "Kettlebell Single-Arm Dumbbell Row"
+            names_equipment = any(f' {item} ' in f' {base_key} ' for item in equipment_keys)
+            equipment = [
+                item for item in movement.get('equipment', [])
+                if not names_equipment and not base_words & set(name_key(item).split())
+            ]
+            variants = {}
+            for variant in movement.get('variants', []):
+                if isinstance(variant, str):
+                    variant = {'name': variant}
+                if not base_words & set(name_key(variant['name']).split()):
+                    variants[variant['name']] = [item for item in variant.get('equipment', []) if item in equipment]
+            combos = [(f'{modifier} {base}', 1, []) for modifier in equipment + list(variants)]
+            combos += [
+                (f'{item} {variant} {base}', 2, [f'{variant} {item} {base}'])
+                for variant, items in variants.items() for item in items
+            ]
+            for name, depth, spellings in combos:
+                exercise = self._add(name, depth)
+                if exercise is not None:
+                    keyed.append((exercise, [name] + spellings))
+
+        self._fuzzy_keys = []
+        self._fuzzy_owners = []
+        for exercise, names in keyed:
+            for name in names:
+                key = name_key(name)
+                for spelling in _spellings(key):
+                    self._exact.setdefault(spelling, exercise)
+                # Fuzzy matching compares against the spaced spelling only
+                self._fuzzy_keys.append(key)
+                self._fuzzy_owners.append(exercise)
+
+        self._build_trigrams()
+        self._build_prefixes()
+        self.normalize = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(self._normalize)
+
+    @classmethod
+    def from_file(cls, path=CATALOG_PATH):
+        with open(path, encoding='utf-8') as f:
+            catalog = json.load(f)
+        return cls(catalog['movements'], catalog.get('abbreviations'))
+
+    def get(self, exercise_id):
+        return self._by_id.get(exercise_id)
+
+    def _normalize(self, text):
+        """
+        Return the canonical Exercise for free-text input, or None.
+        """
+        key = self._expand(name_key(text))
+        if not key:
+            return None
+        exercise = self._exact.get(key) or self._exact.get(key.replace(' ', ''))
+        if exercise is not None:
+            return exercise
+        return self._fuzzy(key)
+
+    def canonical_name(self, text, existing=()):
+        """
+        Display name for user input: the matched catalog name, or the input
+        title-cased (and cut to EXERCISE_NAME_LENGTH) when nothing is close
+        enough. A name in existing (the user's stored names) for the same
+        exercise wins over the catalog name, so input such as "squats" keeps
+        matching sessions and rollups stored as "Squats" before the catalog.
+        """
+        exercise = self.normalize(text)
+        if exercise is not None:
+            stored = [name for name in existing if self.normalize(name) == exercise]
+            if stored and exercise.name not in stored:
+                return min(stored)
+            return exercise.name
+        return ' '.join(word.capitalize() for word in (text or '').lower().split())[:EXERCISE_NAME_LENGTH].rstrip()
+
+    def search(self, text, limit=10):
+        """
+        Autocomplete: exercises whose name (or a spelling of it) starts with
+        the input, then ones with a later word starting with it. Within each
+        group base movements and shorter names come first.
+        """
+        key = self._expand(name_key(text))
+        if not key or limit <= 0:
+            return []
+        results = []
+        seen = set()
+        for keys, owners in ((self._prefix_keys, self._prefix_owners), (self._suffix_keys, self._suffix_owners)):
+            group = []
+            position = bisect_left(keys, key)
+            # Bounded scan: enough alphabetical matches to rank, without walking thousands for "s"
+            while position < len(keys) and keys[position].startswith(key) and len(group) < limit * 8:
+                exercise = owners[position]
+                if exercise.id not in seen:
+                    seen.add(exercise.id)
+                    group.append(exercise)
+                position += 1
+            group.sort(key=lambda exercise: (exercise.depth, len(exercise.name), exercise.name))
+            results.extend(group)
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    def _expand(self, key):
+        if not self.abbreviations:
+            return key
+        return ' '.join(self.abbreviations.get(word, word) for word in key.split())
+
+    def _add(self, name, depth):
+        exercise_id = name_key(name).replace(' ', '-')
+        if exercise_id in self._by_id:
+            return None
+        exercise = Exercise(exercise_id, display_name(name), depth)
+        # Canonical names are stored on sessions and progress rollups
+        if len(exercise.name) > EXERCISE_NAME_LENGTH:
+            raise ValueError(f"Exercise name longer than {EXERCISE_NAME_LENGTH} characters: {exercise.name}")
+        self._by_id[exercise_id] = exercise
+        self.exercises.append(exercise)
+        return exercise
+
+    def _build_trigrams(self):
+        postings = {}
+        for position, key in enumerate(self._fuzzy_keys):
+            for trigram in set(_trigrams(key)):
+                postings.setdefault(trigram, []).append(position)
+        self._trigrams = {trigram: np.array(positions, dtype=np.int32) for trigram, positions in postings.items()}
+
+    def _build_prefixes(self):
+        prefixes = sorted(self._exact.items())
+        self._prefix_keys = [spelling for spelling, _ in prefixes]
+        self._prefix_owners = [exercise for _, exercise in prefixes]
+        suffixes = sorted((
+            (suffix, exercise)
+            for exercise in self.exercises
+            for suffix in _word_suffixes(name_key(exercise.name))
+        ), key=lambda item: item[0])
+        self._suffix_keys = [suffix for suffix, _ in suffixes]
+        self._suffix_owners = [exercise for _, exercise in suffixes]
+
+    def _fuzzy(self, key):
+        postings = [self._trigrams[trigram] for trigram in set(_trigrams(key)) if trigram in self._trigrams]
+        if not postings:
+            return None
+        shared = np.bincount(np.concatenate(postings), minlength=len(self._fuzzy_keys))
+        # Most shared trigrams first, ties in catalog order, so results never depend on hash order
+        score = shared.astype(np.int64) * len(shared) - np.arange(len(shared))
+        count = min(FUZZY_CANDIDATES, int(np.count_nonzero(shared)))
+        top = np.argpartition(-score, count - 1)[:count]
+        candidates = top[np.argsort(-score[top])]
+        matcher = SequenceMatcher(b=key, autojunk=False)
+        best = None
+        for position in candidates:
+            matcher.set_seq1(self._fuzzy_keys[position])
+            if matcher.real_quick_ratio() < FUZZY_CUTOFF or matcher.quick_ratio() < FUZZY_CUTOFF:
+                continue
+            score = matcher.ratio()
+            if score >= FUZZY_CUTOFF and (best is None or score > best[0]):
+                best = (score, self._fuzzy_owners[position])
+        return best[1] if best else None
+
+
+def _spellings(key):
+    """
+    Spaced and joined forms of a key, singular and plural.
+    """
+    forms = {key, key + 's'} if not key.endswith('s') else {key}
+    return forms | {form.replace(' ', '') for form in forms}
+
+
+def _trigrams(key):
+    padded = f'  {key} '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _word_suffixes(key):
+    words = key.split()
+    return [' '.join(words[i:]) for i in range(1, len(words))]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The shared ExerciseIndex, built from the catalog on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ExerciseIndex.from_file()
+    return _index
@@ -0,0 +1,22 @@
+"""
+Shared extension objects, bound to the app in create_app().
+"""
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+
+from assets import AssetManifest
+from chunked_upload import ChunkedUploadStore
+from fragment_cache import FragmentCache
+from jobs import JobQueue
+from llm_client import LLMClient
+from stream_hub import StreamHub
+
+db = SQLAlchemy()
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+job_queue = JobQueue()
+llm = LLMClient(api_key=None)
+stream_hub = StreamHub()
+chunked_uploads = ChunkedUploadStore()
+assets = AssetManifest()
+fragment_cache = FragmentCache()
@@ -0,0 +1,181 @@
+"""
+Cache of rendered per-session HTML fragments (dashboard rows, card bodies).
+
+Entries are keyed by (session id, fragment name) and carry a version: the
+session's updated_at plus the template's modification time. A lookup only
+hits when the version matches, so any change to the row, or a deploy that
+changes the template, renders afresh without explicit invalidation.
+invalidate() still drops a session's fragments when it is deleted or
+re-analyzed, so dead entries do not hold memory or disk.
+
+FRAGMENT_CACHE selects the store: 'memory' (a per-process LRU capped at
+FRAGMENT_CACHE_MAX_BYTES), 'disk' (files under FRAGMENT_CACHE_DIR, shared
+by the gunicorn workers on a host) or 'none'.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from flask import current_app, render_template
+from markupsafe import Markup
+
+
+class MemoryFragmentStore:
+    """
+    Least recently used entries are evicted once the stored HTML exceeds
+    max_bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # (session_id, name) -> (version, html)
+        self._lock = threading.Lock()
+
+    def get(self, session_id, name, version):
+        key = (session_id, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, session_id, name, version, html):
+        key = (session_id, name)
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[1])
+            self._entries[key] = (version, html)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def delete(self, session_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session_id]:
+                self.bytes -= len(self._entries.pop(key)[1])
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes}
+
+
+class DiskFragmentStore:
+    """
+    One directory per session holding "<name>.<version hash>.html" files.
+    Writes go through a temporary file and a rename, so a worker never reads
+    a partial fragment written by another.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, session_id, name, version):
+        digest = hashlib.sha1(version.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.folder, str(session_id), f'{name}.{digest}.html')
+
+    def get(self, session_id, name, version):
+        try:
+            with open(self._path(session_id, name, version), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, session_id, name, version, html):
+        path = self._path(session_id, name, version)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        # Older versions of this fragment are superseded
+        for existing in os.listdir(folder):
+            if existing.startswith(name + '.') and existing.endswith('.html'):
+                try:
+                    os.remove(os.path.join(folder, existing))
+                except FileNotFoundError:
+                    pass
+        descriptor, temporary = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(temporary, path)
+
+    def delete(self, session_id):
+        shutil.rmtree(os.path.join(self.folder, str(session_id)), ignore_errors=True)
+
+    def stats(self):
+        entries, size = 0, 0
+        for folder, _, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith('.html'):
+                    entries += 1
+                    size += os.path.getsize(os.path.join(folder, name))
+        return {'entries': entries, 'bytes': size}
+
+
+class FragmentCache:
+    def __init__(self):
+        self.store = None
+        self.hits = 0
+        self.misses = 0
+        self._template_times = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        backend = app.config['FRAGMENT_CACHE']
+        if backend == 'memory':
+            self.store = MemoryFragmentStore(app.config['FRAGMENT_CACHE_MAX_BYTES'])
+        elif backend == 'disk':
+            self.store = DiskFragmentStore(app.config['FRAGMENT_CACHE_DIR'] or os.path.join(app.instance_path, 'fragments'))
+        elif backend in ('', 'none'):
+            self.store = None
+        else:
+            raise ValueError(f"Unknown FRAGMENT_CACHE backend: {backend}")
+
+    def render(self, workout, name, template, **context):
+        """
+        The rendered template for a session, from the cache when the row and
+        template are unchanged. context is passed to the template along with
+        session=workout.
+        """
+        if self.store is None:
+            return Markup(render_template(template, session=workout, **context))
+        version = f"{workout.updated_at.isoformat() if workout.updated_at else ''}:{self._template_time(template)}"
+        html = self.store.get(workout.id, name, version)
+        with self._lock:
+            if html is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if html is None:
+            html = render_template(template, session=workout, **context)
+            self.store.set(workout.id, name, version, html)
+        return Markup(html)
+
+    def invalidate(self, session_id):
+        if self.store is not None:
+            self.store.delete(session_id)
+
+    def stats(self):
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses}
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        if self.store is not None:
+            stats.update(self.store.stats())
+        return stats
+
+    def _template_time(self, template):
+        # Templates only change with a deploy, so each is checked once per process
+        stamp = self._template_times.get(template)
+        if stamp is None:
+            filename = current_app.jinja_env.get_template(template).filename
+            stamp = self._template_times[template] = str(int(os.path.getmtime(filename)))
+        return stamp
@@ -0,0 +1,176 @@
+import base64
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+# Below this many frames between samples it is cheaper to grab() forward than to seek
+SEEK_MIN_STEP = 15
+
+# Size of the grayscale thumbnail used for frame differencing
+MOTION_THUMB_SIZE = (64, 64)
+
+
+@dataclass
+class Keyframe:
+    index: int
+    timestamp: float
+    motion: float
+    jpeg: bytes
+
+    def data_url(self):
+        """
+        Return the frame as a base64 data URL for the chat-completions API.
+        """
+        return 'data:image/jpeg;base64,' + base64.b64encode(self.jpeg).decode('ascii')
+
+
+@dataclass
+class FrameBatch:
+    keyframes: List[Keyframe] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    sampled: int = 0
+    duration: float = 0.0
+    # Every sample's timestamp and motion thumbnail, for rep segmentation
+    timestamps: List[float] = field(default_factory=list)
+    thumbnails: Optional[np.ndarray] = None
+
+    def timing_summary(self):
+        stages = ', '.join(f'{stage}={seconds * 1000:.1f}ms' for stage, seconds in self.timings.items())
+        return f'{len(self.keyframes)} keyframes from {self.sampled} samples ({stages})'
+
+
+class StageTimer:
+    """
+    Accumulates wall-clock time per named pipeline stage.
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    def add(self, stage, started):
+        self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def extract_keyframes(video_path, sample_fps=2.0, max_frames=8, max_dimension=512, jpeg_quality=70, info=None, on_frame=None):
+    """
+    Sample a video at sample_fps and pick up to max_frames motion keyframes.
+
+    The clip is split into max_frames equal time windows and the frame with the
+    most motion (mean absolute difference against the previous sample) is kept
+    from each window, so the batch covers the whole movement. Only the current
+    best frame per window is held in memory; the rest are discarded as soon as
+    they are scored. Pass the VideoInfo from video_probe to reuse its fps and
+    frame count instead of reading them from the container again.
+
+    on_frame(index, timestamp, frame) is called with every full-size sampled
+    frame, so other stages (e.g. pose estimation) share this single decode.
+    """
+    timer = StageTimer()
+    batch = FrameBatch()
+
+    started = time.perf_counter()
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    if info is not None:
+        fps = info.fps or 30.0
+        frame_count = info.frame_count
+    else:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    timer.add('open', started)
+
+    try:
+        if frame_count <= 0:
+            return batch
+        batch.duration = frame_count / fps
+
+        step = max(1, int(round(fps / sample_fps)))
+        sample_indices = range(0, frame_count, step)
+        windows = max(1, min(max_frames, len(sample_indices)))
+        best = {}
+        thumbs = []
+        previous_thumb = None
+        position = 0
+
+        for index in sample_indices:
+            started = time.perf_counter()
+            if index - position >= SEEK_MIN_STEP:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            else:
+                while position < index and capture.grab():
+                    position += 1
+            ok, frame = capture.read()
+            timer.add('decode', started)
+            if not ok:
+                break
+            position = index + 1
+            batch.sampled += 1
+
+            started = time.perf_counter()
+            small = motion_thumbnail(frame)
+            thumbs.append(small)
+            batch.timestamps.append(index / fps)
+            thumb = small.astype(np.float32)
+            if previous_thumb is None:
+                motion = 0.0
+            else:
+                motion = float(np.mean(np.abs(thumb - previous_thumb)))
+            previous_thumb = thumb
+            timer.add('motion', started)
+
+            if on_frame is not None:
+                started = time.perf_counter()
+                on_frame(index, index / fps, frame)
+                timer.add('consumers', started)
+
+            window = min(windows - 1, index * windows // frame_count)
+            current = best.get(window)
+            if current is None or motion > current[0]:
+                started = time.perf_counter()
+                best[window] = (motion, index, downscale(frame, max_dimension))
+                timer.add('resize', started)
+
+        started = time.perf_counter()
+        encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+        for window in sorted(best):
+            motion, index, frame = best[window]
+            ok, encoded = cv2.imencode('.jpg', frame, encode_params)
+            if ok:
+                batch.keyframes.append(Keyframe(index, index / fps, motion, encoded.tobytes()))
+        timer.add('encode', started)
+        if thumbs:
+            batch.thumbnails = np.stack(thumbs)
+    finally:
+        capture.release()
+        batch.timings = timer.timings
+
+    return batch
+
+
+def motion_thumbnail(frame):
+    """
+    Grayscale MOTION_THUMB_SIZE thumbnail of a frame. A cheap bilinear pass
+    to 4x the thumbnail size comes first: INTER_AREA straight from 1080p
+    costs several milliseconds per frame, from the intermediate size almost
+    nothing.
+    """
+    width, height = MOTION_THUMB_SIZE
+    if frame.shape[1] > width * 4:
+        frame = cv2.resize(frame, (width * 4, height * 4), interpolation=cv2.INTER_LINEAR)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, MOTION_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def downscale(frame, max_dimension):
+    """
+    Shrink a frame so its longest side is at most max_dimension pixels.
+    """
+    height, width = frame.shape[:2]
+    scale = max_dimension / float(max(height, width))
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,105 @@
+"""
+The form guidelines catalog in data/form_guidelines.json, parsed once into
+read-only records. The catalog's digest and file time are the validators
+for the pages and API built from it, so clients revalidate with a 304
+until the file changes.
+"""
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Tuple
+
+GUIDELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'form_guidelines.json')
+
+
+@dataclass(frozen=True)
+class Video:
+    title: str
+    url: str
+
+
+@dataclass(frozen=True)
+class Guideline:
+    id: str
+    name: str
+    title: str
+    summary: str
+    key_points: Tuple[str, ...] = ()
+    common_mistakes: Tuple[str, ...] = ()
+    videos: Tuple[Video, ...] = ()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'title': self.title,
+            'summary': self.summary,
+            'key_points': list(self.key_points),
+            'common_mistakes': list(self.common_mistakes),
+            'videos': [{'title': video.title, 'url': video.url} for video in self.videos]
+        }
+
+
+class GuidelineCatalog:
+    """
+    Guidelines in catalog order with lookup by id. Nothing changes after
+    construction: the lists are tuples and the id map is a read-only view.
+    """
+
+    def __init__(self, entries, digest, last_modified):
+        self.guidelines = tuple(
+            Guideline(
+                id=entry['id'],
+                name=entry['name'],
+                title=entry.get('title') or f"{entry['name']} Form Guidelines",
+                summary=entry.get('summary', ''),
+                key_points=tuple(entry.get('key_points', ())),
+                common_mistakes=tuple(entry.get('common_mistakes', ())),
+                videos=tuple(Video(video['title'], video['url']) for video in entry.get('videos', ()))
+            )
+            for entry in entries
+        )
+        by_id = {}
+        for guideline in self.guidelines:
+            if guideline.id in by_id:
+                raise ValueError(f"Duplicate form guideline id: {guideline.id}")
+            by_id[guideline.id] = guideline
+        self._by_id = MappingProxyType(by_id)
+        self.etag = digest
+        self.last_modified = last_modified
+
+    @classmethod
+    def from_file(cls, path=GUIDELINES_PATH):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        last_modified = datetime.fromtimestamp(int(os.path.getmtime(path)), timezone.utc)
+        return cls(json.loads(raw)['guidelines'], hashlib.sha256(raw).hexdigest()[:16], last_modified)
+
+    def get(self, guideline_id):
+        return self._by_id.get(guideline_id)
+
+    def __iter__(self):
+        return iter(self.guidelines)
+
+    def __len__(self):
+        return len(self.guidelines)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    The shared GuidelineCatalog, loaded on first use.
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = GuidelineCatalog.from_file()
+    return _catalog
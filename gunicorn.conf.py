@@ -0,0 +1,53 @@
+"""
+gunicorn settings, used with: gunicorn main:app -c gunicorn.conf.py
+
+The app is created once in the master and the workers are forked from it,
+so imports, the character list and the exercise catalog are loaded a single
+time and shared copy-on-write. Database connections and the background job
+threads are per process: the pool is discarded after the fork and job
+threads only start on a worker's first enqueue.
+
+Jobs only live in memory, so each worker requeues on start the analyses a
+previous server left unfinished: only sessions untouched since this server
+started, so a worker respawned later never takes over jobs still queued in
+the live ones (see workouts.requeue_stale_analyses). This assumes one host
+per database: another instance's running jobs look orphaned once they
+predate this server's start.
+"""
+import os
+from datetime import datetime
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Read in the master, before any worker exists
+server_started_at = datetime.utcnow()
+
+
+def when_ready(server):
+    if preload_app:
+        from app import preload_shared_data
+        preload_shared_data()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    # Pooled connections inherited from the master must not be used by the
+    # workers; close=False leaves them open for the master itself
+    from extensions import db
+    from main import app
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    from main import app
+    from workouts import requeue_stale_analyses
+    with app.app_context():
+        requeued = requeue_stale_analyses(started_before=server_started_at)
+    if requeued:
+        print(f"Worker {worker.pid} requeued {len(requeued)} unfinished analyses")
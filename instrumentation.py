@@ -0,0 +1,410 @@
+"""
+Request and job instrumentation: timing spans, DB query counts, LLM latency
+and token histograms, a Prometheus text endpoint, JSON trace logs and an
+opt-in sampling profiler for slow requests.
+
+Everything is off unless INSTRUMENTATION_ENABLED is set. Disabled, span()
+returns a shared no-op context manager and no request hooks or database
+events are registered, so the cost is one attribute check per span.
+
+Metrics live in the process that recorded them; with several gunicorn
+workers, each worker's /metrics shows only its own traffic.
+"""
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from dataclasses import dataclass, field
+from typing import Dict
+
+from flask import Response, abort, g, request
+from sqlalchemy import event
+
+# Seconds; covers fast DB-only requests up to multi-minute LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# Deepest stack recorded per profiler sample
+PROFILE_MAX_DEPTH = 64
+
+log = logging.getLogger('workout.trace')
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{_labels(self.labels, key)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (last is +Inf), sum]
+        self.values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(f'{self.name}_bucket{_labels(self.labels + ("le",), key + (le,))} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels(self.labels, key)} {_number(total)}')
+                lines.append(f'{self.name}_count{_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+@dataclass
+class Trace:
+    """
+    Timings collected for one request or background job.
+    """
+    name: str
+    fields: Dict[str, object] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+    spans: Dict[str, float] = field(default_factory=dict)
+    queries: int = 0
+    query_seconds: float = 0.0
+    profiled: bool = False
+
+    def to_dict(self, duration):
+        record = {'trace': self.name, 'duration_ms': round(duration * 1000, 2)}
+        record.update(self.fields)
+        record['spans_ms'] = {name: round(seconds * 1000, 2) for name, seconds in self.spans.items()}
+        record['db_queries'] = self.queries
+        record['db_ms'] = round(self.query_seconds * 1000, 2)
+        return record
+
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('owner', 'name', 'started')
+
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.owner.stage_seconds.observe(elapsed, stage=self.name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans[self.name] = trace.spans.get(self.name, 0.0) + elapsed
+        return False
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of registered threads from one background thread
+    every interval seconds. Idle (no registered threads) it just waits.
+    Results are folded stacks, the input format of flamegraph tools.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._threads: Dict[int, StackCounter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._threads[thread_id] = StackCounter()
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._sampler.start()
+        self._wake.set()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._threads.pop(thread_id, StackCounter())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                threads = list(self._threads.items())
+                if not threads:
+                    self._wake.clear()
+            if not threads:
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            for thread_id, stacks in threads:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[_stack_key(frame)] += 1
+            time.sleep(self.interval)
+
+
+def _stack_key(frame):
+    stack = []
+    while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class Instrumentation:
+    """
+    Per-process instrumentation, set up by init_app().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.json_logs = False
+        self.slow_seconds = None
+        self.profile_rate = 0.0
+        self.profile_header = False
+        self.profile_slow_seconds = 0.0
+        self.profile_dir = None
+        self.metrics_token = None
+        self.profiler = None
+
+        self.request_seconds = Histogram('app_request_seconds', 'Request handling time', ('endpoint', 'method', 'status'))
+        self.request_queries = Histogram('app_request_db_queries', 'Database queries per request', ('endpoint',), COUNT_BUCKETS)
+        self.stage_seconds = Histogram('app_stage_seconds', 'Time spent in instrumented stages', ('stage',))
+        self.job_seconds = Histogram('app_job_seconds', 'Background job run time', ('job', 'outcome'))
+        self.llm_seconds = Histogram('app_llm_request_seconds', 'Chat completion latency including retries', ('model', 'mode'))
+        self.llm_first_token_seconds = Histogram('app_llm_first_token_seconds', 'Time to the first streamed token', ('model',))
+        self.llm_tokens = Histogram('app_llm_tokens', 'Tokens per chat completion', ('model', 'kind'), TOKEN_BUCKETS)
+        self.llm_requests = Counter('app_llm_requests_total', 'Chat completions by outcome', ('model', 'mode', 'outcome'))
+        self.llm_retries = Counter('app_llm_retries_total', 'Chat completion attempts beyond the first', ('model',))
+        self.profiles = Counter('app_profiles_total', 'Profiled requests, and how many were kept as slow', ('kept',))
+        self.metrics = [
+            self.request_seconds, self.request_queries, self.stage_seconds, self.job_seconds,
+            self.llm_seconds, self.llm_first_token_seconds, self.llm_tokens, self.llm_requests,
+            self.llm_retries, self.profiles
+        ]
+
+    def init_app(self, app, engine):
+        config = app.config
+        self.enabled = config.get('INSTRUMENTATION_ENABLED', False)
+        if not self.enabled:
+            return
+        self.json_logs = config.get('JSON_LOGS', False)
+        self.slow_seconds = config.get('SLOW_REQUEST_SECONDS')
+        self.profile_rate = config.get('PROFILE_SAMPLE_RATE', 0.0)
+        self.profile_header = config.get('PROFILE_HEADER_ENABLED', False)
+        self.profile_slow_seconds = config.get('PROFILE_SLOW_SECONDS', 1.0)
+        self.profile_dir = config.get('PROFILE_DIR', 'profiles')
+        self.metrics_token = config.get('METRICS_TOKEN') or None
+        if self.profile_rate or self.profile_header:
+            self.profiler = SamplingProfiler(config.get('PROFILE_INTERVAL', 0.005))
+        if self.json_logs and not log.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            log.addHandler(handler)
+            log.setLevel(logging.INFO)
+            log.propagate = False
+
+        event.listen(engine, 'before_cursor_execute', self._before_query)
+        event.listen(engine, 'after_cursor_execute', self._after_query)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def span(self, name):
+        """
+        Time a stage: `with instrumentation.span('analysis.llm'): ...`.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name):
+        """
+        Decorator form of span() for timing a whole function.
+        """
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def job(self, name, **fields):
+        """
+        Trace a background job the way requests are traced.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return _JobTrace(self, name, fields)
+
+    def observe_llm(self, call):
+        """
+        LLMClient observer: record one finished (or failed) chat completion.
+        """
+        outcome = 'error' if call.error else 'ok'
+        self.llm_requests.inc(model=call.model, mode=call.mode, outcome=outcome)
+        self.llm_seconds.observe(call.latency, model=call.model, mode=call.mode)
+        if call.attempts > 1:
+            self.llm_retries.inc(call.attempts - 1, model=call.model)
+        if call.first_token_latency is not None:
+            self.llm_first_token_seconds.observe(call.first_token_latency, model=call.model)
+        for kind in ('prompt_tokens', 'completion_tokens'):
+            if call.usage.get(kind):
+                self.llm_tokens.observe(call.usage[kind], model=call.model, kind=kind.split('_')[0])
+
+    def render_metrics(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        if self.metrics_token and request.headers.get('Authorization') != f'Bearer {self.metrics_token}':
+            abort(401)
+        return Response(self.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    def emit(self, trace, duration):
+        if self.json_logs:
+            log.info(json.dumps(trace.to_dict(duration), default=str))
+        elif self.slow_seconds is not None and duration >= self.slow_seconds:
+            print(f"Slow {trace.name}: {json.dumps(trace.to_dict(duration), default=str)}")
+
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.queries += 1
+            trace.query_seconds += time.perf_counter() - started
+
+    def _start_request(self):
+        trace = Trace(request.endpoint or 'unknown', {'method': request.method, 'path': request.path})
+        g.trace_token = _current_trace.set(trace)
+        g.trace = trace
+        if self.profiler is not None and (
+            (self.profile_header and request.headers.get('X-Profile')) or random.random() < self.profile_rate
+        ):
+            trace.profiled = True
+            self.profiler.start(threading.get_ident())
+
+    def _finish_request(self, response):
+        self._complete(response.status_code)
+        return response
+
+    def _teardown_request(self, error):
+        # after_request is skipped when a view raises
+        if getattr(g, 'trace', None) is not None:
+            self._complete(500)
+
+    def _complete(self, status):
+        trace = g.pop('trace', None)
+        if trace is None:
+            return
+        duration = time.perf_counter() - trace.started
+        _current_trace.reset(g.pop('trace_token'))
+        trace.fields['status'] = status
+        self.request_seconds.observe(duration, endpoint=trace.name, method=trace.fields['method'], status=status)
+        self.request_queries.observe(trace.queries, endpoint=trace.name)
+        if trace.profiled:
+            stacks = self.profiler.stop(threading.get_ident())
+            kept = duration >= self.profile_slow_seconds or bool(request.headers.get('X-Profile'))
+            self.profiles.inc(kept=str(kept).lower())
+            if kept and stacks:
+                trace.fields['profile'] = self._write_profile(trace, duration, stacks)
+        self.emit(trace, duration)
+
+    def _write_profile(self, trace, duration, stacks):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.name}-{int(duration * 1000)}ms.folded"
+        path = os.path.join(self.profile_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
+
+
+class _JobTrace:
+    def __init__(self, owner, name, fields):
+        self.owner = owner
+        self.trace = Trace(name, fields)
+
+    def __enter__(self):
+        self.token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.trace.started
+        _current_trace.reset(self.token)
+        outcome = 'error' if exc_type else 'ok'
+        self.trace.fields['outcome'] = outcome
+        self.owner.job_seconds.observe(duration, job=self.trace.name, outcome=outcome)
+        self.owner.emit(self.trace, duration)
+        return False
+
+
+instrumentation = Instrumentation()
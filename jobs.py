@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+@dataclass
+class Job:
+    func: Callable
+    args: Tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+    max_attempts: int = 3
+    on_retry: Optional[Callable] = None
+    on_failure: Optional[Callable] = None
+
+
+class JobQueue:
+    """
+    In-process background job queue with a bounded pool of worker threads.
+
+    Jobs that raise are retried with exponential backoff until max_attempts is
+    reached, at which point on_failure is called with the last error. Worker
+    threads are started lazily on the first enqueue so that nothing is spawned
+    before gunicorn forks its workers. Once init_app() has run, jobs and
+    their hooks run inside that app's application context.
+    """
+
+    def __init__(self, max_workers=2, max_attempts=3, backoff_base=2.0, backoff_max=60.0):
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._pending_retries = 0
+        self.app = None
+
+    def init_app(self, app):
+        """
+        Read pool settings from the Flask config.
+        """
+        self.app = app
+        self.max_workers = app.config.get('ANALYSIS_WORKERS', self.max_workers)
+        self.max_attempts = app.config.get('ANALYSIS_MAX_ATTEMPTS', self.max_attempts)
+        self.backoff_base = app.config.get('ANALYSIS_RETRY_BACKOFF', self.backoff_base)
+
+    def enqueue(self, func, *args, on_retry=None, on_failure=None, **kwargs):
+        """
+        Schedule func(*args, **kwargs) to run on a worker thread.
+        """
+        job = Job(
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            max_attempts=self.max_attempts,
+            on_retry=on_retry,
+            on_failure=on_failure
+        )
+        self._start_workers()
+        self._queue.put(job)
+        return job
+
+    def backoff_delay(self, attempts):
+        """
+        Seconds to wait before the given retry attempt (1-based).
+        """
+        return min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+
+    def join(self, timeout=None):
+        """
+        Block until every queued job (including scheduled retries) has finished.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._lock:
+                idle = self._pending_retries == 0 and self._queue.unfinished_tasks == 0
+            if idle:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def _start_workers(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._worker,
+                    name=f'analysis-worker-{len(self._threads)}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                with self.app.app_context() if self.app is not None else nullcontext():
+                    self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        job.attempts += 1
+        try:
+            job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            if job.attempts < job.max_attempts:
+                delay = self.backoff_delay(job.attempts)
+                print(f"Job {job.func.__name__} failed (attempt {job.attempts}/{job.max_attempts}), retrying in {delay:.1f}s: {e}")
+                if job.on_retry:
+                    self._call_hook(job.on_retry, job, e)
+                self._schedule_retry(job, delay)
+            else:
+                print(f"Job {job.func.__name__} failed after {job.attempts} attempts: {e}")
+                if job.on_failure:
+                    self._call_hook(job.on_failure, job, e)
+
+    def _schedule_retry(self, job, delay):
+        # A timer re-queues the job so the worker thread is free while waiting
+        def requeue():
+            self._queue.put(job)
+            with self._lock:
+                self._pending_retries -= 1
+
+        with self._lock:
+            self._pending_retries += 1
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        timer.start()
+
+    @staticmethod
+    def _call_hook(hook, job, error):
+        try:
+            hook(job, error)
+        except Exception as hook_error:
+            print(f"Job hook error: {hook_error}")
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# requests and aiohttp are imported where they are first used: together they
+# take a third of a second to import, and workers that never call the API
+# (or only ever use one of the two) should not pay for them at startup
+
+# Status codes worth retrying: rate limits and transient server errors
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """
+    Raised when a chat completion fails after all retries.
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class ChatResult:
+    content: str
+    model: str
+    usage: Dict[str, int] = field(default_factory=dict)
+    latency: float = 0.0
+    attempts: int = 1
+
+
+@dataclass
+class LLMCall:
+    """
+    What the observer hook receives for every finished or failed completion.
+    """
+    model: str
+    mode: str  # 'chat', 'stream' or 'async'
+    latency: float
+    attempts: int
+    usage: Dict[str, int] = field(default_factory=dict)
+    first_token_latency: Optional[float] = None
+    error: Optional[Exception] = None
+
+
+@dataclass
+class ChatRequest:
+    model: str
+    messages: List[Dict[str, Any]]
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+class LLMClient:
+    """
+    Chat-completions client with a pooled HTTP session, per-call timeouts and
+    exponential backoff. chat() is synchronous, chat_stream() yields tokens as
+    they are generated, and chat_many() runs several independent requests
+    concurrently on an aiohttp connection pool.
+
+    base_url can point at any server that speaks the chat-completions API,
+    such as the local stub in llm_stub.py. If observer is set it is called
+    with an LLMCall after every completion, for metrics.
+    """
+
+    def __init__(self, api_key, base_url='https://api.openai.com/v1', timeout=60.0,
+                 max_retries=4, backoff_base=1.0, backoff_max=30.0, pool_size=10, observer=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.observer = observer
+        self._session = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            api_key=config.get('OPENAI_API_KEY'),
+            base_url=config.get('OPENAI_BASE_URL', 'https://api.openai.com/v1'),
+            timeout=config.get('LLM_TIMEOUT', 60.0),
+            max_retries=config.get('LLM_MAX_RETRIES', 4),
+            pool_size=config.get('LLM_POOL_SIZE', 10)
+        )
+
+    def init_app(self, app):
+        """
+        Read connection settings from the Flask config.
+        """
+        config = app.config
+        self.api_key = config.get('OPENAI_API_KEY')
+        self.base_url = config.get('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
+        self.timeout = config.get('LLM_TIMEOUT', self.timeout)
+        self.max_retries = config.get('LLM_MAX_RETRIES', self.max_retries)
+        self.pool_size = config.get('LLM_POOL_SIZE', self.pool_size)
+        self._session = None
+
+    @property
+    def session(self):
+        # Created lazily so each forked gunicorn worker gets its own connection pool
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(self._headers())
+            self._session = session
+        return self._session
+
+    def chat(self, model, messages, timeout=None, **params):
+        """
+        Run one chat completion and return a ChatResult.
+        """
+        import requests
+        payload = dict(params, model=model, messages=messages)
+        started = time.perf_counter()
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                response = self.session.post(
+                    f'{self.base_url}/chat/completions',
+                    json=payload,
+                    timeout=timeout or self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, retry_after = LLMError(f'Request failed: {e}'), None
+            else:
+                if response.status_code == 200:
+                    return self._observed(self._result(response.json(), model, started, attempt), 'chat')
+                error = LLMError(_error_message(response.status_code, response.text), response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    raise self._failed(error, model, 'chat', started, attempt)
+                retry_after = response.headers.get('Retry-After')
+            if attempt > self.max_retries:
+                raise self._failed(error, model, 'chat', started, attempt)
+            time.sleep(self.retry_delay(attempt, retry_after))
+
+    def chat_stream(self, model, messages, timeout=None, on_usage=None, **params):
+        """
+        Stream a chat completion, yielding content deltas as they arrive.
+        Connection errors and retryable statuses are retried only until the
+        first token, so nothing is ever yielded twice. on_usage, if given, is
+        called with the token counts once the stream has finished.
+        """
+        import requests
+        payload = dict(params, model=model, messages=messages, stream=True)
+        if self.observer is not None or on_usage is not None:
+            # Ask for a final usage chunk so streamed calls report tokens too
+            payload.setdefault('stream_options', {'include_usage': True})
+        started = time.perf_counter()
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                response = self.session.post(
+                    f'{self.base_url}/chat/completions',
+                    json=payload,
+                    timeout=timeout or self.timeout,
+                    stream=True
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, retry_after = LLMError(f'Request failed: {e}'), None
+            else:
+                if response.status_code == 200:
+                    break
+                error = LLMError(_error_message(response.status_code, response.text), response.status_code)
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    raise self._failed(error, model, 'stream', started, attempt)
+                retry_after = response.headers.get('Retry-After')
+            if attempt > self.max_retries:
+                raise self._failed(error, model, 'stream', started, attempt)
+            time.sleep(self.retry_delay(attempt, retry_after))
+
+        # SSE responses often omit the charset; the API always sends UTF-8
+        response.encoding = 'utf-8'
+        usage = {}
+        first_token = None
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                chunk = json.loads(data)
+                usage = chunk.get('usage') or usage
+                choices = chunk.get('choices') or [{}]
+                delta = choices[0].get('delta', {}).get('content')
+                if delta:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    yield delta
+        if on_usage is not None:
+            on_usage(usage)
+        if self.observer is not None:
+            self.observer(LLMCall(model, 'stream', time.perf_counter() - started, attempt, usage, first_token))
+
+    def chat_many(self, requests_, timeout=None):
+        """
+        Run independent ChatRequests concurrently and return results in order.
+        Failed requests are returned as their LLMError instead of raising.
+        """
+        return asyncio.run(self._gather(requests_, timeout))
+
+    async def achat(self, http, model, messages, timeout=None, **params):
+        """
+        Async chat completion on an existing aiohttp.ClientSession.
+        """
+        import aiohttp
+        payload = dict(params, model=model, messages=messages)
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        started = time.perf_counter()
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                async with http.post(f'{self.base_url}/chat/completions', json=payload, timeout=client_timeout) as response:
+                    if response.status == 200:
+                        return self._observed(self._result(await response.json(), model, started, attempt), 'async')
+                    error = LLMError(_error_message(response.status, await response.text()), response.status)
+                    if response.status not in RETRY_STATUSES:
+                        raise self._failed(error, model, 'async', started, attempt)
+                    retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error, retry_after = LLMError(f'Request failed: {e}'), None
+            if attempt > self.max_retries:
+                raise self._failed(error, model, 'async', started, attempt)
+            await asyncio.sleep(self.retry_delay(attempt, retry_after))
+
+    def retry_delay(self, attempt, retry_after=None):
+        """
+        Seconds to wait after a failed attempt, honouring Retry-After.
+        """
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** (attempt - 1)), self.backoff_max)
+        # Full jitter keeps concurrent retries from hitting the API in lockstep
+        return random.uniform(0, delay)
+
+    async def _gather(self, requests_, timeout):
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=self.pool_size)
+        async with aiohttp.ClientSession(connector=connector, headers=self._headers()) as http:
+            return await asyncio.gather(
+                *(self.achat(http, r.model, r.messages, timeout=timeout, **r.params) for r in requests_),
+                return_exceptions=True
+            )
+
+    def _observed(self, result, mode):
+        if self.observer is not None:
+            self.observer(LLMCall(result.model, mode, result.latency, result.attempts, result.usage))
+        return result
+
+    def _failed(self, error, model, mode, started, attempts):
+        if self.observer is not None:
+            self.observer(LLMCall(model, mode, time.perf_counter() - started, attempts, error=error))
+        return error
+
+    def _headers(self):
+        return {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
+
+    @staticmethod
+    def _result(body, model, started, attempts):
+        return ChatResult(
+            content=body['choices'][0]['message']['content'],
+            model=body.get('model', model),
+            usage=body.get('usage') or {},
+            latency=time.perf_counter() - started,
+            attempts=attempts
+        )
+
+
+def _error_message(status, body):
+    return f'Chat completion failed with HTTP {status}: {body[:200]}'
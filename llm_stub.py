@@ -0,0 +1,153 @@
+"""
+Local stand-in for the chat-completions API, for offline benchmarks and
+debugging. Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+
+    python llm_stub.py --port 8765 --latency 0.5 --failure-rate 0.1
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ANALYSIS = """1. Form Assessment
+- Torso stays upright through most of the descent
+- Depth reaches roughly parallel
+
+2. Technical Flaws
+- Knees drift inward on the way up
+
+3. Critical Improvements
+- Drive the knees out over the toes
+
+4. Safety Concerns
+- Inward knee collapse loads the knee ligaments
+
+5. Corrective Actions
+- Add banded squats to practice knee tracking
+
+6. Advanced Recommendations
+- Progress to paused squats once tracking is consistent"""
+
+
+STUB_FEEDBACK = 'Solid effort. Keep your knees tracking over your toes and stay tight through the bottom.'
+
+
+class StubConfig:
+    def __init__(self, latency=0.2, failure_rate=0.0, first_token_latency=None, tokens_per_second=200.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        # Streaming responses: delay before the first token, then a steady token rate
+        self.first_token_latency = latency if first_token_latency is None else first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(config):
+    class ChatCompletionsHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            with config.lock:
+                config.requests += 1
+                fail = random.random() < config.failure_rate
+                if fail:
+                    config.failures += 1
+
+            if fail:
+                self._send_json(429, {'error': {'message': 'Rate limit reached (stub)'}}, {'Retry-After': '0.1'})
+                return
+
+            content = self._content(body)
+            prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in body.get('messages', []))
+            usage = {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(content.split()),
+                'total_tokens': prompt_tokens + len(content.split())
+            }
+            if body.get('stream'):
+                self._stream(body, content, usage)
+                return
+            time.sleep(config.latency)
+            self._send_json(200, {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'model': body.get('model', 'stub'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': usage
+            })
+
+        def _content(self, body):
+            system = next((m.get('content', '') for m in body.get('messages', []) if m.get('role') == 'system'), '')
+            if 'fitness trainer' in str(system):
+                return STUB_ANALYSIS
+            last = str(body.get('messages', [{}])[-1].get('content', ''))
+            if 'coach ids' in last:
+                # Batched panel feedback: one reply per listed coach id
+                return json.dumps({coach: STUB_FEEDBACK for coach in re.findall(r'^- (\w+):', last, re.MULTILINE)})
+            return STUB_FEEDBACK
+
+        def _stream(self, body, content, usage):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            time.sleep(config.first_token_latency)
+            for word in content.split(' '):
+                chunk = {'model': body.get('model', 'stub'), 'choices': [{'index': 0, 'delta': {'content': word + ' '}}]}
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(1.0 / config.tokens_per_second)
+            if (body.get('stream_options') or {}).get('include_usage'):
+                # Like the real API: a last chunk with no choices, only usage
+                chunk = {'model': body.get('model', 'stub'), 'choices': [], 'usage': usage}
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _send_json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ChatCompletionsHandler
+
+
+def start_stub_server(host='127.0.0.1', port=0, **config_kwargs):
+    """
+    Start the stub on a background thread. Returns (server, config, base_url).
+    """
+    config = StubConfig(**config_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://{host}:{server.server_address[1]}/v1'
+    return server, config, base_url
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local chat-completions stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    config = StubConfig(latency=args.latency, failure_rate=args.failure_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f'Stub chat-completions API on http://{args.host}:{args.port}/v1')
+    server.serve_forever()
@@ -0,0 +1,176 @@
+import os
+import shutil
+import subprocess
+from dataclasses import dataclass
+
+# Derivatives live here, under the upload folder, named after the source hash
+DERIVED_DIR = 'derived'
+
+# Where in the clip the poster frame is taken, as a share of its length
+POSTER_POSITION = 0.2
+
+# Hash prefix used in derivative names; 64 bits is plenty to avoid collisions
+NAME_HASH_LENGTH = 16
+
+
+@dataclass
+class MediaSettings:
+    ffmpeg: str = 'ffmpeg'
+    web_max_dimension: int = 854
+    web_crf: int = 28
+    poster_max_dimension: int = 640
+    sprite_frames: int = 10
+    sprite_width: int = 160
+    jpeg_quality: int = 75
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            ffmpeg=config.get('FFMPEG_BINARY', 'ffmpeg'),
+            web_max_dimension=config.get('MEDIA_WEB_MAX_DIMENSION', 854),
+            web_crf=config.get('MEDIA_WEB_CRF', 28),
+            poster_max_dimension=config.get('MEDIA_POSTER_MAX_DIMENSION', 640),
+            sprite_frames=config.get('MEDIA_SPRITE_FRAMES', 10),
+            sprite_width=config.get('MEDIA_SPRITE_WIDTH', 160)
+        )
+
+
+def derivative_names(video_hash, settings):
+    """
+    Deterministic file names (relative to the upload folder) for a video's
+    derivatives. The rendition settings are part of the name, so changing
+    them produces new files instead of serving stale ones.
+    """
+    stem = f'{DERIVED_DIR}/{video_hash[:NAME_HASH_LENGTH]}'
+    return {
+        'web': f'{stem}-{settings.web_max_dimension}p{settings.web_crf}.mp4',
+        'poster': f'{stem}-poster{settings.poster_max_dimension}.jpg',
+        'sprite': f'{stem}-sprite{settings.sprite_frames}x{settings.sprite_width}.jpg'
+    }
+
+
+def generate_derivatives(video_path, video_hash, upload_folder, settings):
+    """
+    Create the web rendition, poster and sprite strip for a video, skipping
+    any that already exist (the same upload reused by another session).
+    Returns the dict stored in WorkoutSession.media; 'web' is None when no
+    ffmpeg binary is available, so pages fall back to the original file.
+    """
+    names = derivative_names(video_hash, settings)
+    os.makedirs(os.path.join(upload_folder, DERIVED_DIR), exist_ok=True)
+    paths = {kind: os.path.join(upload_folder, name) for kind, name in names.items()}
+
+    if not (os.path.exists(paths['poster']) and os.path.exists(paths['sprite'])):
+        write_poster_and_sprite(video_path, paths['poster'], paths['sprite'], settings)
+
+    web = names['web']
+    if not os.path.exists(paths['web']) and not transcode_web(video_path, paths['web'], settings):
+        web = None
+
+    return {
+        'web': web,
+        'poster': names['poster'],
+        'sprite': names['sprite'],
+        'sprite_frames': settings.sprite_frames
+    }
+
+
+def write_poster_and_sprite(video_path, poster_path, sprite_path, settings):
+    """
+    Read sprite_frames evenly spaced frames (plus the poster frame) with one
+    VideoCapture and write both JPEGs.
+    """
+    # Imported here so serving and deleting files does not load OpenCV
+    import cv2
+    import numpy as np
+
+    from frames import downscale
+
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    try:
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count <= 0:
+            raise ValueError(f"Video has no frames: {video_path}")
+        positions = np.linspace(0, frame_count - 1, settings.sprite_frames + 2)[1:-1].astype(int)
+        poster_index = int((frame_count - 1) * POSTER_POSITION)
+
+        poster = None
+        tiles = []
+        for index in sorted(set(positions) | {poster_index}):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, frame = capture.read()
+            if not ok:
+                continue
+            if index == poster_index:
+                poster = downscale(frame, settings.poster_max_dimension)
+            if index in positions:
+                height = int(frame.shape[0] * settings.sprite_width / frame.shape[1])
+                tiles.append(cv2.resize(frame, (settings.sprite_width, height), interpolation=cv2.INTER_AREA))
+    finally:
+        capture.release()
+
+    if not tiles:
+        raise ValueError(f"Could not decode frames from {video_path}")
+    if poster is None:
+        poster = downscale(tiles[0], settings.poster_max_dimension)
+    # Pad short reads so the strip always has sprite_frames tiles for the CSS offsets
+    tiles += [tiles[-1]] * (settings.sprite_frames - len(tiles))
+
+    encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), settings.jpeg_quality]
+    _write_atomic(poster_path, cv2.imencode('.jpg', poster, encode_params)[1].tobytes())
+    _write_atomic(sprite_path, cv2.imencode('.jpg', np.hstack(tiles), encode_params)[1].tobytes())
+
+
+def transcode_web(video_path, output_path, settings):
+    """
+    Write a downscaled H.264 rendition with the moov atom up front
+    (+faststart) so playback starts before the whole file arrives.
+    Returns False if ffmpeg is not installed or fails.
+    """
+    ffmpeg = shutil.which(settings.ffmpeg)
+    if ffmpeg is None:
+        print(f"Web rendition skipped: {settings.ffmpeg} not found")
+        return False
+
+    size = settings.web_max_dimension
+    # Fit the longer side, never upscale, keep dimensions even for yuv420p
+    scale = f"scale='if(gt(iw,ih),min({size},iw),-2)':'if(gt(iw,ih),-2,min({size},ih))'"
+    temp_path = output_path + '.part'
+    command = [
+        ffmpeg, '-nostdin', '-y', '-loglevel', 'error',
+        '-i', video_path,
+        '-vf', scale,
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(settings.web_crf),
+        '-pix_fmt', 'yuv420p', '-profile:v', 'main',
+        '-an', '-movflags', '+faststart',
+        '-f', 'mp4', temp_path
+    ]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        print(f"Web rendition failed for {video_path}: {result.stderr.decode('utf-8', 'replace')[-500:]}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+    os.replace(temp_path, output_path)
+    return True
+
+
+def remove_derivatives(media, upload_folder):
+    """
+    Delete a session's derivative files.
+    """
+    for kind in ('web', 'poster', 'sprite'):
+        name = (media or {}).get(kind)
+        path = os.path.join(upload_folder, name) if name else None
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def _write_atomic(path, data):
+    # Readers never see a half-written file under the final name
+    temp_path = path + '.part'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
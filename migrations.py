@@ -0,0 +1,196 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once, in version order, and is recorded in the
+schema_migrations table. A new database is created straight from the
+models and stamped with every version, so migrations only ever run against
+databases that already existed. Run them before starting the web workers:
+
+    flask --app app migrate-db
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+from analysis_parser import parse_analysis
+from progress import apply_contribution, session_contribution
+
+# Arbitrary key for the Postgres advisory lock held while migrating
+MIGRATION_LOCK_ID = 7_140_215
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable  # (connection, metadata) -> None
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version, name):
+    """
+    Register a migration function.
+    """
+    def register(function):
+        if any(existing.version == version for existing in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append(Migration(version, name, function))
+        MIGRATIONS.sort(key=lambda item: item.version)
+        return function
+    return register
+
+
+def add_column(connection, table, column_name):
+    """
+    Add a model column to an existing table unless it is already there.
+    """
+    if column_name in {column['name'] for column in inspect(connection).get_columns(table.name)}:
+        return
+    column = table.columns[column_name]
+    ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}'
+    if column.server_default is not None:
+        ddl += f" DEFAULT '{column.server_default.arg}'"
+    connection.execute(text(ddl))
+
+
+def create_indexes(connection, table):
+    """
+    Create the table's model indexes that do not exist yet.
+    """
+    existing = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(connection)
+
+
+@migration(1, 'baseline')
+def baseline(connection, metadata):
+    # Databases from before versioned migrations were kept current by adding
+    # whatever columns and indexes the models had gained
+    metadata.create_all(connection)
+    for table in metadata.sorted_tables:
+        for column in table.columns:
+            add_column(connection, table, column.name)
+        create_indexes(connection, table)
+
+
+@migration(2, 'session export index')
+def session_export_index(connection, metadata):
+    create_indexes(connection, metadata.tables['workout_session'])
+
+
+@migration(3, 'exercise progress rollups')
+def exercise_progress_rollups(connection, metadata):
+    sessions = metadata.tables['workout_session']
+    rollups = metadata.tables['exercise_progress']
+    rollups.create(connection, checkfirst=True)
+    add_column(connection, sessions, 'progress_contribution')
+
+    # Backfill: one contribution per existing session, summed per user and exercise
+    merged = {}
+    rows = connection.execute(select(
+        sessions.c.id, sessions.c.user_id, sessions.c.exercise, sessions.c.created_at, sessions.c.status,
+        sessions.c.analysis, sessions.c.analysis_sections, sessions.c.rep_metrics
+    ).where(sessions.c.progress_contribution.is_(None))).all()
+    for row in rows:
+        sections = row.analysis_sections if row.analysis_sections is not None else parse_analysis(row.analysis)
+        contribution = session_contribution(row.exercise, row.created_at, row.status, sections, row.rep_metrics)
+        if contribution is None:
+            continue
+        key = (row.user_id, contribution['exercise'])
+        merged[key] = apply_contribution(merged.get(key, {}), contribution)
+        connection.execute(sessions.update().where(sessions.c.id == row.id).values(progress_contribution=contribution))
+    now = datetime.utcnow()
+    for (user_id, exercise), rollup in merged.items():
+        connection.execute(rollups.insert().values(
+            user_id=user_id, exercise=exercise, revision=1, updated_at=now,
+            totals=rollup['totals'], weeks=rollup['weeks'], flaws=rollup['flaws']
+        ))
+
+
+@migration(4, 'persona feedback panel')
+def persona_feedback_panel(connection, metadata):
+    metadata.tables['persona_feedback'].create(connection, checkfirst=True)
+
+
+@migration(5, 'llm usage per session')
+def llm_usage_per_session(connection, metadata):
+    add_column(connection, metadata.tables['workout_session'], 'llm_usage')
+
+
+@migration(6, 'session row version')
+def session_row_version(connection, metadata):
+    sessions = metadata.tables['workout_session']
+    add_column(connection, sessions, 'updated_at')
+    connection.execute(sessions.update().where(sessions.c.updated_at.is_(None)).values(updated_at=sessions.c.created_at))
+
+
+@migration(7, 'longer exercise names')
+def longer_exercise_names(connection, metadata):
+    # SQLite does not enforce VARCHAR lengths; on Postgres widening one only
+    # changes the catalog, without rewriting the table or its indexes
+    if connection.dialect.name != 'postgresql':
+        return
+    for table_name in ('workout_session', 'exercise_progress'):
+        column = metadata.tables[table_name].c.exercise
+        connection.execute(text(
+            f'ALTER TABLE {table_name} ALTER COLUMN exercise TYPE {column.type.compile(connection.dialect)}'
+        ))
+
+
+@migration(8, 'persona panel status')
+def persona_panel_status(connection, metadata):
+    add_column(connection, metadata.tables['workout_session'], 'panel_status')
+
+
+def applied_versions(connection):
+    if not inspect(connection).has_table(schema_migrations.name):
+        return set()
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending_migrations(engine):
+    with engine.connect() as connection:
+        applied = applied_versions(connection)
+    return [item for item in MIGRATIONS if item.version not in applied]
+
+
+def upgrade(engine, metadata):
+    """
+    Bring the database up to the latest version. Returns the migrations
+    that ran; an empty list means it was already current.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            # Several workers starting at once must not migrate concurrently
+            connection.execute(text('SELECT pg_advisory_xact_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+        existing_tables = set(inspect(connection).get_table_names())
+        schema_migrations.create(connection, checkfirst=True)
+        applied = applied_versions(connection)
+
+        if not existing_tables & set(metadata.tables):
+            metadata.create_all(connection)
+            ran = []
+            pending = MIGRATIONS
+        else:
+            pending = [item for item in MIGRATIONS if item.version not in applied]
+            for item in pending:
+                item.upgrade(connection, metadata)
+            ran = pending
+
+        now = datetime.utcnow()
+        for item in pending:
+            if item.version not in applied:
+                connection.execute(schema_migrations.insert().values(version=item.version, name=item.name, applied_at=now))
+    return ran
@@ -0,0 +1,145 @@
+from datetime import datetime
+
+from flask_login import UserMixin
+
+from analysis_parser import parse_analysis
+from config import EXERCISE_NAME_LENGTH
+from extensions import db, login_manager
+
+
+class User(db.Model, UserMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(150), unique=True, nullable=False)
+    email = db.Column(db.String(150), unique=True, nullable=False)
+    password = db.Column(db.String(150), nullable=False)
+
+
+class WorkoutSession(db.Model):
+    __table_args__ = (
+        # Serves the per-user, newest-first listing on the dashboard
+        db.Index('ix_workout_session_user_created', 'user_id', 'created_at', 'id'),
+        # Serves the ownership and ETag lookups in uploaded_file()
+        db.Index('ix_workout_session_file_user', 'video_filename', 'user_id'),
+        # Serves exports filtered by exercise and date range
+        db.Index('ix_workout_session_user_exercise_created', 'user_id', 'exercise', 'created_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    file_type = db.Column(db.String(10), nullable=False)  # 'video' or 'image'
+    video_filename = db.Column(db.String(300), nullable=False)
+    exercise = db.Column(db.String(EXERCISE_NAME_LENGTH))
+    analysis = db.Column(db.Text)
+    analysis_sections = db.Column(db.JSON(none_as_null=True))  # parsed from analysis by set_analysis()
+    feedback = db.Column(db.Text)
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    character_id = db.Column(db.String(50))
+    character_name = db.Column(db.String(100))
+    video_hash = db.Column(db.String(64), index=True)  # SHA-256 of the uploaded file
+    # Background analysis state: 'pending', 'processing', 'retrying', 'complete' or 'failed'
+    status = db.Column(db.String(20), nullable=False, default='complete', server_default='complete')
+    progress = db.Column(db.Integer, nullable=False, default=100, server_default='100')
+    status_message = db.Column(db.String(200))
+    # Persona panel job state: 'pending', 'complete' or 'failed'; None until one is requested
+    panel_status = db.Column(db.String(20))
+    pose_metrics = db.Column(db.JSON(none_as_null=True))  # joint angle series from pose.pose_metrics()
+    rep_metrics = db.Column(db.JSON(none_as_null=True))  # rep count, tempo and ROM from reps.rep_metrics()
+    media = db.Column(db.JSON(none_as_null=True))  # derivative file names from media.generate_derivatives()
+    progress_contribution = db.Column(db.JSON(none_as_null=True))  # what this session added to its ExerciseProgress rollup
+    llm_usage = db.Column(db.JSON(none_as_null=True))  # prompt version, tokens and latency per call from prompts.usage_record()
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # row version for fragment_cache
+
+    @property
+    def is_complete(self):
+        return self.status in ('complete', 'failed')
+
+    @property
+    def formatted_date(self):
+        """Return the date in AM/PM format"""
+        return self.created_at.strftime('%Y-%m-%d %I:%M %p')
+
+    @property
+    def sections(self):
+        """Return the parsed analysis sections, parsing rows not yet backfilled"""
+        if self.analysis_sections is not None:
+            return self.analysis_sections
+        return parse_analysis(self.analysis)
+
+    def set_analysis(self, analysis):
+        """Store the analysis text together with its parsed sections"""
+        self.analysis = analysis
+        self.analysis_sections = parse_analysis(analysis)
+
+    @property
+    def display_name(self):
+        """Return the exercise name in title case, preserving hyphens"""
+        if not self.exercise:
+            return ''
+        return ' '.join(word.title() for word in self.exercise.split()).replace('- ', '-')
+
+    @property
+    def playback_filename(self):
+        """Return the web rendition if one has been generated, else the original upload"""
+        return (self.media or {}).get('web') or self.video_filename
+
+    @property
+    def cursor(self):
+        """Keyset pagination cursor pointing just past this session"""
+        return f"{self.created_at.isoformat()}_{self.id}"
+
+    user = db.relationship('User', backref='sessions')
+    # Extra personas' feedback on the same analysis, see generate_panel()
+    panel = db.relationship('PersonaFeedback', backref='session', cascade='all, delete-orphan',
+                            order_by='PersonaFeedback.id')
+
+
+class PersonaFeedback(db.Model):
+    """
+    Feedback on a session's stored analysis in one more persona's voice, so
+    the session page can switch personas without new model calls.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'character_id', name='uq_persona_feedback_session_character'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('workout_session.id', ondelete='CASCADE'), nullable=False)
+    character_id = db.Column(db.String(50), nullable=False)
+    feedback = db.Column(db.Text, nullable=False)
+    prompt_tokens = db.Column(db.Integer)  # as reported by the API; a batched request's usage is split evenly
+    completion_tokens = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class AnalysisCacheEntry(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    analysis = db.Column(db.Text, nullable=False)
+    feedback = db.Column(db.Text, nullable=False)
+    pose_metrics = db.Column(db.JSON(none_as_null=True))
+    rep_metrics = db.Column(db.JSON(none_as_null=True))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    hits = db.Column(db.Integer, default=0, nullable=False)
+
+
+class ExerciseProgress(db.Model):
+    """
+    Per-user, per-exercise rollup of session counts, weekly activity, reps,
+    ROM and recurring flaws, kept current by sync_session_progress().
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    exercise = db.Column(db.String(EXERCISE_NAME_LENGTH), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)  # bumped on every update
+    totals = db.Column(db.JSON, nullable=False, default=dict)
+    weeks = db.Column(db.JSON, nullable=False, default=dict)  # ISO week -> counts
+    flaws = db.Column(db.JSON, nullable=False, default=dict)  # flaw key -> sessions
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def as_rollup(self):
+        return {'exercise': self.exercise, 'totals': self.totals, 'weeks': self.weeks, 'flaws': self.flaws}
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    return User.query.get(int(user_id))
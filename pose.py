@@ -0,0 +1,342 @@
+import hashlib
+import os
+import tempfile
+import time
+import urllib.request
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+# COCO-18 keypoint order used by OpenPose-style networks
+KEYPOINTS = [
+    'nose', 'neck',
+    'r_shoulder', 'r_elbow', 'r_wrist',
+    'l_shoulder', 'l_elbow', 'l_wrist',
+    'r_hip', 'r_knee', 'r_ankle',
+    'l_hip', 'l_knee', 'l_ankle',
+    'r_eye', 'l_eye', 'r_ear', 'l_ear'
+]
+KP = {name: i for i, name in enumerate(KEYPOINTS)}
+
+# (a, b, c) keypoint triples: the angle is measured at b, for right and left sides
+JOINTS = {
+    'knee': [('r_hip', 'r_knee', 'r_ankle'), ('l_hip', 'l_knee', 'l_ankle')],
+    'hip': [('r_shoulder', 'r_hip', 'r_knee'), ('l_shoulder', 'l_hip', 'l_knee')],
+    'elbow': [('r_shoulder', 'r_elbow', 'r_wrist'), ('l_shoulder', 'l_elbow', 'l_wrist')]
+}
+
+# The network installed by "flask fetch-pose-model": lightweight OpenPose
+# (MobileNet backbone, about 16 MB of ONNX), whose heatmap outputs hold the 18
+# keypoints in KEYPOINTS order plus background. The file is checked against
+# the SHA-1 published in OpenCV's test-data registry.
+POSE_MODEL_URL = 'https://drive.google.com/uc?export=download&id=1--Ij_gIzCeNA488u5TA4FqWMMdxBqOji'
+POSE_MODEL_SHA1 = '5960f7aef233d75f8f4020be1fd911b2d93fbffc'
+
+
+@dataclass
+class PoseTrack:
+    timestamps: np.ndarray  # (frames,) seconds
+    keypoints: np.ndarray  # (frames, 18, 3) float32: x, y normalized to [0, 1], confidence
+    aspect: float  # frame width / height, to undo the normalization for angles
+    inference_seconds: float = 0.0
+    truncated: bool = False
+    sample_fps: float = 0.0  # pose frames per second of video actually run
+
+
+class PoseEstimator:
+    """
+    CPU pose estimation with an OpenPose-style network loaded through
+    cv2.dnn (COCO-18 heatmaps in the first output channels).
+
+    Frames are fed one at a time with add_frame() and run through the
+    network in batches. start() plans each clip so inference fits in about
+    max_seconds: frames are spread evenly over the whole clip, and fewer of
+    them are run on a slow machine or a long clip.
+    """
+
+    def __init__(self, model_path, config_path=None, input_size=256, batch_size=8,
+                 scale=1 / 255.0, mean=0.0, threshold=0.1, max_seconds=5.0):
+        self.net = cv2.dnn.readNet(model_path, config_path) if config_path else cv2.dnn.readNet(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.batch_size = batch_size
+        self.scale = scale
+        self.mean = mean
+        self.threshold = threshold
+        self.max_seconds = max_seconds
+        self.seconds_per_frame = None  # measured inference time, kept across clips
+        self.reset()
+
+    def reset(self):
+        self._pending = []
+        self._timestamps = []
+        self._results = []
+        self._aspect = 1.0
+        self._elapsed = 0.0
+        self._truncated = False
+        self._interval = 0.0
+        self._next_time = 0.0
+        self._max_frames = None
+
+    def start(self, duration, sample_fps):
+        """
+        Plan the pose frames for a clip of duration seconds: sample_fps over
+        the whole clip, or as many evenly spaced frames as max_seconds allows
+        at the measured time per frame. add_frame() skips the frames between
+        the planned times. With no duration the tail past the budget is
+        dropped instead, and the track is marked truncated.
+        """
+        self.reset()
+        if self.seconds_per_frame is None:
+            self._calibrate()
+        self._max_frames = max(1, int(self.max_seconds / self.seconds_per_frame))
+        self._interval = 1.0 / sample_fps
+        if duration:
+            self._interval = max(self._interval, duration / self._max_frames)
+
+    def add_frame(self, timestamp, frame):
+        # Timestamps are frame index / fps, so allow for rounding against the plan
+        if timestamp < self._next_time - 1e-3:
+            return
+        if self._max_frames is not None and len(self._timestamps) >= self._max_frames:
+            self._truncated = True
+            return
+        self._next_time += self._interval
+        height, width = frame.shape[:2]
+        self._aspect = width / float(height)
+        # Shrink before queueing so a pending batch holds only network-sized images
+        self._pending.append(cv2.resize(frame, (self.input_size, self.input_size), interpolation=cv2.INTER_AREA))
+        self._timestamps.append(timestamp)
+        if len(self._pending) >= self.batch_size:
+            self._run_batch()
+
+    def finish(self):
+        """
+        Run any remaining frames and return the PoseTrack for the clip.
+        """
+        if self._pending:
+            self._run_batch()
+        keypoints = np.concatenate(self._results) if self._results else np.zeros((0, len(KEYPOINTS), 3), np.float32)
+        track = PoseTrack(
+            timestamps=np.asarray(self._timestamps[:len(keypoints)], dtype=np.float32),
+            keypoints=keypoints,
+            aspect=self._aspect,
+            inference_seconds=self._elapsed,
+            truncated=self._truncated,
+            sample_fps=1.0 / self._interval if self._interval else 0.0
+        )
+        self.reset()
+        return track
+
+    def _run_batch(self):
+        started = time.perf_counter()
+        blob = cv2.dnn.blobFromImages(
+            self._pending, self.scale, (self.input_size, self.input_size),
+            (self.mean, self.mean, self.mean), swapRB=False, crop=False
+        )
+        self.net.setInput(blob)
+        output = heatmap_output(self.net.forward(self.net.getUnconnectedOutLayersNames()))
+        self._results.append(keypoints_from_heatmaps(output[:, :len(KEYPOINTS)], self.threshold))
+        elapsed = time.perf_counter() - started
+        per_frame = elapsed / len(self._pending)
+        self.seconds_per_frame = per_frame if self.seconds_per_frame is None else 0.7 * self.seconds_per_frame + 0.3 * per_frame
+        self._pending = []
+        self._elapsed += elapsed
+
+    def _calibrate(self):
+        # Two blank batches: the first run of a network also allocates, so only the second is timed
+        blank = np.zeros((self.input_size, self.input_size, 3), np.uint8)
+        for _ in range(2):
+            self.seconds_per_frame = None
+            self._pending = [blank] * self.batch_size
+            self._run_batch()
+        self.reset()
+
+
+def heatmap_output(outputs):
+    """
+    The keypoint heatmaps among a network's outputs. OpenPose-style networks
+    also output part affinity fields (two channels per limb, 38 for COCO),
+    and lightweight OpenPose outputs both for every refinement stage; the
+    last output with keypoint channels is the most refined.
+    """
+    candidates = [output for output in outputs if output.ndim == 4 and output.shape[1] >= len(KEYPOINTS) and output.shape[1] != 38]
+    if not candidates:
+        raise ValueError(f"No keypoint heatmaps among outputs of shapes {[output.shape for output in outputs]}")
+    return candidates[-1]
+
+
+def load_estimator(config):
+    """
+    Build a PoseEstimator from app config, or return None when no model file
+    is installed at POSE_MODEL_PATH.
+    """
+    model_path = config.get('POSE_MODEL_PATH')
+    config_path = config.get('POSE_CONFIG_PATH')
+    if not model_path or not os.path.exists(model_path):
+        return None
+    if config_path and not os.path.exists(config_path):
+        return None
+    return PoseEstimator(
+        model_path,
+        config_path=config.get('POSE_CONFIG_PATH') or None,
+        input_size=config.get('POSE_INPUT_SIZE', 256),
+        batch_size=config.get('POSE_BATCH_SIZE', 8),
+        scale=config.get('POSE_INPUT_SCALE', 1 / 255.0),
+        mean=config.get('POSE_INPUT_MEAN', 0.0),
+        max_seconds=config.get('POSE_MAX_SECONDS', 5.0)
+    )
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download(url, path, sha1=None, chunk_size=1 << 20):
+    """
+    Stream url to path through a temporary file in the same folder, so a
+    failed or corrupt download never replaces a working file. Raises
+    ValueError when sha1 is given and the content does not match it.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=folder, suffix='.part')
+    try:
+        digest = hashlib.sha1()
+        with os.fdopen(descriptor, 'wb') as f, urllib.request.urlopen(url, timeout=60) as response:
+            for chunk in iter(lambda: response.read(chunk_size), b''):
+                digest.update(chunk)
+                f.write(chunk)
+        if sha1 and digest.hexdigest() != sha1:
+            raise ValueError(f"Checksum mismatch for {url}: expected sha1 {sha1}, got {digest.hexdigest()}")
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def fetch_model(config):
+    """
+    Install the pinned network at POSE_MODEL_PATH. A file already in place
+    is kept when it matches the pinned checksum, so repeated builds do not
+    download again. The network is run once on a blank frame; if that fails
+    the file is removed, so analysis falls back to motion-based rep counts
+    instead of failing on every clip. Returns the PoseEstimator; ValueError
+    if the network cannot be used.
+    """
+    model_path = config['POSE_MODEL_PATH']
+    if not os.path.exists(model_path) or file_sha1(model_path) != POSE_MODEL_SHA1:
+        print(f"Downloading pose weights to {model_path}")
+        download(POSE_MODEL_URL, model_path, POSE_MODEL_SHA1)
+    try:
+        estimator = load_estimator(config)
+        estimator.add_frame(0.0, np.zeros((estimator.input_size, estimator.input_size, 3), np.uint8))
+        estimator.finish()
+    except (cv2.error, ValueError) as e:
+        os.remove(model_path)
+        raise ValueError(f"Pose network at {model_path} could not be run: {e}")
+    return estimator
+
+
+def keypoints_from_heatmaps(heatmaps, threshold=0.1):
+    """
+    Single-person keypoints from (frames, 18, H, W) heatmaps: the peak of
+    each map, normalized to [0, 1]. Peaks below threshold become NaN.
+    """
+    frames, joints, height, width = heatmaps.shape
+    flat = heatmaps.reshape(frames, joints, height * width)
+    peaks = flat.argmax(axis=2)
+    confidence = np.take_along_axis(flat, peaks[..., None], axis=2)[..., 0]
+    x = (peaks % width + 0.5) / width
+    y = (peaks // width + 0.5) / height
+    keypoints = np.stack([x, y, confidence], axis=2).astype(np.float32)
+    keypoints[confidence < threshold, :2] = np.nan
+    return keypoints
+
+
+def joint_angles(track):
+    """
+    Per-frame joint angles in degrees as {name: (frames,) array}: knee, hip
+    and elbow (averaged over the visible sides) and torso lean from vertical.
+    Frames where a joint is not visible are NaN.
+    """
+    points = track.keypoints[..., :2].copy()
+    points[..., 0] *= track.aspect
+    angles = {}
+    for name, sides in JOINTS.items():
+        per_side = np.stack([_angle_at(points, *(KP[p] for p in side)) for side in sides])
+        angles[name] = _nanmean(per_side)
+
+    mid_hip = _nanmean(np.stack([points[:, KP['r_hip']], points[:, KP['l_hip']]]))
+    torso = points[:, KP['neck']] - mid_hip
+    # Image y grows downwards, so an upright torso points to -y
+    angles['torso_lean'] = np.degrees(np.arctan2(np.abs(torso[:, 0]), -torso[:, 1]))
+    return angles
+
+
+def summarize_angles(angles):
+    """
+    Min/mean/max for each joint, skipping joints never detected.
+    """
+    summary = {}
+    for name, values in angles.items():
+        values = values[~np.isnan(values)]
+        if values.size:
+            summary[name] = {
+                'min': round(float(values.min()), 1),
+                'mean': round(float(values.mean()), 1),
+                'max': round(float(values.max()), 1)
+            }
+    return summary
+
+
+def _angle_at(points, a, b, c):
+    ba = points[:, a] - points[:, b]
+    bc = points[:, c] - points[:, b]
+    cosine = np.sum(ba * bc, axis=1) / (np.linalg.norm(ba, axis=1) * np.linalg.norm(bc, axis=1))
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def _nanmean(stacked):
+    # np.nanmean warns on all-NaN slices; count the visible values instead
+    visible = ~np.isnan(stacked)
+    total = np.where(visible, stacked, 0.0).sum(axis=0)
+    count = visible.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def pose_metrics(track):
+    """
+    JSON-ready angle series and summary for storing on a WorkoutSession.
+    Undetected angles are stored as None.
+    """
+    angles = joint_angles(track)
+    return {
+        'timestamps': [round(float(t), 2) for t in track.timestamps],
+        'angles': {
+            name: [None if np.isnan(v) else round(float(v), 1) for v in values]
+            for name, values in angles.items()
+        },
+        'summary': summarize_angles(angles),
+        'inference_seconds': round(track.inference_seconds, 3),
+        'truncated': track.truncated,
+        'sample_fps': round(track.sample_fps, 2)
+    }
+
+
+def describe_pose(summary):
+    """
+    Plain-text lines for the analysis prompt, e.g. "Knee angle: 84-171 degrees (mean 128)".
+    """
+    labels = {'knee': 'Knee angle', 'hip': 'Hip angle', 'elbow': 'Elbow angle', 'torso_lean': 'Torso lean from vertical'}
+    return '\n'.join(
+        f"- {labels.get(name, name)}: {stats['min']:.0f}-{stats['max']:.0f} degrees (mean {stats['mean']:.0f})"
+        for name, stats in summary.items()
+    )
@@ -0,0 +1,152 @@
+import re
+from datetime import datetime, timedelta
+
+# Recurring flaws are recognized in the points of these analysis sections
+FLAW_SECTION_WORDS = ('flaw', 'concern', 'issue', 'fault')
+
+# (key, label, pattern) for flaws common enough to track across sessions;
+# the model words them differently every time, so match on keywords
+FLAW_PATTERNS = [
+    ('knee_valgus', 'Knees caving in', r'knee.{0,40}\b(in(ward)?|cav|valgus|collaps)|valgus'),
+    ('rounded_back', 'Rounded back', r'round(ed|ing)?.{0,20}\b(back|spine)|(back|spine|lumbar).{0,20}\b(round|flex)'),
+    ('heels_lift', 'Heels lifting', r'heels?.{0,30}\b(lift|ris|rais|com(e|ing) up|off)'),
+    ('depth', 'Insufficient depth', r'\bdepth\b|not (deep|low) enough|(above|short of) parallel|partial (rep|range)'),
+    ('forward_lean', 'Excessive forward lean', r'(forward|excessive) (lean|tilt)|lean(s|ing)? (too far )?forward|chest (drop|fall|collaps)'),
+    ('hip_shift', 'Hip shift', r'hips?.{0,20}\b(shift|drift|sway)|(shift|drift)s?.{0,20}\bhip'),
+    ('hips_rise_early', 'Hips rising first', r'hips?.{0,20}\b(shoot|ris\w*).{0,20}\b(first|early|fast)|good ?morning'),
+    ('elbow_flare', 'Elbows flaring', r'elbows?.{0,20}\bflar'),
+    ('bar_path', 'Uneven bar path', r'bar ?path|bar (drift|travel)s? (away|forward)'),
+    ('lockout', 'Incomplete lockout', r'lock ?out|not (fully )?(extend|lock)'),
+    ('head_position', 'Head or neck position', r'\b(head|neck|gaze|chin)\b.{0,30}\b(position|crank|hyperext|tuck|look(ing)? up)'),
+    ('tempo', 'Rushed tempo', r'too (fast|quick)|rush(ed|ing)|bounc(e|ing)|momentum|control(led)? (the )?(descent|eccentric)'),
+    ('core_bracing', 'Weak bracing', r'brac(e|ing)|core (tension|engagement)|arch(ed|ing)? (the )?(lower )?back'),
+    ('asymmetry', 'Left/right imbalance', r'asymmetr|imbalanc|uneven|one side'),
+]
+_FLAW_RES = [(key, re.compile(pattern, re.IGNORECASE)) for key, _, pattern in FLAW_PATTERNS]
+FLAW_LABELS = {key: label for key, label, _ in FLAW_PATTERNS}
+
+# Weeks shown in the progress charts
+CHART_WEEKS = 12
+
+
+def week_key(moment):
+    year, week, _ = moment.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def extract_flaws(sections):
+    """
+    Keys of the tracked flaws mentioned in the flaw sections of a parsed
+    analysis, each at most once.
+    """
+    found = set()
+    for section in sections or []:
+        if not any(word in section['title'].lower() for word in FLAW_SECTION_WORDS):
+            continue
+        for point in section['points']:
+            found.update(key for key, pattern in _FLAW_RES if pattern.search(point))
+    return sorted(found)
+
+
+def session_contribution(exercise, created_at, status, sections, rep_metrics):
+    """
+    What one session adds to its exercise rollup, or None for sessions
+    without an exercise. Stored on the session so the exact same amounts
+    are subtracted when it changes or is deleted.
+    """
+    if not exercise:
+        return None
+    totals = {'sessions': 1}
+    week = {'sessions': 1}
+    if status == 'complete' and sections:
+        totals['analyzed'] = 1
+    reps = rep_metrics or {}
+    if reps.get('count') and reps.get('confident', True):
+        totals['rep_sessions'] = 1
+        totals['reps'] = week['reps'] = reps['count']
+        if reps.get('mean_eccentric') is not None and reps.get('mean_concentric') is not None:
+            totals['tempo_sessions'] = 1
+            totals['eccentric_total'] = round(reps['mean_eccentric'], 3)
+            totals['concentric_total'] = round(reps['mean_concentric'], 3)
+        if reps.get('units') == 'degrees' and reps.get('mean_rom') is not None:
+            totals['rom_sessions'] = week['rom_sessions'] = 1
+            totals['rom_total'] = week['rom_total'] = round(reps['mean_rom'], 3)
+    return {
+        'exercise': exercise,
+        'totals': totals,
+        'weeks': {week_key(created_at or datetime.utcnow()): week},
+        'flaws': {key: 1 for key in extract_flaws(sections)} if status == 'complete' else {}
+    }
+
+
+def apply_contribution(rollup, contribution, sign=1):
+    """
+    Add (sign=1) or subtract (sign=-1) a contribution from a rollup's
+    totals, weeks and flaws dicts. Returns new dicts (JSON columns only
+    notice reassignment); entries that reach zero are dropped. Also used to
+    merge contributions for the same exercise before applying them at once.
+    """
+    totals = _add_counts(rollup.get('totals') or {}, contribution['totals'], sign)
+    flaws = _add_counts(rollup.get('flaws') or {}, contribution['flaws'], sign)
+    weeks = dict(rollup.get('weeks') or {})
+    for week, counts in contribution['weeks'].items():
+        updated = _add_counts(weeks.get(week) or {}, counts, sign)
+        if updated:
+            weeks[week] = updated
+        else:
+            weeks.pop(week, None)
+    return {'exercise': contribution['exercise'], 'totals': totals, 'weeks': weeks, 'flaws': flaws}
+
+
+def _add_counts(current, delta, sign):
+    result = dict(current)
+    for key, value in delta.items():
+        # Rounded so repeated add/subtract of float metrics cannot drift
+        updated = round(result.get(key, 0) + sign * value, 3)
+        if updated:
+            result[key] = updated
+        else:
+            result.pop(key, None)
+    return result
+
+
+def summarize_progress(exercise, rollup, today=None, weeks=CHART_WEEKS):
+    """
+    JSON-ready view of one exercise rollup for the charts page and API.
+    """
+    totals = rollup.get('totals') or {}
+    by_week = rollup.get('weeks') or {}
+    today = today or datetime.utcnow()
+    series = []
+    for offset in range(weeks - 1, -1, -1):
+        key = week_key(today - timedelta(weeks=offset))
+        counts = by_week.get(key, {})
+        series.append({
+            'week': key,
+            'sessions': counts.get('sessions', 0),
+            'reps': counts.get('reps', 0),
+            'mean_rom': _mean(counts.get('rom_total'), counts.get('rom_sessions'))
+        })
+    active_weeks = sorted(by_week)
+    return {
+        'exercise': exercise,
+        'sessions': totals.get('sessions', 0),
+        'analyzed': totals.get('analyzed', 0),
+        'first_week': active_weeks[0] if active_weeks else None,
+        'last_week': active_weeks[-1] if active_weeks else None,
+        'sessions_per_week': round(sum(point['sessions'] for point in series) / weeks, 2),
+        'total_reps': totals.get('reps', 0),
+        'mean_reps': _mean(totals.get('reps'), totals.get('rep_sessions')),
+        'mean_eccentric': _mean(totals.get('eccentric_total'), totals.get('tempo_sessions')),
+        'mean_concentric': _mean(totals.get('concentric_total'), totals.get('tempo_sessions')),
+        'mean_rom': _mean(totals.get('rom_total'), totals.get('rom_sessions')),
+        'flaws': [
+            {'key': key, 'label': FLAW_LABELS.get(key, key.replace('_', ' ').capitalize()), 'sessions': count}
+            for key, count in sorted((rollup.get('flaws') or {}).items(), key=lambda item: (-item[1], item[0]))
+        ],
+        'weekly': series
+    }
+
+
+def _mean(total, count):
+    return round(total / count, 2) if total is not None and count else None
@@ -0,0 +1,423 @@
+"""
+Versioned prompt templates for the analysis and feedback calls, and the
+token budget that keeps their inputs and outputs bounded.
+
+A template is never edited once sessions have used it; a changed prompt is
+registered as a new version, so cached results, the token counts recorded
+on each session and A/B comparisons always refer to one fixed prompt. This
+module only builds messages and counts tokens, with no Flask or network
+access, so it can be exercised offline.
+"""
+import hashlib
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from analysis_parser import format_analysis, parse_analysis
+
+KINDS = ('analysis', 'feedback')
+
+# A low-detail image costs a fixed number of prompt tokens
+IMAGE_TOKENS = 85
+# Chat formatting overhead per message
+MESSAGE_TOKENS = 4
+
+# Feedback length: the persona's own feedback_tokens, raised for analyses
+# with many issues to a base allowance plus some per issue, up to
+# FEEDBACK_MAX_TOKENS
+FEEDBACK_BASE_TOKENS = 100
+FEEDBACK_TOKENS_PER_ISSUE = 25
+FEEDBACK_MAX_TOKENS = 400
+ISSUE_SECTION_WORDS = ('flaw', 'improvement', 'safety', 'concern', 'issue')
+
+# Compact sections are kept in this order of importance when the analysis
+# has to be cut down for the feedback call
+SECTION_PRIORITY = ('flaw', 'improvement', 'safety', 'corrective', 'form', 'advanced')
+
+# Multi-joint lifts get the full analysis allowance; single-joint and
+# accessory movements have less to assess
+COMPOUND_WORDS = ('squat', 'deadlift', 'clean', 'snatch', 'jerk', 'press', 'row', 'lunge', 'pull-up', 'chin-up',
+                  'thruster', 'swing', 'push-up', 'dip', 'step-up', 'hip thrust')
+ACCESSORY_OUTPUT_SCALE = 0.7
+
+# Approximates the GPT-4 tokenizer's pre-split: contractions, words with
+# their leading space, up to three digits, punctuation runs and whitespace
+_PIECE_RE = re.compile(r"'(?:s|t|re|ve|m|ll|d)|\s?[A-Za-z]+|\s?\d{1,3}|\s?[^\sA-Za-z\d]+|\s+")
+
+
+def count_tokens(text):
+    """
+    Estimate the tokens in text. Offline and dependency-free; within about
+    15% of the real tokenizer on English prompts, which is close enough for
+    budgeting. Short words are one token and longer ones one per 6 letters.
+    """
+    total = 0
+    for piece in _PIECE_RE.findall(text or ''):
+        word = piece.strip()
+        if not word:
+            total += 1
+        elif word.isascii() and word.isalpha():
+            total += math.ceil(len(word) / 6)
+        elif word.isascii():
+            total += math.ceil(len(word) / 3)
+        else:
+            total += len(word)
+    return total
+
+
+def count_message_tokens(messages):
+    """
+    Estimated prompt tokens for chat messages, including attached images.
+    """
+    total = 0
+    for message in messages:
+        total += MESSAGE_TOKENS
+        content = message['content']
+        if isinstance(content, str):
+            total += count_tokens(content)
+            continue
+        for part in content:
+            total += IMAGE_TOKENS if part.get('type') == 'image_url' else count_tokens(part.get('text', ''))
+    return total
+
+
+def truncate_tokens(text, limit):
+    """
+    Cut text to at most limit estimated tokens, at a word boundary.
+    """
+    if count_tokens(text) <= limit:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(' '.join(words[:middle]) + ' ...') <= limit:
+            low = middle
+        else:
+            high = middle - 1
+    return ' '.join(words[:low]) + ' ...' if low else ''
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    kind: str
+    version: int
+    system: str
+    user: str  # str.format() template
+    instructions: str = ''  # feedback only: the persona request, formatted with {style}
+    input_budget: Optional[int] = None  # tokens for the variable inputs; None sends them whole
+    max_output_tokens: Optional[int] = None
+
+
+@dataclass
+class Prompt:
+    """
+    Messages ready to send, with what went into them for the usage record.
+    """
+    kind: str
+    version: int
+    messages: List[Dict[str, Any]]
+    max_tokens: Optional[int]
+    estimated_tokens: int
+    trimmed: List[str] = field(default_factory=list)
+
+    def params(self):
+        return {'max_tokens': self.max_tokens} if self.max_tokens else {}
+
+
+TEMPLATES: Dict[Tuple[str, int], PromptTemplate] = {}
+
+
+def register(template):
+    key = (template.kind, template.version)
+    if key in TEMPLATES:
+        raise ValueError(f"Duplicate {template.kind} prompt version {template.version}")
+    TEMPLATES[key] = template
+    return template
+
+
+def get_template(kind, version):
+    try:
+        return TEMPLATES[(kind, version)]
+    except KeyError:
+        raise ValueError(f"No {kind} prompt version {version}")
+
+
+ANALYSIS_SYSTEM_V1 = (
+    "You are a highly experienced and strict fitness trainer. Provide specific, detailed observations and "
+    "recommendations based on the workout being analyzed. Format responses with clear numbering and dashes only, "
+    "adding a blank line between numbered sections. Do not use asterisks, bold text, or other formatting."
+)
+
+register(PromptTemplate(
+    kind='analysis',
+    version=1,
+    system=ANALYSIS_SYSTEM_V1,
+    user="""
+        As a strict and detail-oriented fitness trainer analyzing a {exercise} workout, provide a thorough critique. The user has provided these notes: {notes}
+
+        Analyze the workout and provide specific feedback in these exact sections. Each section should contain your actual observations and recommendations, not descriptions of what to look for:
+
+        1. Form Assessment
+           - Describe the actual posture and alignment observed
+           - Detail the specific movement patterns seen
+           - Evaluate the actual range of motion achieved
+           - Comment on the observed tempo and control
+
+        2. Technical Flaws
+           - List the specific form deviations observed
+           - Describe the exact incorrect movements seen
+           - Detail any compensatory patterns noticed
+
+        3. Critical Improvements
+           - List the specific corrections needed, based on observations
+           - Identify the most urgent safety issues seen
+           - Detail any mobility limitations observed
+
+        4. Safety Concerns
+           - List specific injury risks based on observed form
+           - Describe dangerous movement patterns seen
+           - Detail any stability issues noticed
+
+        5. Corrective Actions
+           - Provide specific cues to address the observed issues
+           - Recommend specific mobility exercises needed
+           - Suggest appropriate regression exercises
+
+        6. Advanced Recommendations
+           - List specific form refinements for improvement
+           - Suggest appropriate progression exercises
+           - Provide advanced technique tips based on current form
+
+        Format each section with a numbered heading followed by bullet points of actual observations and recommendations. Add a blank line between sections. Be direct and specific about what you observed.
+        """,
+    max_output_tokens=1000
+))
+
+register(PromptTemplate(
+    kind='analysis',
+    version=2,
+    system=ANALYSIS_SYSTEM_V1,
+    user=(
+        "Critique this {exercise} set. User notes: {notes}\n\n"
+        "Answer in exactly these numbered sections, each with 2-4 dash bullets of what you actually observed "
+        "(not what to look for), a blank line between sections:\n"
+        "1. Form Assessment: posture, alignment, range of motion, tempo\n"
+        "2. Technical Flaws: deviations and compensations\n"
+        "3. Critical Improvements: most urgent corrections, mobility limits\n"
+        "4. Safety Concerns: injury risks, unstable positions\n"
+        "5. Corrective Actions: cues, mobility work, regressions\n"
+        "6. Advanced Recommendations: refinements and progressions\n"
+        "Be direct and specific; no introduction or summary."
+    ),
+    input_budget=400,
+    max_output_tokens=700
+))
+
+FEEDBACK_SYSTEM_V1 = "You are a coach giving feedback on a workout, in the voice and style you are asked to use."
+
+register(PromptTemplate(
+    kind='feedback',
+    version=1,
+    system=FEEDBACK_SYSTEM_V1,
+    user="A user performed a {exercise}. The analysis of their form indicates the following issues:\n{analysis}",
+    instructions="{style}\n\nProvide feedback in character, addressing these issues and offering suggestions to improve the form."
+))
+
+register(PromptTemplate(
+    kind='feedback',
+    version=2,
+    system=FEEDBACK_SYSTEM_V1,
+    user="A user performed a {exercise}. The key points from the analysis of their form:\n{analysis}",
+    instructions=(
+        "{style}\n\nGive your feedback in character: address the most important issues and give a few concrete "
+        "cues to fix them. Keep it to one or two short paragraphs."
+    ),
+    input_budget=300
+))
+
+
+def choose_version(kind, config, key):
+    """
+    The template version for a kind. When PROMPT_AB_PERCENT is set, that
+    share of keys (video hashes, so one upload always gets the same arm)
+    use the candidate version instead of the control.
+    """
+    control = config[f'{kind.upper()}_PROMPT_VERSION']
+    candidate = config.get(f'{kind.upper()}_PROMPT_CANDIDATE')
+    percent = config.get('PROMPT_AB_PERCENT', 0)
+    if not candidate or not percent or not key:
+        return control
+    bucket = int(hashlib.sha256(f'{kind}:{key}'.encode('utf-8')).hexdigest()[:8], 16) % 100
+    return candidate if bucket < percent else control
+
+
+def analysis_max_tokens(template, exercise):
+    if template.max_output_tokens is None:
+        return None
+    name = (exercise or '').lower()
+    if any(word in name for word in COMPOUND_WORDS):
+        return template.max_output_tokens
+    return int(template.max_output_tokens * ACCESSORY_OUTPUT_SCALE)
+
+
+def build_analysis_prompt(template, exercise, notes, measurements=(), keyframes=None):
+    """
+    Analysis messages. measurements are text blocks from pose estimation and
+    rep counting; keyframes (frames.Keyframe) are attached as low-detail
+    images. With an input_budget, the user's notes are trimmed first and
+    then the measurement blocks (last first) until the variable inputs fit.
+    """
+    notes = notes or ''
+    measurements = [block for block in measurements if block]
+    trimmed = []
+    if template.input_budget is not None:
+        over = count_tokens(notes) + sum(count_tokens(block) for block in measurements) - template.input_budget
+        if over > 0 and notes:
+            limit = max(count_tokens(notes) - over, 0)
+            notes = truncate_tokens(notes, limit)
+            trimmed.append('notes')
+            over = count_tokens(notes) + sum(count_tokens(block) for block in measurements) - template.input_budget
+        while over > 0 and measurements:
+            over -= count_tokens(measurements.pop())
+            trimmed.append('measurements')
+
+    text = template.user.format(exercise=exercise, notes=notes) + ''.join(measurements)
+    if keyframes:
+        timestamps = ', '.join(f'{frame.timestamp:.1f}s' for frame in keyframes)
+        content = [{"type": "text", "text": text + f"\nThe attached images are key frames from the video at {timestamps}."}]
+        content += [
+            {"type": "image_url", "image_url": {"url": frame.data_url(), "detail": "low"}}
+            for frame in keyframes
+        ]
+    else:
+        content = text
+    messages = [{"role": "system", "content": template.system}, {"role": "user", "content": content}]
+    return Prompt('analysis', template.version, messages, analysis_max_tokens(template, exercise),
+                  count_message_tokens(messages), trimmed)
+
+
+def compact_analysis(analysis, budget):
+    """
+    Cut an analysis down to about budget tokens by keeping the leading
+    points of every section, the most important sections first, then
+    rendering the kept points in their original order. Returns (text,
+    number of issue points kept).
+    """
+    sections = parse_analysis(analysis)
+    if not sections:
+        return truncate_tokens((analysis or '').strip(), budget), 0
+
+    def priority(index):
+        title = sections[index]['title'].lower()
+        return next((rank for rank, word in enumerate(SECTION_PRIORITY) if word in title), len(SECTION_PRIORITY))
+
+    order = sorted(range(len(sections)), key=priority)
+    kept = [[] for _ in sections]
+    used = sum(count_tokens(section['title']) + 1 for section in sections)
+    depth = 0
+    while used < budget and any(depth < len(section['points']) for section in sections):
+        for index in order:
+            points = sections[index]['points']
+            if depth >= len(points):
+                continue
+            cost = count_tokens(points[depth]) + 2
+            if used + cost > budget:
+                used = budget
+                break
+            kept[index].append(points[depth])
+            used += cost
+        depth += 1
+
+    compacted = [{'title': section['title'], 'points': points} for section, points in zip(sections, kept) if points]
+    issues = sum(
+        len(section['points']) for section in compacted
+        if any(word in section['title'].lower() for word in ISSUE_SECTION_WORDS)
+    )
+    return format_analysis(compacted), issues
+
+
+def feedback_max_tokens(template, character, issues):
+    return max(character.feedback_tokens, min(FEEDBACK_MAX_TOKENS, FEEDBACK_BASE_TOKENS + FEEDBACK_TOKENS_PER_ISSUE * issues))
+
+
+def build_feedback_prompt(template, exercise, analysis, characters, instructions=None):
+    """
+    Feedback messages: the analysis first and the persona instructions last,
+    so every persona's request for one analysis shares a prompt prefix
+    (which providers with prompt caching bill at a discount). instructions
+    replaces the single persona's request, for the batched panel call; the
+    output allowance is then the sum of the personas'.
+    """
+    trimmed = []
+    issues = 0
+    if template.input_budget is not None:
+        compacted, issues = compact_analysis(analysis, template.input_budget)
+        if compacted != (analysis or '').strip():
+            trimmed.append('analysis')
+        analysis = compacted
+    if instructions is None:
+        instructions = template.instructions.format(style=characters[0].prompt_style)
+    messages = [
+        {"role": "system", "content": template.system},
+        {"role": "user", "content": template.user.format(exercise=exercise, analysis=analysis)},
+        {"role": "user", "content": instructions}
+    ]
+    max_tokens = None
+    if template.input_budget is not None:
+        max_tokens = sum(feedback_max_tokens(template, character, issues) for character in characters)
+    return Prompt('feedback', template.version, messages, max_tokens, count_message_tokens(messages), trimmed)
+
+
+def usage_record(prompt, result, model):
+    """
+    What is stored on the session for one call: the template version, the
+    estimated and reported token counts, and the latency.
+    """
+    return {
+        'version': prompt.version,
+        'model': model,
+        'estimated_prompt_tokens': prompt.estimated_tokens,
+        'prompt_tokens': result.usage.get('prompt_tokens'),
+        'completion_tokens': result.usage.get('completion_tokens'),
+        'max_tokens': prompt.max_tokens,
+        'latency_ms': round(1000 * result.latency),
+        'trimmed': prompt.trimmed
+    }
+
+
+def summarize_usage(records):
+    """
+    Per (kind, version) means over session usage records, for comparing
+    prompt versions. records yields {'analysis': {...}, 'feedback': {...}}.
+    """
+    groups = {}
+    for record in records:
+        for kind in KINDS:
+            call = (record or {}).get(kind)
+            if not call:
+                continue
+            group = groups.setdefault((kind, call['version']), {'sessions': 0, 'latency_ms': [], 'prompt_tokens': [],
+                                                                 'completion_tokens': []})
+            group['sessions'] += 1
+            for key in ('latency_ms', 'prompt_tokens', 'completion_tokens'):
+                if call.get(key) is not None:
+                    group[key].append(call[key])
+    summary = []
+    for (kind, version), group in sorted(groups.items()):
+        latencies = sorted(group['latency_ms'])
+        summary.append({
+            'kind': kind,
+            'version': version,
+            'sessions': group['sessions'],
+            'mean_prompt_tokens': _mean(group['prompt_tokens']),
+            'mean_completion_tokens': _mean(group['completion_tokens']),
+            'mean_latency_ms': _mean(latencies),
+            'p95_latency_ms': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None
+        })
+    return summary
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 1) if values else None
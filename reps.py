@@ -0,0 +1,353 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+# Lifts whose first movement away from the start position is the lifting (concentric) phase
+CONCENTRIC_FIRST = ('curl', 'deadlift', 'row', 'pull', 'raise', 'shrug', 'extension', 'clean', 'snatch')
+
+# A pose angle is only used as the rep signal when it was detected in this share of frames
+MIN_ANGLE_COVERAGE = 0.8
+
+# Pose rep counts from tracks sampled more sparsely than this (long clips on a
+# slow CPU) are not trusted
+MIN_POSE_SAMPLE_FPS = 2.0
+
+# Samples within this share of the range of a turning point count as a pause there
+PAUSE_TOLERANCE = 0.05
+
+# Smallest spread of the frame-to-frame change (mean gray levels per sample) that counts as movement
+MIN_MOTION_RANGE = 1.5
+
+# A motion stroke starts above this share of the frame change range and ends below the lower one
+STROKE_THRESHOLDS = (0.25, 0.5)
+
+# Aligning out a camera shift is kept when it cuts the median pixel change below this share
+CAMERA_SHIFT_GAIN = 0.8
+
+# Rep counts are only trusted when rep durations vary less than this (std / mean)
+MAX_TEMPO_SPREAD = 0.35
+
+
+@dataclass
+class Rep:
+    start: float  # seconds, at the start position
+    turn: float  # seconds, at the far end of the movement
+    end: float  # seconds, back at the start position
+    eccentric: float  # seconds
+    concentric: float  # seconds
+    rom: float  # range of motion in signal units; only meaningful in degrees
+
+
+@dataclass
+class RepAnalysis:
+    signal: str  # 'knee', 'hip', ... for pose angles, or 'motion' for the frame signal
+    units: str  # 'degrees' for pose angles, 'gray levels' for the frame signal
+    reps: List[Rep] = field(default_factory=list)
+    confident: bool = True  # False when the count is too unreliable to show or prompt with
+
+    def to_dict(self):
+        """
+        JSON-ready summary for storing on a WorkoutSession.
+        """
+        eccentric = [rep.eccentric for rep in self.reps]
+        concentric = [rep.concentric for rep in self.reps]
+        return {
+            'signal': self.signal,
+            'units': self.units,
+            'count': len(self.reps),
+            'confident': self.confident,
+            'mean_eccentric': round(float(np.mean(eccentric)), 2) if self.reps else None,
+            'mean_concentric': round(float(np.mean(concentric)), 2) if self.reps else None,
+            'mean_rom': round(float(np.mean([rep.rom for rep in self.reps])), 3) if self.reps else None,
+            'reps': [
+                {
+                    'start': round(rep.start, 2),
+                    'end': round(rep.end, 2),
+                    'eccentric': round(rep.eccentric, 2),
+                    'concentric': round(rep.concentric, 2),
+                    'rom': round(rep.rom, 3)
+                }
+                for rep in self.reps
+            ]
+        }
+
+
+def analyze_reps(timestamps, signal, signal_name='motion', units='gray levels', concentric_first=False,
+                 smoothing_seconds=0.3, min_range=0.0):
+    """
+    Segment a per-frame position signal into reps.
+
+    The signal is oriented so the clip starts at the "top" (the start
+    position), smoothed with a moving average and split into top and bottom
+    phases with hysteresis thresholds at 35% and 65% of its range. Each
+    top -> bottom -> top cycle is one rep. Tempo is measured between leaving
+    one turning point and arriving at the next, so pauses at the top or
+    bottom are not counted as eccentric or concentric time. Everything is
+    vectorized, so the cost is a handful of passes over the samples.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    signal = np.asarray(signal, dtype=np.float64)
+    analysis = RepAnalysis(signal_name, units)
+    if signal.size < 4:
+        return analysis
+
+    interval = float(np.median(np.diff(timestamps))) or 1.0
+    smoothed = smooth(signal, max(1, int(round(smoothing_seconds / interval))))
+    if smoothed[0] < np.median(smoothed):
+        smoothed = -smoothed
+
+    low, high = np.percentile(smoothed, [5, 95])
+    if high - low <= max(min_range, 1e-9):
+        return analysis
+    arrive, depart, value = phase_extents(
+        smoothed, low + 0.35 * (high - low), low + 0.65 * (high - low), PAUSE_TOLERANCE * (high - low)
+    )
+
+    # Phases alternate top, bottom, top, ... starting at a top
+    count = (len(value) - 1) // 2
+    if count <= 0:
+        return analysis
+    top, bottom, next_top = np.arange(count) * 2, np.arange(count) * 2 + 1, np.arange(count) * 2 + 2
+    start, turn, end = timestamps[depart[top]], timestamps[arrive[bottom]], timestamps[arrive[next_top]]
+    first = turn - start
+    second = end - timestamps[depart[bottom]]
+    eccentric, concentric = (second, first) if concentric_first else (first, second)
+    rom = np.maximum(value[top], value[next_top]) - value[bottom]
+
+    analysis.reps = [
+        Rep(float(a), float(b), float(c), float(e), float(f), float(r))
+        for a, b, c, e, f, r in zip(start, turn, end, eccentric, concentric, rom)
+    ]
+    return analysis
+
+
+def smooth(signal, window):
+    """
+    Centered moving average, padding with the edge values.
+    """
+    if window <= 1:
+        return signal.copy()
+    padded = np.pad(signal, (window // 2, window - 1 - window // 2), mode='edge')
+    return np.convolve(padded, np.ones(window) / window, mode='valid')
+
+
+def phase_extents(signal, low, high, tolerance):
+    """
+    Split signal into alternating top and bottom phases, starting with a top.
+    A phase only changes once the signal crosses the opposite threshold, so
+    jitter between low and high is ignored. Returns per-phase arrays of the
+    first and last index within tolerance of the phase's extreme (arriving
+    at and leaving a pause) and the extreme value itself.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    state = hysteresis(signal, low, high)
+    if state is None:
+        return empty, empty, np.zeros(0)
+    index = np.arange(signal.size)
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(state)) + 1))
+    lengths = np.diff(np.append(starts, signal.size))
+    phases = state[starts]
+    # Flip bottom phases so every extreme is a maximum
+    oriented = signal * np.repeat(phases, lengths)
+    extremes = np.maximum.reduceat(oriented, starts)
+    near = oriented >= np.repeat(extremes - tolerance, lengths)
+    arrive = np.minimum.reduceat(np.where(near, index, signal.size), starts)
+    depart = np.maximum.reduceat(np.where(near, index, -1), starts)
+    value = extremes * phases
+    if phases[0] < 0:
+        return arrive[1:], depart[1:], value[1:]
+    return arrive, depart, value
+
+
+def hysteresis(signal, low, high):
+    """
+    +1 above high, -1 below low, carried forward through the band in between
+    (samples before the first crossing take its value). None when the signal
+    never leaves the band.
+    """
+    state = np.where(signal > high, 1, np.where(signal < low, -1, 0))
+    marked = np.flatnonzero(state)
+    if marked.size == 0:
+        return None
+    carry = np.maximum.accumulate(np.where(state != 0, np.arange(signal.size), -1))
+    return np.where(carry >= 0, state[np.maximum(carry, 0)], state[marked[0]])
+
+
+def motion_energy(thumbnails, margin=4):
+    """
+    How much the picture changes between consecutive (frames, height, width)
+    grayscale thumbnails: the mean absolute difference after aligning out
+    the shift between them, so a handheld camera panning or drifting does not
+    read as movement. A camera shift changes most of the picture, so the
+    alignment is only kept when it lowers the median pixel change; over a
+    plain background the shift found may be the lifter's own. margin pixels
+    at the edges, where the alignment pads, are left out. The first frame
+    takes the second's value.
+    """
+    frames = np.asarray(thumbnails, dtype=np.float32)
+    energy = np.zeros(len(frames))
+    if len(frames) < 2:
+        return energy
+    height, width = frames.shape[1:]
+    inner = (slice(margin, height - margin), slice(margin, width - margin))
+    for index in range(1, len(frames)):
+        (dx, dy), _ = cv2.phaseCorrelate(frames[index - 1], frames[index])
+        aligned = cv2.warpAffine(
+            frames[index], np.float32([[1, 0, -dx], [0, 1, -dy]]), (width, height), borderMode=cv2.BORDER_REPLICATE
+        )
+        change = np.abs(frames[index][inner] - frames[index - 1][inner])
+        aligned_change = np.abs(aligned[inner] - frames[index - 1][inner])
+        if np.median(aligned_change) < CAMERA_SHIFT_GAIN * np.median(change):
+            change = aligned_change
+        energy[index] = change.mean()
+    energy[0] = energy[1]
+    return energy
+
+
+def reps_from_motion(timestamps, thumbnails, concentric_first=False, smoothing_seconds=0.25):
+    """
+    Reps from frame-to-frame change alone, for clips without pose angles.
+
+    The change is high while the lifter moves and dips at each turning
+    point, so hysteresis on it splits the clip into strokes, and each rep is
+    an away stroke followed by a return stroke. Strokes are paired at the
+    offset with the shorter gaps inside pairs, since lifters turn around
+    faster at the far end than they rest between reps. The result is marked
+    not confident when no rep was found or rep durations are irregular,
+    which is what setup, racking or walking in the clip look like.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    analysis = RepAnalysis('motion', 'gray levels', confident=False)
+    interval = float(np.median(np.diff(timestamps))) or 1.0
+    energy = smooth(motion_energy(thumbnails), max(1, int(round(smoothing_seconds / interval))))
+    low, high = np.percentile(energy, [10, 90])
+    if high - low <= MIN_MOTION_RANGE:
+        return analysis
+    state = hysteresis(energy, low + STROKE_THRESHOLDS[0] * (high - low), low + STROKE_THRESHOLDS[1] * (high - low))
+    edges = np.diff(np.concatenate(([0], (state > 0).astype(np.int8), [0])))
+    core_starts, core_ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+
+    # Widen each stroke to where the change bottoms out in the gaps on either
+    # side, so tempo covers the slow start and end of a movement but not pauses:
+    # a stroke starts at the last near-minimum sample of the gap before it and
+    # ends at the first near-minimum sample of the gap after it
+    index = np.arange(energy.size)
+    in_gap = state < 0
+    gap = np.searchsorted(core_starts, index, side='right')  # gap k lies before stroke k
+    floor = np.full(len(core_starts) + 1, np.inf)
+    np.minimum.at(floor, gap[in_gap], energy[in_gap])
+    near = in_gap & (energy <= floor[gap] + PAUSE_TOLERANCE * (high - low))
+    last_near = np.maximum.accumulate(np.where(near, index, -1))
+    next_near = np.minimum.accumulate(np.where(near, index, energy.size)[::-1])[::-1]
+    before = last_near[np.maximum(core_starts - 1, 0)]
+    starts = np.where((core_starts > 0) & (before >= 0), before, core_starts)
+    after = next_near[np.minimum(core_ends + 1, energy.size - 1)]
+    ends = np.where((core_ends + 1 < energy.size) & (after < energy.size), after, core_ends)
+
+    gaps = core_starts[1:] - core_ends[:-1]
+    offset = 1 if len(gaps) >= 2 and gaps[1::2].mean() < gaps[0::2].mean() else 0
+    away = np.arange(offset, len(starts) - 1, 2)
+    if away.size == 0:
+        return analysis
+    back = away + 1
+    first = timestamps[ends[away]] - timestamps[starts[away]]
+    second = timestamps[ends[back]] - timestamps[starts[back]]
+    eccentric, concentric = (second, first) if concentric_first else (first, second)
+    # Total change over the away stroke, the nearest thing to a range of motion here
+    change = np.add.reduceat(energy * interval, np.stack([starts[away], ends[away] + 1], axis=1).ravel())[::2]
+
+    analysis.reps = [
+        Rep(float(a), float(b), float(c), float(e), float(f), float(r))
+        for a, b, c, e, f, r in zip(
+            timestamps[starts[away]], timestamps[ends[away]], timestamps[ends[back]], eccentric, concentric, change
+        )
+    ]
+    analysis.confident = tempo_regular(analysis.reps)
+    return analysis
+
+
+def tempo_regular(reps):
+    """
+    Whether reps were found and their durations are even enough to trust
+    the count; setup, racking or a partial track show up as irregular reps.
+    """
+    if not reps:
+        return False
+    durations = np.array([rep.end - rep.start for rep in reps])
+    return bool(durations.std() <= MAX_TEMPO_SPREAD * durations.mean())
+
+
+def reps_from_pose(pose, concentric_first=False, min_rom=15.0):
+    """
+    Analyze reps on the pose angle with the largest range, or return None
+    when the track was cut short or no angle was tracked in enough frames.
+    The result is not confident without reps, with irregular rep durations,
+    or when the track was sampled below MIN_POSE_SAMPLE_FPS.
+    """
+    if pose.get('truncated'):
+        return None
+    best = None
+    timestamps = np.asarray(pose.get('timestamps') or [], dtype=np.float64)
+    for name, values in pose.get('angles', {}).items():
+        values = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        visible = ~np.isnan(values)
+        if values.size < 4 or visible.mean() < MIN_ANGLE_COVERAGE:
+            continue
+        values = np.interp(timestamps, timestamps[visible], values[visible])
+        spread = np.ptp(values)
+        if best is None or spread > best[0]:
+            best = (spread, name, values)
+    if best is None:
+        return None
+    analysis = analyze_reps(timestamps, best[2], best[1], 'degrees', concentric_first, min_range=min_rom)
+    # Tracks stored before the sample rate was recorded ran at POSE_SAMPLE_FPS
+    sample_fps = pose.get('sample_fps') or MIN_POSE_SAMPLE_FPS
+    analysis.confident = tempo_regular(analysis.reps) and sample_fps >= MIN_POSE_SAMPLE_FPS
+    return analysis
+
+
+def rep_metrics(exercise, timestamps, thumbnails, pose=None):
+    """
+    Rep count, tempo and ROM as a dict, preferring pose angles over the
+    frame signal unless only the frame signal gives a confident count.
+    Returns None when there are too few frames.
+    """
+    concentric_first = any(word in (exercise or '').lower() for word in CONCENTRIC_FIRST)
+    analysis: Optional[RepAnalysis] = reps_from_pose(pose, concentric_first) if pose else None
+    if (analysis is None or not analysis.confident) and len(timestamps) >= 4:
+        motion = reps_from_motion(timestamps, thumbnails, concentric_first)
+        if analysis is None or motion.confident:
+            analysis = motion
+    if analysis is None:
+        return None
+    return analysis.to_dict()
+
+
+def reps_confident(metrics):
+    """
+    Whether rep metrics are reliable enough to show and to give the coach.
+    Rows stored before the flag existed count when they found reps.
+    """
+    return bool(metrics) and metrics.get('confident', bool(metrics.get('count')))
+
+
+def describe_reps(metrics):
+    """
+    Plain-text lines for the analysis prompt.
+    """
+    if not metrics or not metrics['count']:
+        return '- No complete reps were detected'
+    lines = [
+        f"- Reps completed: {metrics['count']}",
+        f"- Average tempo: {metrics['mean_eccentric']:.1f}s eccentric, {metrics['mean_concentric']:.1f}s concentric"
+    ]
+    if metrics['signal'] == 'motion':
+        lines.append("- Estimated from overall frame motion, so treat the tempo as approximate")
+    if metrics['units'] == 'degrees':
+        lines.append(f"- Average range of motion: {metrics['mean_rom']:.0f} degrees of {metrics['signal'].replace('_', ' ')} angle")
+    per_rep = ', '.join(f"{rep['eccentric']:.1f}/{rep['concentric']:.1f}s" for rep in metrics['reps'])
+    lines.append(f"- Per-rep eccentric/concentric: {per_rep}")
+    return '\n'.join(lines)
@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+# Columns copied to and from export files, in CSV column order
+EXPORT_COLUMNS = (
+    'id', 'created_at', 'exercise', 'file_type', 'video_filename', 'video_hash',
+    'character_id', 'character_name', 'status', 'notes', 'analysis', 'feedback'
+)
+
+# JSON columns; CSV carries them as JSON text, JSONL as nested objects
+METRIC_COLUMNS = ('rep_metrics', 'pose_metrics')
+
+# Flat per-session metrics added to CSV rows for spreadsheet use
+CSV_SUMMARY_COLUMNS = ('rep_count', 'mean_eccentric', 'mean_concentric', 'mean_rom')
+
+CSV_COLUMNS = EXPORT_COLUMNS + CSV_SUMMARY_COLUMNS + METRIC_COLUMNS
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+class SessionImportError(ValueError):
+    """
+    Raised for a malformed record in an import file.
+    """
+
+
+def session_record(workout):
+    """
+    Export dict for one WorkoutSession (or row with the same attributes).
+    """
+    record = {column: getattr(workout, column) for column in EXPORT_COLUMNS + METRIC_COLUMNS}
+    record['created_at'] = workout.created_at.isoformat() if workout.created_at else None
+    return record
+
+
+def jsonl_lines(sessions):
+    """
+    One JSON document per line; yields as it goes so memory stays flat.
+    """
+    for workout in sessions:
+        yield json.dumps(session_record(workout), ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def csv_lines(sessions):
+    """
+    CSV with a header row, yielded one line at a time.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for workout in sessions:
+        record = session_record(workout)
+        reps = record['rep_metrics'] or {}
+        row = [record[column] for column in EXPORT_COLUMNS]
+        row += [reps.get('count'), reps.get('mean_eccentric'), reps.get('mean_concentric'), reps.get('mean_rom')]
+        row += [json.dumps(record[column], separators=(',', ':')) if record[column] is not None else '' for column in METRIC_COLUMNS]
+        writer.writerow(row)
+        yield flush()
+
+
+def export_lines(sessions, export_format):
+    if export_format == 'csv':
+        return csv_lines(sessions)
+    return jsonl_lines(sessions)
+
+
+def read_records(stream, import_format):
+    """
+    Yield import dicts from a binary stream of JSONL or CSV, one line at a
+    time. Raises SessionImportError with the line number on malformed input.
+    """
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if import_format == 'csv':
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            yield _parse_record(record, reader.line_num, from_csv=True)
+        return
+    for line_number, line in enumerate(text_stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise SessionImportError(f"Line {line_number}: invalid JSON ({e})")
+        if not isinstance(record, dict):
+            raise SessionImportError(f"Line {line_number}: expected an object")
+        yield _parse_record(record, line_number)
+
+
+def _parse_record(record, line_number, from_csv=False):
+    """
+    Keep the known columns, with CSV blanks as None and JSON text decoded.
+    """
+    parsed = {}
+    for column in EXPORT_COLUMNS + METRIC_COLUMNS:
+        value = record.get(column)
+        if from_csv and value == '':
+            value = None
+        if value is not None and column in METRIC_COLUMNS and isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise SessionImportError(f"Line {line_number}: {column} is not valid JSON")
+        parsed[column] = value
+    try:
+        parsed['created_at'] = datetime.fromisoformat(parsed['created_at']) if parsed['created_at'] else None
+    except (TypeError, ValueError):
+        raise SessionImportError(f"Line {line_number}: created_at must be an ISO 8601 timestamp")
+    return parsed
+
+
+def parse_date_range(since, until):
+    """
+    Parse optional ISO dates or timestamps from query parameters. A bare
+    date for the end of the range includes that whole day. Returns
+    (start, end) where end is exclusive; raises ValueError on bad input.
+    """
+    start = datetime.fromisoformat(since) if since else None
+    end = None
+    if until:
+        end = datetime.fromisoformat(until)
+        if len(until) == 10:
+            end += timedelta(days=1)
+    return start, end
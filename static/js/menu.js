@@ -0,0 +1,18 @@
+// Header menu: the dumbbell button opens the dropdown and any other click closes it
+(function() {
+    var button = document.querySelector('.menu-button');
+    if (button) {
+        button.addEventListener('click', function(event) {
+            event.stopPropagation();
+            document.getElementById('menuDropdown').classList.toggle('show');
+        });
+    }
+    window.addEventListener('click', function(event) {
+        if (!event.target.closest('.menu-button') && !event.target.closest('.menu-dropdown')) {
+            var dropdowns = document.getElementsByClassName('menu-dropdown');
+            for (var i = 0; i < dropdowns.length; i++) {
+                dropdowns[i].classList.remove('show');
+            }
+        }
+    });
+})();
@@ -0,0 +1,43 @@
+// Dark mode toggle; the saved choice is applied before first paint by base.html
+
+function toggleDarkMode() {
+    const html = document.documentElement;
+    const body = document.body;
+    const themeText = document.getElementById('themeText');
+    
+    body.classList.add('transitioning');
+    html.classList.add('transitioning');
+    
+    void body.offsetWidth;
+    
+    const isDarkMode = !html.classList.contains('dark-mode');
+    
+    if (isDarkMode) {
+        html.classList.add('dark-mode');
+        body.classList.add('dark-mode');
+        localStorage.setItem('darkMode', 'true');
+        if (themeText) themeText.textContent = 'Switch to Light Mode';
+    } else {
+        html.classList.remove('dark-mode');
+        body.classList.remove('dark-mode');
+        localStorage.setItem('darkMode', 'false');
+        if (themeText) themeText.textContent = 'Switch to Dark Mode';
+    }
+    
+    setTimeout(() => {
+        body.classList.remove('transitioning');
+        html.classList.remove('transitioning');
+    }, 300);
+}
+
+// Apply theme state to both html and body on load
+window.addEventListener('DOMContentLoaded', function() {
+    const isDarkMode = localStorage.getItem('darkMode') === 'true';
+    const themeText = document.getElementById('themeText');
+    
+    if (isDarkMode) {
+        document.documentElement.classList.add('dark-mode');
+        document.body.classList.add('dark-mode');
+        if (themeText) themeText.textContent = 'Switch to Light Mode';
+    }
+});
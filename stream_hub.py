@@ -0,0 +1,72 @@
+import threading
+
+
+class Channel:
+    """
+    Append-only event log for one session. Subscribers replay from the
+    start, so a page that connects mid-generation still gets the full text.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def publish(self, event, data):
+        with self._condition:
+            self.events.append((event, data))
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def subscribe(self, keepalive=15.0):
+        """
+        Yield (event, data) pairs as they are published until the channel
+        closes. Yields None after `keepalive` idle seconds so the caller can
+        send a keep-alive comment.
+        """
+        position = 0
+        while True:
+            with self._condition:
+                if position == len(self.events) and not self.closed:
+                    self._condition.wait(keepalive)
+                pending = self.events[position:]
+                closed = self.closed
+            position += len(pending)
+            if not pending and not closed:
+                yield None
+            for item in pending:
+                yield item
+            if closed and position == len(self.events):
+                return
+
+
+class StreamHub:
+    """
+    In-process registry of live generation channels keyed by session id.
+    """
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def open(self, key):
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None or channel.closed:
+                channel = self._channels[key] = Channel()
+            return channel
+
+    def get(self, key):
+        with self._lock:
+            return self._channels.get(key)
+
+    def close(self, key):
+        # Subscribers keep their own reference and drain the remaining events
+        with self._lock:
+            channel = self._channels.pop(key, None)
+        if channel is not None:
+            channel.close()
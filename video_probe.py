@@ -0,0 +1,114 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import cv2
+
+# Number of probe results kept in memory, keyed by file content hash
+PROBE_CACHE_SIZE = 256
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class VideoInfo:
+    content_hash: str
+    duration: float
+    width: int
+    height: int
+    fps: float
+    frame_count: int
+    codec: str
+    rotation: int
+
+    @property
+    def resolution(self):
+        return f'{self.width}x{self.height}'
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def file_sha256(path):
+    """
+    Hash a file's contents in fixed-size chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def probe_video(path, content_hash=None):
+    """
+    Read duration, resolution, fps, codec and rotation from a video with a
+    single cv2.VideoCapture open. Results are cached by content hash, so a
+    caller that already knows the hash never touches the file again.
+    """
+    if content_hash is None:
+        content_hash = file_sha256(path)
+
+    with _cache_lock:
+        info = _cache.get(content_hash)
+        if info is not None:
+            _cache.move_to_end(content_hash)
+            return info
+
+    info = _read_properties(path, content_hash)
+
+    with _cache_lock:
+        _cache[content_hash] = info
+        while len(_cache) > PROBE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return info
+
+
+def _seek_duration(capture, fps):
+    """
+    Duration from the timestamp of the last frame, for containers that do
+    not report a frame count or fps. 0.0 when the backend cannot seek there.
+    """
+    if not capture.set(cv2.CAP_PROP_POS_AVI_RATIO, 1):
+        return 0.0
+    last_frame = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+    if last_frame <= 0:
+        return 0.0
+    return last_frame + (1.0 / fps if fps > 0 else 0.0)
+
+
+def _read_properties(path, content_hash):
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise ValueError(f"Could not read video: {path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fourcc = int(capture.get(cv2.CAP_PROP_FOURCC))
+        orientation_prop = getattr(cv2, 'CAP_PROP_ORIENTATION_META', None)
+        rotation = int(capture.get(orientation_prop)) if orientation_prop is not None else 0
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if fps > 0 and frame_count > 0:
+            duration = frame_count / fps
+        else:
+            duration = _seek_duration(capture, fps)
+            if fps > 0:
+                frame_count = int(round(duration * fps))
+        # Upload limits are checked against the duration, so a clip of unknown length is unreadable
+        if duration <= 0:
+            raise ValueError(f"Could not determine the duration of video: {path}")
+        return VideoInfo(
+            content_hash=content_hash,
+            duration=duration,
+            width=width,
+            height=height,
+            fps=fps,
+            frame_count=max(frame_count, 0),
+            codec=''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00'),
+            rotation=rotation
+        )
+    finally:
+        capture.release()
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask_login import login_required, login_user, logout_user
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from extensions import db
+from models import User
+
+auth = Blueprint('auth', __name__)
+
+
+@auth.route('/register', methods=['GET', 'POST'])
+def register():
+    current_hour = datetime.now().hour
+    
+    if 0 <= current_hour < 11:
+        greeting = "Good morning"
+    elif 11 <= current_hour < 17:
+        greeting = "Good afternoon"
+    else:
+        greeting = "Good evening"
+        
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        if not username or not email or not password:
+            flash("Username, Email, and Password required", "error")
+            return redirect(url_for('auth.register'))
+
+        # Check if username already exists
+        existing_user = User.query.filter_by(username=username).first()
+        if existing_user:
+            flash("Username already exists", "error")
+            return redirect(url_for('auth.register'))
+
+        # Check if email already registered
+        existing_email = User.query.filter_by(email=email).first()
+        if existing_email:
+            flash("Email already registered", "error")
+            return redirect(url_for('auth.register'))
+
+        hashed_password = generate_password_hash(password)
+        new_user = User(username=username, email=email, password=hashed_password)
+        db.session.add(new_user)
+        db.session.commit()
+        flash("Registration successful, please login", "success")
+        return redirect(url_for('auth.login'))
+    return render_template('register.html', greeting=greeting)
+
+
+@auth.route('/login', methods=['GET', 'POST'])
+def login():
+    current_hour = datetime.now().hour
+    
+    if 0 <= current_hour < 11:
+        greeting = "Good morning"
+    elif 11 <= current_hour < 17:
+        greeting = "Good afternoon"
+    else:
+        greeting = "Good evening"
+        
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        user = User.query.filter_by(username=username).first()
+        if user and check_password_hash(user.password, password):
+            login_user(user)
+            next_page = request.form.get('next')
+            if not next_page or not next_page.startswith('/'):
+                next_page = url_for('pages.home')
+            return redirect(next_page)
+        else:
+            flash("Invalid username or password", "error")
+            return redirect(url_for('auth.login'))
+    return render_template('login.html', greeting=greeting)
+
+
+@auth.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for('auth.login'))
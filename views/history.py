@@ -0,0 +1,72 @@
+import io
+from datetime import datetime
+
+from flask import Blueprint, Response, jsonify, render_template, request, stream_with_context
+from flask_login import current_user, login_required
+
+from coaching import normalize_exercise_name
+from progress import CHART_WEEKS
+from session_export import FORMATS as EXPORT_FORMATS, SessionImportError, export_lines, parse_date_range, read_records
+from workouts import import_session_records, progress_summaries, session_export_rows
+
+history = Blueprint('history', __name__)
+
+
+@history.route('/api/sessions/export')
+@login_required
+def export_sessions():
+    """
+    Stream the current user's sessions as JSONL (default) or CSV, optionally
+    filtered with ?from=, ?to= (ISO dates, inclusive) and ?exercise=.
+    """
+    export_format = request.args.get('format', 'jsonl')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        start, end = parse_date_range(request.args.get('from'), request.args.get('to'))
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO 8601 dates'}), 400
+    rows = session_export_rows(current_user.id, start, end, request.args.get('exercise'))
+    filename = f"workout-sessions-{datetime.utcnow():%Y%m%d}.{export_format}"
+    return Response(
+        stream_with_context(export_lines(rows, export_format)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@history.route('/api/sessions/import', methods=['POST'])
+@login_required
+def import_sessions():
+    """
+    Bulk import sessions from a JSONL or CSV body (Content-Type text/csv or
+    ?format=csv for CSV), read and inserted incrementally.
+    """
+    import_format = 'csv' if request.mimetype == 'text/csv' or request.args.get('format') == 'csv' else 'jsonl'
+    records = read_records(io.BufferedReader(request.stream), import_format)
+    try:
+        imported = import_session_records(records, current_user.id)
+    except SessionImportError as e:
+        return jsonify({'error': str(e), 'imported': e.imported}), 400
+    return jsonify({'imported': imported}), 201
+
+
+@history.route('/progress')
+@login_required
+def progress_page():
+    return render_template('progress.html', exercises=progress_summaries(current_user.id), weeks=CHART_WEEKS)
+
+
+@history.route('/api/progress')
+@login_required
+def progress_api():
+    """
+    Per-exercise progress from the precomputed rollups; ?exercise= narrows
+    it to one exercise.
+    """
+    exercises = progress_summaries(current_user.id)
+    exercise = request.args.get('exercise')
+    if exercise:
+        exercise = normalize_exercise_name(exercise, [summary['exercise'] for summary in exercises])
+        exercises = [summary for summary in exercises if summary['exercise'] == exercise]
+    return jsonify({'weeks': CHART_WEEKS, 'exercises': exercises})
@@ -0,0 +1,192 @@
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from flask import Blueprint, current_app, jsonify, make_response, render_template, request, send_from_directory, session
+from flask_login import current_user, login_required
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+from characters import CHARACTERS
+from extensions import assets
+from guidelines import get_catalog
+
+pages = Blueprint('pages', __name__)
+
+# Rendered catalog fragments by (catalog digest, key); see catalog_fragment()
+_fragments = {}
+
+
+@pages.route('/', methods=['GET', 'POST'])
+def home():
+    current_hour = datetime.now().hour
+    
+    if 0 <= current_hour < 11:
+        greeting = "Good morning"
+    elif 11 <= current_hour < 17:
+        greeting = "Good afternoon"
+    else:
+        greeting = "Good evening"
+    
+    if current_user.is_authenticated:
+        greeting += f", {current_user.username}"
+        
+    return render_template('index.html', greeting=greeting)
+
+
+@pages.route('/api/exercises/suggest')
+def suggest_exercises():
+    from exercise_index import get_index  # numpy; loaded on the first search
+    query = request.args.get('q', '')[:100]
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 25)
+    results = get_index().search(query, limit)
+    response = jsonify({
+        'query': query,
+        'results': [{'id': exercise.id, 'name': exercise.name} for exercise in results]
+    })
+    # Same answer for every user until the catalog changes
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['EXERCISE_SUGGEST_MAX_AGE']
+    return response
+
+
+@pages.route('/exercise-library')
+def exercise_library():
+    catalog = get_catalog()
+    etag, last_modified = page_validators(catalog, 'exercise_library.html', 'guideline_list.html')
+    return conditional_response(etag, last_modified, lambda: render_template(
+        'exercise_library.html',
+        library=catalog_fragment(catalog, 'library', 'guideline_list.html', guidelines=catalog.guidelines) if catalog else None
+    ))
+
+
+@pages.route('/form-guidelines', methods=['GET', 'POST'])
+def form_guidelines():
+    """
+    The guideline picker, showing the guideline chosen with ?exercise= (or
+    the posted form field). The dropdown loads others from the JSON API.
+    """
+    catalog = get_catalog()
+    selected = catalog.get(request.values.get('exercise', ''))
+    etag, last_modified = page_validators(catalog, 'form_guidelines.html', 'guideline_options.html', 'guideline.html')
+    return conditional_response(etag, last_modified, lambda: render_template(
+        'form_guidelines.html',
+        options=catalog_fragment(catalog, 'options', 'guideline_options.html', guidelines=catalog.guidelines),
+        selected=selected,
+        guideline_html=guideline_fragment(catalog, selected) if selected else None
+    ))
+
+
+@pages.route('/api/form-guidelines')
+def guideline_list_api():
+    catalog = get_catalog()
+    etag, last_modified = catalog_validators(catalog, 'guideline.html')
+    return conditional_response(etag, last_modified, lambda: jsonify({
+        'guidelines': [{'id': guideline.id, 'name': guideline.name} for guideline in catalog]
+    }), public=True)
+
+
+@pages.route('/api/form-guidelines/<guideline_id>')
+def guideline_api(guideline_id):
+    catalog = get_catalog()
+    guideline = catalog.get(guideline_id)
+    if guideline is None:
+        return jsonify({'error': 'Unknown exercise'}), 404
+    etag, last_modified = catalog_validators(catalog, 'guideline.html')
+    return conditional_response(etag, last_modified, lambda: jsonify(
+        dict(guideline.to_dict(), html=guideline_fragment(catalog, guideline))
+    ), public=True)
+
+
+def guideline_fragment(catalog, guideline):
+    return catalog_fragment(catalog, ('guideline', guideline.id), 'guideline.html', guideline=guideline)
+
+
+def catalog_fragment(catalog, key, template, **context):
+    """
+    Render a template that depends only on the catalog once per catalog
+    version and reuse the markup. Entries are bounded by the catalog size.
+    """
+    cache_key = (catalog.etag, key)
+    html = _fragments.get(cache_key)
+    if html is None:
+        html = _fragments[cache_key] = Markup(render_template(template, **context))
+    return html
+
+
+def catalog_validators(catalog, *templates):
+    """
+    ETag and Last-Modified for a response built from the catalog and these
+    templates.
+    """
+    last_modified = max(catalog.last_modified, _templates_modified(templates))
+    return f'{catalog.etag}-{int(last_modified.timestamp())}', last_modified
+
+
+def page_validators(catalog, *templates):
+    """
+    catalog_validators() for a full page, which also depends on base.html,
+    the fingerprinted asset names it links and whether the user is logged
+    in (the header menu).
+    """
+    etag, last_modified = catalog_validators(catalog, 'base.html', *templates)
+    login = 'user' if current_user.is_authenticated else 'guest'
+    return f"{etag}-{assets.version or 'plain'}-{login}", last_modified
+
+
+def conditional_response(etag, last_modified, render, public=False):
+    """
+    A 304 when the client's copy is current, without calling render();
+    otherwise render()'s response. Public responses may be cached by shared
+    caches for CATALOG_MAX_AGE; pages are revalidated on every view.
+    """
+    if request.method in ('GET', 'HEAD') and not is_resource_modified(
+        request.environ, etag=etag, last_modified=last_modified
+    ):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    if public:
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['CATALOG_MAX_AGE']
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+    return response
+
+
+@lru_cache(maxsize=None)
+def _templates_modified(templates):
+    # Templates only change with a deploy, so their times are read once per process
+    folder = os.path.join(current_app.root_path, current_app.template_folder)
+    newest = max(os.path.getmtime(os.path.join(folder, name)) for name in templates)
+    return datetime.fromtimestamp(int(newest), timezone.utc)
+
+
+@pages.route('/favicon.ico')
+def favicon():
+    return send_from_directory(os.path.join(current_app.root_path, 'static'),
+                             'favicon.ico', mimetype='image/vnd.microsoft.icon')
+
+
+@pages.route('/characters')
+@login_required
+def characters():
+    current_character = session.get('character_id', 'trainer')
+    return render_template('characters.html', 
+                         characters=CHARACTERS.values(),
+                         current_character=current_character)
+
+
+@pages.route('/set-character', methods=['POST'])
+@login_required
+def set_character():
+    data = request.get_json()
+    character_id = data.get('character_id')
+    if character_id in CHARACTERS:
+        session['character_id'] = character_id
+        return jsonify({'success': True})
+    return jsonify({'success': False}), 400
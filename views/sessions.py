@@ -0,0 +1,205 @@
+import json
+import os
+import time
+
+from flask import Blueprint, Response, current_app, jsonify, render_template, request, stream_with_context, url_for
+from flask_login import current_user, login_required
+
+from characters import CHARACTERS
+from coaching import analysis_cache_snapshot
+from config import SSE_KEEPALIVE_SECONDS, SSE_MAX_SECONDS
+from extensions import db, fragment_cache, stream_hub
+from media import remove_derivatives
+from models import AnalysisCacheEntry, WorkoutSession
+from workouts import enqueue_panel, panel_characters, session_summaries, update_progress
+
+sessions = Blueprint('sessions', __name__)
+
+
+@sessions.route('/dashboard')
+@login_required
+def dashboard():
+    cursor = request.args.get('cursor')
+    sessions, next_cursor = session_summaries(current_user.id, cursor)
+    rows = [fragment_cache.render(session, 'summary', 'session_summary.html') for session in sessions]
+    return render_template('dashboard.html', sessions=sessions, rows=rows, next_cursor=next_cursor, is_first_page=not cursor)
+
+
+@sessions.route('/session/<int:session_id>/card')
+@login_required
+def session_card(session_id):
+    """
+    Render the expanded dashboard card body, loaded when a session is opened.
+    """
+    session_record = WorkoutSession.query.filter_by(id=session_id, user_id=current_user.id).first()
+    if not session_record:
+        return "Session not found or access denied", 404
+    return fragment_cache.render(session_record, 'card', 'session_card.html')
+
+
+@sessions.route('/session/<int:session_id>')
+@login_required
+def session_detail(session_id):
+    session_record = WorkoutSession.query.filter_by(id=session_id, user_id=current_user.id).first()
+    if not session_record:
+        return "Session not found or access denied", 404
+    return render_template('session_detail.html', session=session_record)
+
+
+@sessions.route('/session/<int:session_id>/panel', methods=['POST'])
+@login_required
+def session_panel(session_id):
+    """
+    Add feedback from more personas to a completed session, from its stored
+    analysis. Takes a JSON {"characters": [...]} list of character ids and
+    defaults to every persona. The feedback is generated by a background
+    job: the reply is 202 with the /status and /stream URLs to follow it, or
+    the current panel when every persona asked for already has feedback.
+    """
+    session_record = WorkoutSession.query.filter_by(id=session_id, user_id=current_user.id).first()
+    if not session_record:
+        return jsonify({'error': 'Session not found'}), 404
+    if session_record.status != 'complete' or not session_record.analysis:
+        return jsonify({'error': 'The analysis is not complete yet'}), 409
+    
+    character_ids = (request.get_json(silent=True) or {}).get('characters') or list(CHARACTERS)
+    if not isinstance(character_ids, list):
+        return jsonify({'error': 'characters must be a list of character ids'}), 400
+    characters = [character.id for character in panel_characters(session_record, character_ids)]
+    if not characters:
+        return jsonify({
+            'generated': [],
+            'panel': {row.character_id: row.feedback for row in session_record.panel}
+        })
+    enqueue_panel(session_id, characters)
+    return jsonify({
+        'status': 'pending',
+        'characters': characters,
+        'status_url': url_for('sessions.session_status', session_id=session_id),
+        'stream_url': url_for('sessions.session_stream', session_id=session_id)
+    }), 202
+
+
+@sessions.route('/session/<int:session_id>/stream')
+@login_required
+def session_stream(session_id):
+    """
+    Server-Sent Events for a session: 'status' progress updates, 'token'
+    deltas of the analysis and feedback text as they are generated, 'reset'
+    when a retry starts over, and 'done' once the result is saved. While a
+    persona panel job is pending the stream stays open until it finishes.
+    """
+    session_record = WorkoutSession.query.filter_by(id=session_id, user_id=current_user.id).first()
+    if not session_record:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    def generate():
+        if session_record.is_complete and session_record.panel_status != 'pending':
+            yield sse('done', {})
+            return
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        last_status = None
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            channel = stream_hub.get(session_id)
+            if channel is not None:
+                for item in channel.subscribe(keepalive=SSE_KEEPALIVE_SECONDS):
+                    yield ': keep-alive\n\n' if item is None else sse(*item)
+                yield sse('done', {})
+                return
+            
+            # Not generating in this process (queued, or running in another worker): poll the row
+            db.session.expire_all()
+            row = db.session.query(
+                WorkoutSession.status, WorkoutSession.progress, WorkoutSession.status_message, WorkoutSession.panel_status
+            ).filter_by(id=session_id).first()
+            if row is None or (row.status in ('complete', 'failed') and row.panel_status != 'pending'):
+                yield sse('done', {})
+                return
+            status = {'status': row.status, 'progress': row.progress, 'message': row.status_message}
+            if status != last_status:
+                yield sse('status', status)
+                last_status, last_sent = status, time.monotonic()
+            elif time.monotonic() - last_sent > SSE_KEEPALIVE_SECONDS:
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+            time.sleep(1)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@sessions.route('/cache-stats')
+@login_required
+def cache_stats():
+    stats = analysis_cache_snapshot()
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    stats['entries'] = AnalysisCacheEntry.query.count()
+    stats['stored_hits'] = db.session.query(db.func.coalesce(db.func.sum(AnalysisCacheEntry.hits), 0)).scalar()
+    stats['fragments'] = fragment_cache.stats()
+    return jsonify(stats)
+
+
+@sessions.route('/session/<int:session_id>/status')
+@login_required
+def session_status(session_id):
+    session_record = WorkoutSession.query.filter_by(id=session_id, user_id=current_user.id).first()
+    if not session_record:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify({
+        'id': session_record.id,
+        'status': session_record.status,
+        'progress': session_record.progress,
+        'message': session_record.status_message,
+        'complete': session_record.is_complete,
+        'panel_status': session_record.panel_status
+    })
+
+
+@sessions.route('/previous-analyses')
+@login_required
+def previous_analyses():
+    cursor = request.args.get('cursor')
+    sessions, next_cursor = session_summaries(current_user.id, cursor)
+    return render_template('previous_analyses.html', analyses=sessions, next_cursor=next_cursor, is_first_page=not cursor)
+
+
+@sessions.route('/delete-session/<int:session_id>', methods=['DELETE'])
+@login_required
+def delete_session(session_id):
+    session = WorkoutSession.query.filter_by(id=session_id, user_id=current_user.id).first()
+    if session:
+        # Delete the video file unless another session still plays it (uploads
+        # from before per-user names could share one)
+        in_use = session.video_filename and db.session.query(WorkoutSession.id).filter(
+            WorkoutSession.video_filename == session.video_filename,
+            WorkoutSession.id != session.id
+        ).first() is not None
+        if session.video_filename and not in_use:
+            video_path = os.path.join(current_app.config['UPLOAD_FOLDER'], session.video_filename)
+            if os.path.exists(video_path):
+                os.remove(video_path)
+        
+        # Derivatives are named by content hash, so keep them while another session uses the same video
+        shared = session.video_hash and WorkoutSession.query.filter(
+            WorkoutSession.video_hash == session.video_hash,
+            WorkoutSession.id != session.id
+        ).first() is not None
+        if session.media and not shared:
+            remove_derivatives(session.media, current_app.config['UPLOAD_FOLDER'])
+        
+        # Take the session out of its progress rollup in the same transaction as the delete
+        if session.progress_contribution:
+            update_progress(session.user_id, session.progress_contribution, -1)
+        db.session.delete(session)
+        db.session.commit()
+        fragment_cache.invalidate(session_id)
+        return jsonify({'success': True})
+    return jsonify({'success': False}), 404
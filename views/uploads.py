@@ -0,0 +1,297 @@
+import mimetypes
+import os
+
+from flask import Blueprint, Response, abort, current_app, flash, jsonify, redirect, request, send_file, session, url_for
+from flask_login import current_user, login_required
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+from coaching import analyze_workout_image, analyze_workout_video, normalize_exercise_name
+from config import MAX_VIDEO_DURATION, UPLOAD_CHUNK_SIZE
+from chunked_upload import UploadError
+from extensions import chunked_uploads, db
+from instrumentation import instrumentation
+from media import DERIVED_DIR, NAME_HASH_LENGTH
+from models import WorkoutSession
+from workouts import allowed_file, enqueue_media, start_workout_session, sync_session_progress, upload_path, user_exercise_names
+
+uploads = Blueprint('uploads', __name__)
+
+
+@uploads.route('/upload', methods=['POST'])
+@login_required
+def upload():
+    if 'file' not in request.files:
+        flash('No file uploaded')
+        return redirect(url_for('pages.home'))
+    
+    file = request.files['file']
+    exercise_type = request.form.get('exercise_type', '')
+    notes = request.form.get('notes', '')
+    
+    if file.filename == '':
+        flash('No file selected')
+        return redirect(url_for('pages.home'))
+    
+    if file and allowed_file(file.filename):
+        filename, filepath = upload_path(current_user.id, secure_filename(file.filename))
+        with instrumentation.span('upload.save'):
+            file.save(filepath)
+        
+        try:
+            with instrumentation.span('upload.probe'):
+                from video_probe import probe_video
+                video_info = probe_video(filepath)
+        except ValueError:
+            os.remove(filepath)
+            flash('Could not read video file')
+            return redirect(url_for('pages.home'))
+        
+        if video_info.duration > MAX_VIDEO_DURATION:
+            os.remove(filepath)
+            flash(f'Video must be {MAX_VIDEO_DURATION} seconds or shorter')
+            return redirect(url_for('pages.home'))
+        
+        with instrumentation.span('upload.start_session'):
+            workout_session = start_workout_session(filename, video_info, exercise_type, notes)
+        return redirect(url_for('sessions.session_detail', session_id=workout_session.id))
+    
+    flash('Invalid file type')
+    return redirect(url_for('pages.home'))
+
+
+@uploads.route('/api/uploads', methods=['POST'])
+@login_required
+def create_chunked_upload():
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename', ''))
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+    try:
+        meta = chunked_uploads.create(
+            current_user.id,
+            filename,
+            int(data.get('size', 0)),
+            exercise_type=data.get('exercise_type', ''),
+            notes=data.get('notes', '')
+        )
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid file size'}), 400
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({
+        'upload_id': meta['upload_id'],
+        'offset': meta['offset'],
+        'chunk_size': UPLOAD_CHUNK_SIZE
+    }), 201
+
+
+@uploads.route('/api/uploads/<upload_id>', methods=['GET'])
+@login_required
+def chunked_upload_status(upload_id):
+    try:
+        meta = chunked_uploads.get(upload_id, current_user.id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({'upload_id': upload_id, 'offset': meta['offset'], 'size': meta['size']})
+
+
+@uploads.route('/api/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def append_chunked_upload(upload_id):
+    """
+    Append the raw request body at the Upload-Offset header. A 409 response
+    carries the server's offset so the client can resume from there.
+    """
+    try:
+        meta = chunked_uploads.get(upload_id, current_user.id)
+        offset = int(request.headers.get('Upload-Offset', -1))
+        meta = chunked_uploads.append(meta, offset, request.stream)
+    except ValueError:
+        return jsonify({'error': 'Missing Upload-Offset header'}), 400
+    except UploadError as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), e.status
+    return jsonify({'upload_id': upload_id, 'offset': meta['offset'], 'size': meta['size']})
+
+
+@uploads.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_chunked_upload(upload_id):
+    try:
+        meta = chunked_uploads.get(upload_id, current_user.id)
+        filename, filepath = upload_path(current_user.id, meta['filename'])
+        with instrumentation.span('upload.finalize'):
+            content_hash = chunked_uploads.finish(meta, filepath)
+    except UploadError as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), e.status
+    
+    # The hash was computed while streaming, so the probe does not reread the file
+    try:
+        with instrumentation.span('upload.probe'):
+            from video_probe import probe_video
+            video_info = probe_video(filepath, content_hash=content_hash)
+    except ValueError:
+        os.remove(filepath)
+        return jsonify({'error': 'Could not read video file'}), 422
+    if video_info.duration > MAX_VIDEO_DURATION:
+        os.remove(filepath)
+        return jsonify({'error': f'Video must be {MAX_VIDEO_DURATION} seconds or shorter'}), 422
+    
+    with instrumentation.span('upload.start_session'):
+        workout_session = start_workout_session(filename, video_info, meta['exercise_type'], meta['notes'])
+    return jsonify({
+        'session_id': workout_session.id,
+        'status': workout_session.status,
+        'url': url_for('sessions.session_detail', session_id=workout_session.id)
+    }), 201
+
+
+@uploads.route('/upload_video', methods=['POST'])
+def upload_video():
+    if 'video' not in request.files:
+        flash('No video file uploaded')
+        return redirect(request.url)
+    
+    video = request.files['video']
+    
+    if video.filename == '':
+        flash('No video selected')
+        return redirect(request.url)
+    
+    if video and allowed_file(video.filename):
+        # Create a temporary file to check video duration
+        temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'temp_' + secure_filename(video.filename))
+        video.save(temp_path)
+        
+        try:
+            from video_probe import probe_video
+            video_info = probe_video(temp_path)
+            
+            if video_info.duration > MAX_VIDEO_DURATION:
+                os.remove(temp_path)
+                flash(f'Video must be {MAX_VIDEO_DURATION} seconds or shorter')
+                return redirect(request.url)
+                
+            # If duration is okay, proceed with your existing upload logic
+            filename, filepath = upload_path(current_user.id, secure_filename(video.filename))
+            os.rename(temp_path, filepath)
+            
+            # Determine file type
+            extension = video.filename.rsplit('.', 1)[1].lower()
+            file_type = 'video' if extension in {'mp4', 'mov', 'avi', 'mkv'} else 'image'
+            
+            # Create workout session
+            workout = WorkoutSession(
+                user_id=current_user.id,
+                video_filename=filename,
+                file_type=file_type,
+                notes=request.form.get('notes', ''),
+                character_id=session.get('character_id', 'trainer'),
+                character_name=session.get('character_name', 'Personal Trainer'),
+                video_hash=video_info.content_hash
+            )
+            
+            # Generate analysis based on file type
+            if file_type == 'video':
+                analysis = analyze_workout_video(filepath, request.form.get('notes', ''), video_info)
+            else:
+                analysis = analyze_workout_image(filepath, request.form.get('notes', ''))
+            
+            workout.exercise = normalize_exercise_name(
+                analysis.get('exercise') or 'Unknown Exercise', user_exercise_names(current_user.id)
+            )
+            workout.set_analysis(analysis.get('analysis', ''))
+            workout.feedback = analysis.get('feedback', '')
+            workout.pose_metrics = analysis.get('pose_metrics')
+            workout.rep_metrics = analysis.get('rep_metrics')
+            
+            db.session.add(workout)
+            db.session.flush()
+            sync_session_progress(workout)
+            db.session.commit()
+            if file_type == 'video':
+                enqueue_media(workout.id)
+            
+            return redirect(url_for('sessions.session_detail', session_id=workout.id))
+            
+        except Exception as e:
+            os.remove(temp_path)
+            flash('Error processing video')
+            return redirect(request.url)
+            
+    return redirect(url_for('sessions.dashboard'))
+
+
+@uploads.route('/uploads/<path:filename>')
+@login_required
+def uploaded_file(filename):
+    """
+    Serve an upload or one of its derivatives to the session's owner, with
+    range support, a strong ETag from the content hash and long-lived
+    caching for names that never change content (derivatives and per-user
+    stored uploads).
+    """
+    path = safe_join(os.path.abspath(current_app.config['UPLOAD_FOLDER']), filename)
+    media = media_access(filename)
+    if path is None or media is None or not os.path.isfile(path):
+        abort(404)
+    etag, immutable = media
+    
+    if current_app.config['MEDIA_OFFLOAD'] == 'x-accel':
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = current_app.config['MEDIA_ACCEL_PREFIX'].rstrip('/') + '/' + filename
+    else:
+        # send_file answers Range and If-None-Match itself; full responses go
+        # through the server's file wrapper (sendfile under gunicorn)
+        response = send_file(path, etag=etag or True, conditional=True)
+        # Werkzeug only sends this on 206s; Safari wants it before it will seek
+        response.headers['Accept-Ranges'] = 'bytes'
+    
+    if etag:
+        response.set_etag(etag)
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = current_app.config['MEDIA_IMMUTABLE_MAX_AGE']
+        response.cache_control.immutable = True
+    else:
+        # Uploads from before per-user names may be overwritten, so revalidate (cheap 304s)
+        response.cache_control.no_cache = True
+    response.cache_control.private = True
+    if current_app.config['MEDIA_OFFLOAD'] == 'x-accel':
+        response.make_conditional(request)
+    return response
+
+
+def media_access(filename):
+    """
+    Return (etag, immutable) if the current user owns the file, else None.
+    Only indexed columns are read; no WorkoutSession rows are loaded.
+    """
+    if filename.startswith(DERIVED_DIR + '/'):
+        # Derivative names start with a prefix of the source hash: a range scan on the hash index
+        prefix = os.path.basename(filename)[:NAME_HASH_LENGTH]
+        owned = db.session.query(WorkoutSession.id).filter(
+            WorkoutSession.video_hash >= prefix,
+            WorkoutSession.video_hash < prefix + 'g',
+            WorkoutSession.user_id == current_user.id
+        ).first()
+        return (os.path.splitext(os.path.basename(filename))[0], True) if owned else None
+    
+    if '/' in filename:
+        # Per-user stored names (see upload_path) are never reused, so the
+        # owning session's hash describes the file for good
+        owned = db.session.query(WorkoutSession.video_hash).filter(
+            WorkoutSession.video_filename == filename,
+            WorkoutSession.user_id == current_user.id
+        ).first()
+        return (owned[0], True) if owned else None
+    
+    # Older uploads kept their original name: the latest one under it is on disk
+    latest_hash = db.session.query(WorkoutSession.video_hash).filter(
+        WorkoutSession.video_filename == filename
+    ).order_by(WorkoutSession.id.desc()).limit(1).scalar_subquery()
+    owned = db.session.query(WorkoutSession.id, latest_hash).filter(
+        WorkoutSession.video_filename == filename,
+        WorkoutSession.user_id == current_user.id
+    ).first()
+    return (owned[1], False) if owned else None
@@ -0,0 +1,546 @@
+"""
+Workout session lifecycle: creating sessions for uploads, the background
+analysis and media jobs, progress rollup upkeep and bulk import/export.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app, session
+from flask_login import current_user
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
+
+from analysis_parser import parse_analysis
+from characters import CHARACTERS
+from coaching import lookup_cached_analysis, normalize_exercise_name, prompt_versions, request_panel_feedback, run_analysis
+from config import ALLOWED_EXTENSIONS, EXPORT_BATCH_SIZE, IMPORT_BATCH_SIZE, SESSIONS_PER_PAGE
+from extensions import db, fragment_cache, job_queue, stream_hub
+from instrumentation import instrumentation
+from media import MediaSettings, generate_derivatives
+from models import ExerciseProgress, PersonaFeedback, WorkoutSession
+from progress import apply_contribution, session_contribution, summarize_progress
+from session_export import EXPORT_COLUMNS, METRIC_COLUMNS, SessionImportError
+
+
+def allowed_file(filename):
+    """
+    Check if the uploaded file has one of the allowed extensions.
+    """
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def upload_path(user_id, filename):
+    """
+    Where to store an allowed upload: (name relative to UPLOAD_FOLDER, path).
+    Each upload gets a random name in its owner's folder, so uploads with
+    the same original name never overwrite each other and a stored name
+    always refers to the same bytes.
+    """
+    name = f"{user_id}/{uuid.uuid4().hex}.{filename.rsplit('.', 1)[1].lower()}"
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], *name.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return name, path
+
+# Columns needed to list sessions; analysis and feedback text load with the card
+SESSION_SUMMARY_COLUMNS = (
+    WorkoutSession.id,
+    WorkoutSession.exercise,
+    WorkoutSession.created_at,
+    WorkoutSession.character_id,
+    WorkoutSession.character_name,
+    WorkoutSession.status,
+    WorkoutSession.status_message,
+    WorkoutSession.media,
+    WorkoutSession.updated_at
+)
+
+
+def session_summaries(user_id, cursor=None, limit=SESSIONS_PER_PAGE):
+    """
+    Return one page of a user's sessions, newest first, and the cursor for
+    the next page (None on the last page). Uses keyset pagination on
+    (created_at, id) so every page is an index range scan.
+    """
+    query = WorkoutSession.query.options(load_only(*SESSION_SUMMARY_COLUMNS)).filter(WorkoutSession.user_id == user_id)
+    if cursor:
+        try:
+            created_at, session_id = cursor.rsplit('_', 1)
+            created_at, session_id = datetime.fromisoformat(created_at), int(session_id)
+        except ValueError:
+            created_at = None
+        if created_at is not None:
+            query = query.filter(or_(
+                WorkoutSession.created_at < created_at,
+                and_(WorkoutSession.created_at == created_at, WorkoutSession.id < session_id)
+            ))
+    sessions = query.order_by(WorkoutSession.created_at.desc(), WorkoutSession.id.desc()).limit(limit + 1).all()
+    next_cursor = sessions[limit - 1].cursor if len(sessions) > limit else None
+    return sessions[:limit], next_cursor
+
+
+def start_workout_session(filename, video_info, exercise_type, notes):
+    """
+    Create the WorkoutSession for a saved upload. Cached results complete it
+    immediately; otherwise the analysis is queued to run in the background.
+    """
+    character_id = session.get('character_id', 'trainer')
+    exercise = normalize_exercise_name(exercise_type, user_exercise_names(current_user.id))
+    cached = lookup_cached_analysis(video_info.content_hash, exercise, notes, character_id)
+    workout_session = WorkoutSession(
+        user_id=current_user.id,
+        file_type='video',
+        video_filename=filename,
+        video_hash=video_info.content_hash,
+        exercise=exercise,
+        notes=notes,
+        character_id=character_id,
+        character_name=CHARACTERS.get(character_id, CHARACTERS['trainer']).name,
+        status='pending',
+        progress=0,
+        status_message='Waiting for an available coach'
+    )
+    if cached:
+        workout_session.set_analysis(cached['analysis'])
+        workout_session.feedback = cached['feedback']
+        workout_session.pose_metrics = cached['pose_metrics']
+        workout_session.rep_metrics = cached['rep_metrics']
+        workout_session.status = 'complete'
+        workout_session.progress = 100
+        workout_session.status_message = None
+    
+    db.session.add(workout_session)
+    db.session.flush()
+    sync_session_progress(workout_session)
+    db.session.commit()
+    
+    if not cached:
+        enqueue_analysis(workout_session.id)
+    enqueue_media(workout_session.id)
+    return workout_session
+
+
+def user_exercise_names(user_id):
+    """
+    The exercise names on a user's sessions, which new input for the same
+    exercise keeps using (see normalize_exercise_name).
+    """
+    rows = db.session.query(WorkoutSession.exercise).filter(
+        WorkoutSession.user_id == user_id, WorkoutSession.exercise.isnot(None)
+    ).distinct()
+    return [exercise for (exercise,) in rows]
+
+
+def session_export_rows(user_id, start=None, end=None, exercise=None):
+    """
+    A user's sessions in (created_at, id) order, filtered in SQL so the
+    filters are index range scans. Rows are fetched EXPORT_BATCH_SIZE at a
+    time with a server-side cursor where the driver supports one.
+    """
+    query = db.session.query(*(getattr(WorkoutSession, column) for column in EXPORT_COLUMNS + METRIC_COLUMNS))
+    query = query.filter(WorkoutSession.user_id == user_id)
+    if exercise:
+        query = query.filter(WorkoutSession.exercise == normalize_exercise_name(exercise, user_exercise_names(user_id)))
+    if start:
+        query = query.filter(WorkoutSession.created_at >= start)
+    if end:
+        query = query.filter(WorkoutSession.created_at < end)
+    return query.order_by(WorkoutSession.created_at, WorkoutSession.id).yield_per(EXPORT_BATCH_SIZE)
+
+
+def import_session_records(records, user_id, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Insert exported session records for a user, committing every batch_size
+    rows. Ids are reassigned, and the video file name and hash are dropped
+    because they point at files this account does not own. Returns the
+    number imported; on a malformed record the error carries the count of
+    rows already committed as error.imported.
+    """
+    imported = 0
+    batch = []
+    existing_names = user_exercise_names(user_id)
+    try:
+        for record in records:
+            status = 'failed' if record['status'] == 'failed' else 'complete'
+            character_id = record['character_id'] if record['character_id'] in CHARACTERS else 'trainer'
+            exercise = normalize_exercise_name(record['exercise'] or '', existing_names) or None
+            analysis_sections = parse_analysis(record['analysis']) if record['analysis'] else None
+            created_at = record['created_at'] or datetime.utcnow()
+            batch.append({
+                'user_id': user_id,
+                'file_type': record['file_type'] or 'video',
+                'video_filename': '',
+                'exercise': exercise,
+                'analysis': record['analysis'],
+                'analysis_sections': analysis_sections,
+                'feedback': record['feedback'],
+                'notes': record['notes'],
+                'created_at': created_at,
+                'character_id': character_id,
+                'character_name': record['character_name'] or CHARACTERS[character_id].name,
+                'status': status,
+                'progress': 100,
+                'pose_metrics': record['pose_metrics'],
+                'rep_metrics': record['rep_metrics'],
+                'progress_contribution': session_contribution(
+                    exercise, created_at, status, analysis_sections, record['rep_metrics']
+                )
+            })
+            if len(batch) >= batch_size:
+                imported += insert_session_batch(batch)
+                batch = []
+        if batch:
+            imported += insert_session_batch(batch)
+    except SessionImportError as e:
+        db.session.rollback()
+        e.imported = imported
+        raise
+    return imported
+
+
+def insert_session_batch(batch):
+    # One executemany INSERT, one rollup update per exercise and one commit per batch
+    merged = {}
+    for row in batch:
+        contribution = row['progress_contribution']
+        if contribution:
+            merged[contribution['exercise']] = apply_contribution(merged.get(contribution['exercise'], {}), contribution)
+    db.session.execute(db.insert(WorkoutSession), batch)
+    for exercise in sorted(merged):
+        update_progress(batch[0]['user_id'], merged[exercise], 1)
+    db.session.commit()
+    return len(batch)
+
+
+def sync_session_progress(workout):
+    """
+    Move a session's share of its ExerciseProgress rollup to match its
+    current state: subtract what it contributed before, add what it
+    contributes now. Call before committing the session change so both
+    land in the same transaction.
+    """
+    contribution = session_contribution(
+        workout.exercise, workout.created_at, workout.status,
+        workout.sections if workout.analysis else None, workout.rep_metrics
+    )
+    previous = workout.progress_contribution
+    if contribution == previous:
+        return
+    if previous:
+        update_progress(workout.user_id, previous, -1)
+    if contribution:
+        update_progress(workout.user_id, contribution, 1)
+    workout.progress_contribution = contribution
+
+
+def update_progress(user_id, contribution, sign):
+    """
+    Add or subtract a contribution from the user's rollup for its exercise.
+    """
+    key = {'user_id': user_id, 'exercise': contribution['exercise']}
+    # Bumping the revision first takes the write lock (a row lock on Postgres,
+    # the database lock on SQLite), so the read below sees every committed
+    # update and concurrent workers cannot lose each other's increments
+    claimed = db.session.execute(
+        db.update(ExerciseProgress).filter_by(**key).values(revision=ExerciseProgress.revision + 1)
+    ).rowcount
+    if claimed:
+        rollup = db.session.get(ExerciseProgress, (user_id, contribution['exercise']), populate_existing=True)
+    elif sign < 0:
+        return
+    else:
+        rollup = ExerciseProgress(revision=1, totals={}, weeks={}, flaws={}, **key)
+        try:
+            with db.session.begin_nested():
+                db.session.add(rollup)
+        except IntegrityError:
+            # Another worker created the row first
+            return update_progress(user_id, contribution, sign)
+    updated = apply_contribution(rollup.as_rollup(), contribution, sign)
+    if not updated['totals']:
+        db.session.delete(rollup)
+        return
+    rollup.totals, rollup.weeks, rollup.flaws = updated['totals'], updated['weeks'], updated['flaws']
+
+
+def progress_summaries(user_id):
+    rollups = ExerciseProgress.query.filter_by(user_id=user_id).all()
+    summaries = [summarize_progress(rollup.exercise, rollup.as_rollup()) for rollup in rollups]
+    return sorted(summaries, key=lambda summary: (-summary['sessions'], summary['exercise']))
+
+
+def enqueue_analysis(session_id):
+    """
+    Queue the background analysis job for a pending workout session.
+    """
+    fragment_cache.invalidate(session_id)
+    return job_queue.enqueue(
+        run_analysis_job,
+        session_id,
+        on_retry=lambda job, error: set_session_status(
+            session_id, 'retrying', 0, f'Coach is busy, retrying (attempt {job.attempts + 1} of {job.max_attempts})'
+        ),
+        on_failure=lambda job, error: fail_analysis(session_id, error)
+    )
+
+
+def run_analysis_job(session_id):
+    """
+    Background job: run the analysis for a session and store the results.
+    """
+    with instrumentation.job('analysis', session_id=session_id):
+        workout = WorkoutSession.query.get(session_id)
+        if workout is None or workout.is_complete:
+            return
+        
+        # Live tokens go to any /stream subscribers; the row gets the final text
+        channel = stream_hub.open(session_id)
+        
+        def on_progress(progress, message):
+            workout.status = 'processing'
+            workout.progress = progress
+            workout.status_message = message
+            db.session.commit()
+            channel.publish('status', {'status': 'processing', 'progress': progress, 'message': message})
+        
+        def on_token(field, delta):
+            channel.publish('token', {'field': field, 'text': delta})
+        
+        from video_probe import probe_video
+        video_path = os.path.join(current_app.config['UPLOAD_FOLDER'], workout.video_filename)
+        video_info = probe_video(video_path, content_hash=workout.video_hash)
+        try:
+            result = run_analysis(
+                video_path, workout.exercise, workout.notes, workout.character_id,
+                on_progress=on_progress, video_info=video_info,
+                check_cache=False,  # upload() already checked before queueing
+                on_token=on_token
+            )
+        except Exception:
+            # The retry regenerates from scratch, so clients drop partial text
+            channel.publish('reset', {})
+            raise
+        
+        workout.set_analysis(result['analysis'])
+        workout.feedback = result['feedback']
+        # Other personas' feedback was written for the previous analysis
+        workout.panel = []
+        workout.pose_metrics = result['pose_metrics']
+        workout.rep_metrics = result['rep_metrics']
+        workout.character_id = result['character_id']
+        workout.character_name = result['character_name']
+        workout.llm_usage = result.get('llm_usage')
+        workout.status = 'complete'
+        workout.progress = 100
+        workout.status_message = None
+        with instrumentation.span('analysis.save'):
+            sync_session_progress(workout)
+            db.session.commit()
+        fragment_cache.invalidate(session_id)
+        stream_hub.close(session_id)
+
+
+def enqueue_media(session_id):
+    """
+    Queue generation of the web rendition, poster and sprite for a session.
+    """
+    return job_queue.enqueue(
+        generate_media_job,
+        session_id,
+        on_failure=lambda job, error: print(f"Media derivatives failed for session {session_id}: {error}")
+    )
+
+
+def generate_media_job(session_id):
+    """
+    Background job: create playback derivatives and record their names.
+    """
+    with instrumentation.job('media', session_id=session_id):
+        workout = WorkoutSession.query.get(session_id)
+        if workout is None or workout.file_type != 'video':
+            return
+        video_path = os.path.join(current_app.config['UPLOAD_FOLDER'], workout.video_filename)
+        if workout.video_hash:
+            video_hash = workout.video_hash
+        else:
+            from video_probe import probe_video
+            video_hash = probe_video(video_path).content_hash
+        workout.media = generate_derivatives(
+            video_path, video_hash, current_app.config['UPLOAD_FOLDER'], MediaSettings.from_config(current_app.config)
+        )
+        db.session.commit()
+
+
+# Statuses of sessions whose analysis job has not finished
+UNFINISHED_STATUSES = ('pending', 'processing', 'retrying')
+
+
+def requeue_stale_analyses(started_before=None):
+    """
+    Queue again the analyses left unfinished by a process that has gone:
+    sessions not touched since started_before (when the server started),
+    or without it untouched for ANALYSIS_STALE_SECONDS. Claiming a session
+    stamps its updated_at, so with started_before nothing this server has
+    queued is ever picked up again, however late a worker starts. Each
+    session is claimed with a conditional update first, so workers starting
+    together never queue the same one twice. Panel jobs orphaned the same
+    way are marked failed, so the page offers them again. Returns the
+    requeued session ids.
+    """
+    now = datetime.utcnow()
+    if started_before is not None:
+        cutoff = started_before
+    else:
+        cutoff = now - timedelta(seconds=current_app.config['ANALYSIS_STALE_SECONDS'])
+    stale = (
+        WorkoutSession.status.in_(UNFINISHED_STATUSES),
+        or_(WorkoutSession.updated_at < cutoff, WorkoutSession.updated_at.is_(None))
+    )
+    candidates = [session_id for (session_id,) in db.session.query(WorkoutSession.id).filter(*stale)]
+    requeued = []
+    for session_id in candidates:
+        claimed = WorkoutSession.query.filter(WorkoutSession.id == session_id, *stale).update({
+            WorkoutSession.status: 'pending',
+            WorkoutSession.progress: 0,
+            WorkoutSession.status_message: 'Resuming after a server restart',
+            WorkoutSession.updated_at: now
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            enqueue_analysis(session_id)
+            requeued.append(session_id)
+    
+    WorkoutSession.query.filter(
+        WorkoutSession.panel_status == 'pending',
+        or_(WorkoutSession.updated_at < cutoff, WorkoutSession.updated_at.is_(None))
+    ).update({WorkoutSession.panel_status: 'failed'}, synchronize_session=False)
+    db.session.commit()
+    return requeued
+
+
+def set_session_status(session_id, status, progress, message=None):
+    workout = WorkoutSession.query.get(session_id)
+    if workout is None:
+        return
+    workout.status = status
+    workout.progress = progress
+    workout.status_message = message
+    db.session.commit()
+    channel = stream_hub.get(session_id)
+    if channel is not None:
+        channel.publish('status', {'status': status, 'progress': progress, 'message': message})
+
+
+def fail_analysis(session_id, error):
+    """
+    Mark a session as failed once all retries are exhausted.
+    """
+    workout = WorkoutSession.query.get(session_id)
+    if workout is None:
+        return
+    workout.set_analysis(f"Error generating analysis: {str(error)}. Please try again.")
+    workout.feedback = "Unable to provide feedback at this time."
+    workout.status = 'failed'
+    workout.progress = 100
+    workout.status_message = 'Analysis failed'
+    sync_session_progress(workout)
+    db.session.commit()
+    stream_hub.close(session_id)
+
+
+def panel_characters(workout, character_ids):
+    """
+    The known personas among character_ids that have no feedback on the
+    session yet, in order and without repeats.
+    """
+    existing = {row.character_id for row in workout.panel} | {workout.character_id}
+    return [
+        CHARACTERS[character_id] for character_id in dict.fromkeys(character_ids)
+        if character_id in CHARACTERS and character_id not in existing
+    ]
+
+
+def enqueue_panel(session_id, character_ids):
+    """
+    Queue the background job adding personas' feedback to a session. The
+    session is claimed with a conditional update, so repeated requests never
+    queue a second job while one is pending. Returns whether one was queued.
+    """
+    claimed = WorkoutSession.query.filter(
+        WorkoutSession.id == session_id,
+        or_(WorkoutSession.panel_status.is_(None), WorkoutSession.panel_status != 'pending')
+    ).update({WorkoutSession.panel_status: 'pending'}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return False
+    job_queue.enqueue(
+        run_panel_job,
+        session_id,
+        character_ids,
+        on_failure=lambda job, error: fail_panel(session_id, error)
+    )
+    return True
+
+
+def run_panel_job(session_id, character_ids):
+    """
+    Background job: generate the requested personas' feedback for a session.
+    /stream subscribers get a status event, then 'done' once it is saved.
+    """
+    with instrumentation.job('panel', session_id=session_id):
+        workout = WorkoutSession.query.get(session_id)
+        if workout is None:
+            return
+        channel = stream_hub.open(session_id)
+        channel.publish('status', {'status': 'panel', 'progress': 0, 'message': 'Asking the other coaches'})
+        generate_panel(workout, character_ids)
+        workout.panel_status = 'complete'
+        db.session.commit()
+        stream_hub.close(session_id)
+
+
+def fail_panel(session_id, error):
+    """
+    Mark a session's panel job as failed once all retries are exhausted.
+    """
+    print(f"Panel feedback failed for session {session_id}: {error}")
+    workout = WorkoutSession.query.get(session_id)
+    if workout is not None:
+        workout.panel_status = 'failed'
+        db.session.commit()
+    stream_hub.close(session_id)
+
+
+def generate_panel(workout, character_ids):
+    """
+    Add feedback from more personas to a completed session, reusing its
+    stored analysis instead of analyzing the video again. Personas that
+    already have feedback on the session are skipped. Returns the new
+    PersonaFeedback rows.
+    """
+    characters = panel_characters(workout, character_ids)
+    if not characters:
+        return []
+    
+    # Panels use the same A/B arm as the session's own feedback
+    version = prompt_versions(workout.video_hash)['feedback']
+    results = request_panel_feedback(workout.exercise, workout.analysis, characters, current_app.config['PANEL_MODE'], version)
+    rows = [
+        PersonaFeedback(
+            session_id=workout.id,
+            character_id=character_id,
+            feedback=feedback,
+            prompt_tokens=usage.get('prompt_tokens'),
+            completion_tokens=usage.get('completion_tokens')
+        )
+        for character_id, (feedback, usage) in results.items()
+    ]
+    db.session.add_all(rows)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request stored these personas first
+        db.session.rollback()
+        return []
+    return rows